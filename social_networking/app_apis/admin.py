@@ -7,12 +7,12 @@ class UserModelAdmin(BaseUserAdmin):
     # The fields to be used in displaying the User model.
     # These override the definitions on the base UserAdmin
     # that reference specific fields on auth.User.
-    list_display = ["id", "email", "tc", "name", "is_admin"]
-    list_filter = ["is_admin"]
+    list_display = ["id", "email", "tc", "name", "is_admin", "is_deleted"]
+    list_filter = ["is_admin", "is_deleted"]
     fieldsets = (
         ('User Credentials', {"fields": ("email", "password")}),
         ("Personal info", {"fields": ("name", "tc")}),
-        ("Permissions", {"fields": ("is_admin",)}),
+        ("Permissions", {"fields": ("is_admin", "is_deleted")}),
     )
 
     # add_fieldsets is not a standard ModelAdmin attribute. UserAdmin
@@ -30,6 +30,10 @@ class UserModelAdmin(BaseUserAdmin):
     ordering = ("email", "id")
     filter_horizontal = ()
 
+    def get_queryset(self, request):
+        # soft-deleted users stay reachable here to be restored
+        return User.all_objects.order_by(*self.ordering)
+
 
 # Now register the new UserAdmin...
 admin.site.register(User, UserModelAdmin)
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'social_networking.app_apis'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,145 @@
+import json
+import logging
+import math
+
+from django.http import HttpResponse, QueryDict
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ParseError, Throttled
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .custom_response import APIException, envelope, page_envelope
+from .hashing import HashingPoolBusy
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async-native API views served under ASGI.
+
+    DRF's APIView is synchronous only, so this class provides the parts
+    of it the app relies on for coroutine handlers: JWT authentication
+    through CachedJWTAuthentication.aauthenticate, the sliding-window
+    throttles, and the same response envelope and error handling as
+    CustomResponseMixin.
+    """
+    authentication_class = CachedJWTAuthentication
+    requires_authentication = True
+    throttle_classes = []
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # token authenticated like the DRF views, so no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        # DRF request wrapper for query_params / pagination helpers
+        self.api_request = Request(request)
+        self.throttles = []
+        try:
+            await self.authenticate(request)
+            await self.check_throttles(request)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        if response.status_code >= 400:
+            # like ThrottleRefundMixin on the DRF views
+            for throttle in self.throttles:
+                await throttle.arefund()
+        return response
+
+    async def authenticate(self, request):
+        result = await self.authentication_class().aauthenticate(request)
+        if result is not None:
+            request.user, request.auth = result
+        elif self.requires_authentication:
+            raise AuthenticationFailed("Authentication credentials were not provided.")
+
+    async def check_throttles(self, request):
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            self.throttles.append(throttle)
+            if not await throttle.aallow_request(request, self):
+                raise Throttled(throttle.wait())
+
+    def get_body(self, request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as exc:
+                # same 400 as DRF's JSONParser on the sync views
+                raise ParseError(f"JSON parse error - {exc}")
+        if request.method == "POST":
+            return request.POST
+        return QueryDict(request.body)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (AuthenticationFailed, InvalidToken)):
+            return self.format_response(
+                "Unauthorized",
+                errors={"detail": "Token Expired or Invalid"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                type="failure",
+            )
+        if isinstance(exc, APIException):
+            return self.format_response(
+                exc.message,
+                errors={"detail": exc.errors},
+                status_code=status.HTTP_400_BAD_REQUEST,
+                type="failure",
+            )
+        if isinstance(exc, (NotFound, ParseError)):
+            return self.json_response({"detail": exc.detail}, exc.status_code)
+        if isinstance(exc, Throttled):
+            response = self.format_response(
+                "Too many requests",
+                errors={"detail": exc.detail},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                type="failure",
+            )
+            if exc.wait is not None:
+                response["Retry-After"] = str(math.ceil(exc.wait))
+            return response
+        if isinstance(exc, HashingPoolBusy):
+            response = self.format_response(
+                "Service busy",
+                errors={"detail": exc.detail},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                type="failure",
+            )
+            if exc.wait is not None:
+                response["Retry-After"] = str(math.ceil(exc.wait))
+            return response
+        logger.error("Unexpected error in %s: %s", type(self).__name__, exc)
+        return self.format_response(
+            "An unexpected error occurred",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            type="error",
+        )
+
+    def json_response(self, body, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            dumps(body), status=status_code, content_type="application/json")
+
+    def format_response(
+            self,
+            message,
+            data=None,
+            type="success",
+            status_code=status.HTTP_200_OK,
+            errors=None):
+        return self.json_response(envelope(message, data, type, errors), status_code)
+
+    def paginated_response(self, message, paginator, data):
+        """
+        Envelope used by the sync list views (page_envelope).
+        """
+        return self.json_response(
+            page_envelope(message, paginator.get_paginated_response(data).data))
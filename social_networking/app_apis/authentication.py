@@ -0,0 +1,179 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_settings():
+    config = {
+        "MAX_SIZE": 10000,
+        "TTL": 60,
+        "SHARED_CACHE_ALIAS": None,
+    }
+    config.update(getattr(settings, "JWT_USER_CACHE", {}))
+    return config
+
+
+class UserCache:
+    """
+    Bounded LRU cache of authenticated users with a per-entry TTL, kept in
+    process memory, optionally backed by a shared Django cache so that a
+    user loaded by one worker is not reloaded by the others.
+
+    Entries are dropped by the User post_save/post_delete signals. Other
+    processes only see that through the shared tier or once the local
+    TTL expires, so keep TTL short when running several workers.
+    """
+    key_prefix = "jwt_user:"
+
+    def __init__(self):
+        config = user_cache_settings()
+        self.max_size = config["MAX_SIZE"]
+        self.ttl = config["TTL"]
+        alias = config["SHARED_CACHE_ALIAS"]
+        self.shared = caches[alias] if alias else None
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, loader):
+        key = str(user_id)
+        now = time.monotonic()
+        user = self._lookup(key, now)
+        if user is not None:
+            return copy.copy(user)
+
+        if self.shared is not None:
+            user = self.shared.get(self.key_prefix + key)
+        if user is None:
+            user = loader()
+            if self.shared is not None:
+                self.shared.set(self.key_prefix + key, user, self.ttl)
+
+        self._store(key, now, user)
+        return copy.copy(user)
+
+    async def aget(self, user_id, loader):
+        """
+        Same as get(), for async callers; `loader` is a coroutine function.
+        """
+        key = str(user_id)
+        now = time.monotonic()
+        user = self._lookup(key, now)
+        if user is not None:
+            return copy.copy(user)
+
+        if self.shared is not None:
+            user = await self.shared.aget(self.key_prefix + key)
+        if user is None:
+            user = await loader()
+            if self.shared is not None:
+                await self.shared.aset(self.key_prefix + key, user, self.ttl)
+
+        self._store(key, now, user)
+        return copy.copy(user)
+
+    def _lookup(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, key, now, user):
+        with self.lock:
+            self.entries[key] = (now + self.ttl, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        key = str(user_id)
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through `user_cache`
+    instead of running a SELECT on User for every request. The active and
+    revoked-token checks still run against the cached user each time.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        def load_user():
+            try:
+                return self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return self.check_user(user_cache.get(user_id, load_user), validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of authenticate() for the async views. Token
+        validation is pure CPU work; only a cache miss touches the
+        database, through the async ORM.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        async def load_user():
+            try:
+                return await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        return self.check_user(await user_cache.aget(user_id, load_user), validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
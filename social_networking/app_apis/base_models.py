@@ -1,6 +1,17 @@
 import uuid
 from django.db import models
 
+
+class SoftDeleteManager(models.Manager):
+    """
+    Default manager of the soft-deletable models: live rows only. Keep a
+    plain `all_objects` manager next to it for the deleted ones (admin,
+    uniqueness checks, purge_deleted_rows).
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class BaseAbstractModel(models.Model):
     """
      This model defines base models that implements common fields like:
@@ -14,11 +25,30 @@ class BaseAbstractModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # is_deleted as loaded, so a save can tell a soft delete or a
+        # restore (see soft_delete_flipped)
+        if "is_deleted" in field_names:
+            instance._loaded_is_deleted = instance.is_deleted
+        return instance
+
     def soft_delete(self):
         """soft delete a model instance"""
         self.is_deleted = True
-        self.save()
+        # only these columns, so a stale copy does not write back
+        # counters or other fields changed since it was read
+        self.save(update_fields=["is_deleted", "updated_at"])
+
+    def soft_delete_flipped(self):
+        """
+        Whether is_deleted differs from the value loaded from the
+        database (or read before the save by signals.load_is_deleted).
+        """
+        loaded = self.__dict__.get("_loaded_is_deleted")
+        return loaded is not None and loaded != self.is_deleted
 
     class Meta:
         abstract = True
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
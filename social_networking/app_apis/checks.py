@@ -0,0 +1,40 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+
+def process_local_cache(alias):
+    """
+    Whether the CACHES entry `alias` lives in each process (the default
+    locmem cache), so its entries and version bumps are not seen by the
+    other server processes.
+    """
+    return isinstance(caches[alias], LocMemCache)
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    """
+    SEARCH_CACHE and CONDITIONAL_GET enabled explicitly on a per-process
+    cache: a write only bumps the versions of the process that handled
+    it, and the others keep serving stale pages and 304s.
+    """
+    from .conditional import conditional_get_settings
+    from .search_cache import search_cache_settings
+
+    warnings = []
+    for setting, config, check_id in (
+        ("SEARCH_CACHE", search_cache_settings(), "app_apis.W001"),
+        ("CONDITIONAL_GET", conditional_get_settings(), "app_apis.W002"),
+    ):
+        if config["ENABLED"] and process_local_cache(config["ALIAS"]):
+            warnings.append(Warning(
+                f"{setting} is enabled on the per-process cache {config['ALIAS']!r}.",
+                hint=(
+                    "With several server processes the others never see the "
+                    "invalidations. Point ALIAS at a shared cache (Redis, "
+                    "Memcached, database) or leave ENABLED as None."
+                ),
+                id=check_id,
+            ))
+    return warnings
@@ -0,0 +1,153 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+
+from .checks import process_local_cache
+from .models import FriendRequest, FriendshipEdge
+
+# per-user lists with a version stamp: the friends list and the pending
+# friend requests received
+STAMP_SCOPES = ("friends", "pending")
+
+
+def conditional_get_settings():
+    config = {
+        # None: only when ALIAS is a cache shared by every process
+        "ENABLED": None,
+        "ALIAS": "default",
+        "TIMEOUT": 3600,
+    }
+    config.update(getattr(settings, "CONDITIONAL_GET", {}))
+    if config["ENABLED"] is None:
+        config["ENABLED"] = not process_local_cache(config["ALIAS"])
+    return config
+
+
+def get_cache():
+    return caches[conditional_get_settings()["ALIAS"]]
+
+
+def stamp_key(scope, user_id):
+    assert scope in STAMP_SCOPES
+    return f"user_stamp:{scope}:{user_id}"
+
+
+def get_stamp(scope, user_id):
+    """
+    Current version stamp of one user's list. A missing stamp (never
+    read, bumped or evicted) is started from the clock, so it never
+    repeats a value an ETag was built from.
+    """
+    cache = get_cache()
+    key = stamp_key(scope, user_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = time.time_ns()
+        if not cache.add(key, stamp, conditional_get_settings()["TIMEOUT"]):
+            stamp = cache.get(key, stamp)
+    return stamp
+
+
+async def aget_stamp(scope, user_id):
+    cache = get_cache()
+    key = stamp_key(scope, user_id)
+    stamp = await cache.aget(key)
+    if stamp is None:
+        stamp = time.time_ns()
+        if not await cache.aadd(key, stamp, conditional_get_settings()["TIMEOUT"]):
+            stamp = await cache.aget(key, stamp)
+    return stamp
+
+
+def bump_stamps(scope, user_ids):
+    """
+    Give the `scope` lists of `user_ids` a new stamp once the surrounding
+    transaction commits. Bumping earlier would let a concurrent request
+    pair the new stamp with the rows it read before the commit.
+    """
+    keys = [stamp_key(scope, user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def bump_listing_stamps(user):
+    """
+    Bump the lists that show `user`'s name and email: the friends lists
+    of their friends and the pending requests they sent.
+    """
+    bump_stamps("friends", FriendshipEdge.objects.filter(friend=user)
+                .values_list("user_id", flat=True))
+    bump_stamps("pending", FriendRequest.objects.filter(sender=user, status="pending")
+                .values_list("receiver_id", flat=True))
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag of a response to `request` (path, query string and
+    Accept header) whose body is fully determined by `parts`.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), *parts):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def stamp_etag(scope):
+    def etag_func(request):
+        return make_etag(request, scope, request.user.pk, get_stamp(scope, request.user.pk))
+    return etag_func
+
+
+def astamp_etag(scope):
+    async def etag_func(request):
+        stamp = await aget_stamp(scope, request.user.pk)
+        return make_etag(request, scope, request.user.pk, stamp)
+    return etag_func
+
+
+def conditional_get(etag_func):
+    """
+    Decorator for the GET handler of a view (sync or async): answers
+    If-None-Match with 304 Not Modified when it matches etag_func(request),
+    before the handler runs, and sets the ETag on 200 responses.
+    etag_func runs first, so the stamp it reads is never newer than the
+    rows the handler reads after it.
+    """
+    def decorator(method):
+        if iscoroutinefunction(method):
+            @wraps(method)
+            async def inner(view, request, *args, **kwargs):
+                if not conditional_get_settings()["ENABLED"]:
+                    return await method(view, request, *args, **kwargs)
+                etag = etag_func(request)
+                if iscoroutinefunction(etag_func):
+                    etag = await etag
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return not_modified
+                return set_etag(await method(view, request, *args, **kwargs), etag)
+        else:
+            @wraps(method)
+            def inner(view, request, *args, **kwargs):
+                if not conditional_get_settings()["ENABLED"]:
+                    return method(view, request, *args, **kwargs)
+                etag = etag_func(request)
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return not_modified
+                return set_etag(method(view, request, *args, **kwargs), etag)
+        return inner
+    return decorator
+
+
+def set_etag(response, etag):
+    if response.status_code == 200:
+        response.headers.setdefault("ETag", etag)
+    return response
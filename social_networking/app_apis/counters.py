@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .authentication import user_cache
+from .models import LIVE_FRIEND_EDGE, User, FriendRequest, Friendship, FriendshipEdge
+
+COUNTER_FIELDS = ("friend_count", "pending_request_count")
+
+
+def adjust_counter(field, deltas):
+    """
+    Apply {user_id: delta} to one of the User counter columns.
+
+    Users sharing the same delta are updated by a single F() UPDATE, so
+    the usual case (every delta is +1 or -1) is one query. Decrements
+    never go below zero. Cached copies of the users are dropped once the
+    surrounding transaction commits.
+    """
+    assert field in COUNTER_FIELDS
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        User.objects.filter(id__in=user_ids).update(
+            **{field: Greatest(F(field) + delta, 0)})
+
+    def invalidate_cached_users():
+        for user_ids in by_delta.values():
+            for user_id in user_ids:
+                user_cache.invalidate(user_id)
+
+    if by_delta:
+        transaction.on_commit(invalidate_cached_users)
+
+
+def adjust_counters_on_soft_delete(instance):
+    """
+    Move the counters a soft delete (or restore) of a User, Friendship
+    or FriendRequest changes, the same way friend_count_subquery and
+    pending_request_count_subquery would count them after the save: a
+    user's friends and the receivers of their pending requests, both
+    sides of a friendship, the receiver of a pending request.
+    """
+    delta = -1 if instance.is_deleted else 1
+    friends = pending = []
+    if isinstance(instance, User):
+        friends = FriendshipEdge.objects.filter(
+            LIVE_FRIEND_EDGE, user=instance).values_list("friend_id", flat=True)
+        pending = FriendRequest.objects.filter(
+            sender=instance, status="pending").values_list("receiver_id", flat=True)
+    elif isinstance(instance, Friendship):
+        friends = FriendshipEdge.objects.filter(
+            friendship=instance, friend__is_deleted=False).values_list("user_id", flat=True)
+    elif isinstance(instance, FriendRequest):
+        if instance.status == "pending" and User.objects.filter(pk=instance.sender_id).exists():
+            pending = [instance.receiver_id]
+    adjust_counter("friend_count", {user_id: delta for user_id in friends})
+    adjust_counter("pending_request_count", {user_id: delta for user_id in pending})
+
+
+def friend_count_subquery():
+    return Coalesce(Subquery(
+        FriendshipEdge.objects.filter(LIVE_FRIEND_EDGE, user=OuterRef("pk"))
+        .order_by().values("user").annotate(total=Count("id")).values("total"),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def pending_request_count_subquery():
+    return Coalesce(Subquery(
+        FriendRequest.objects.filter(
+            receiver=OuterRef("pk"), status="pending", sender__is_deleted=False)
+        .order_by().values("receiver").annotate(total=Count("id")).values("total"),
+        output_field=IntegerField(),
+    ), Value(0))
+
+
+def reconcile_counters(batch_size=1000):
+    """
+    Compare every user's counters with counts recomputed from
+    FriendshipEdge and pending FriendRequest rows, `batch_size` users at
+    a time in primary key order, and rewrite the ones that drifted.
+
+    The rewrite recomputes the counts inside the UPDATE itself, so
+    increments committed since the comparison are not lost. Returns
+    (users checked, users repaired).
+    """
+    checked = repaired = 0
+    last_pk = None
+    while True:
+        batch = User.objects.annotate(
+            actual_friend_count=friend_count_subquery(),
+            actual_pending_request_count=pending_request_count_subquery(),
+        ).order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch.values_list(
+            "pk", "friend_count", "pending_request_count",
+            "actual_friend_count", "actual_pending_request_count",
+        )[:batch_size])
+        if not rows:
+            return checked, repaired
+
+        drifted = [
+            pk for pk, friends, pending, actual_friends, actual_pending in rows
+            if (friends, pending) != (actual_friends, actual_pending)
+        ]
+        if drifted:
+            User.objects.filter(pk__in=drifted).update(
+                friend_count=friend_count_subquery(),
+                pending_request_count=pending_request_count_subquery(),
+            )
+            for pk in drifted:
+                user_cache.invalidate(pk)
+        checked += len(rows)
+        repaired += len(drifted)
+        last_pk = rows[-1][0]
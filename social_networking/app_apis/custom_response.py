@@ -1,7 +1,35 @@
+import math
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, Throttled
 from rest_framework import status
 from rest_framework.views import exception_handler
+from .hashing import HashingPoolBusy
+
+
+def envelope(message, data=None, type="success", errors=None):
+    """
+    Body of every CustomResponseMixin response.
+    """
+    return {
+        'message': message,
+        'data': data or {},
+        'type': type,
+        'errors': errors
+    }
+
+
+def page_envelope(message, page):
+    """
+    Body of the list responses, the same envelope as envelope(); `page`
+    is the paginator's {"count", "next", "previous", "results"} dict (or
+    the plain list when pagination is off), used as is.
+    """
+    return {
+        'message': message,
+        'data': page,
+        'type': 'success',
+        'errors': None
+    }
 
 
 class APIException(Exception):
@@ -29,12 +57,31 @@ class CustomResponseMixin:
             )
         # Handle validation errors
         elif isinstance(exc, ValidationError):
-            return Response({
-                'message': f'{self.get_view_name()} Failed',
-                'data': {},
-                'type': 'failure',
-                'errors': exc.detail
-            }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                envelope(f'{self.get_view_name()} Failed', type='failure', errors=exc.detail),
+                status=status.HTTP_400_BAD_REQUEST)
+        # Handle rate limited requests
+        elif isinstance(exc, Throttled):
+            response = self.format_response(
+                'Too many requests',
+                errors={'detail': exc.detail},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                type="failure"
+            )
+            if exc.wait is not None:
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
+        # Handle a saturated password hashing pool
+        elif isinstance(exc, HashingPoolBusy):
+            response = self.format_response(
+                'Service busy',
+                errors={'detail': exc.detail},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                type="failure"
+            )
+            if exc.wait is not None:
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
         # Handle other exceptions
         else:
             response = exception_handler(exc, self.request)
@@ -53,12 +100,7 @@ class CustomResponseMixin:
             type="success",
             status_code=status.HTTP_200_OK,
             errors =None):
-        return Response({
-            'message': message,
-            'data': data or {},
-            'type': type,
-            'errors': errors
-        }, status=status_code)
+        return Response(envelope(message, data, type, errors), status=status_code)
 
 
 def custom_exception_handler(exc, context):
@@ -67,12 +109,10 @@ def custom_exception_handler(exc, context):
     """
     response = exception_handler(exc, context)
     if response is not None and response.status_code == 401:
-        return Response({
-            'message': 'Unauthorized',
-            'data': {},
-            'type': 'failure',
-            'errors': {
-                'detail': 'Token Expired or Invalid'
-            }
-        }, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(
+            envelope(
+                'Unauthorized',
+                type='failure',
+                errors={'detail': 'Token Expired or Invalid'}
+            ), status=status.HTTP_401_UNAUTHORIZED)
     return response
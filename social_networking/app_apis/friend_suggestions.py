@@ -0,0 +1,259 @@
+import heapq
+from array import array
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import (
+    LIVE_FRIEND_EDGE, FriendRequest, FriendshipEdge, FriendSuggestion, FriendSuggestionRefresh
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+def get_top_n():
+    return getattr(settings, "FRIEND_SUGGESTIONS", {}).get("TOP_N", 50)
+
+
+class FriendGraph:
+    """
+    Compact in-memory copy of the friendship graph, or of the part of it
+    around some users.
+
+    User UUIDs are mapped to dense ints and the adjacency is kept in CSR
+    form like the distance snapshot (app_apis/graph_snapshot.py): int64
+    offsets into one sorted int32 neighbor array, NumPy arrays when
+    installed and array.array otherwise. Mutual-friend counts come from
+    vectorised set operations instead of per-user joins.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+        self.offsets = array("q", [0])
+        self.neighbors = array("i")
+
+    def node(self, user_id):
+        node = self.index.get(user_id)
+        if node is None:
+            node = self.index[user_id] = len(self.ids)
+            self.ids.append(user_id)
+        return node
+
+    def friends(self, node):
+        return self.neighbors[self.offsets[node]:self.offsets[node + 1]]
+
+    @classmethod
+    def load(cls, chunk_size=10000):
+        edges = (
+            FriendshipEdge.objects.filter(LIVE_FRIEND_EDGE, user__is_deleted=False)
+            .order_by().values_list("user_id", "friend_id")
+        )
+        return cls.from_edges(edges.iterator(chunk_size=chunk_size))
+
+    @classmethod
+    def load_around(cls, user_ids, hops=2, chunk_size=1000):
+        """
+        Load the friends lists of `user_ids` and of every user up to
+        `hops` friendships away from them: all that mutual_counts() needs
+        for those users and their friends.
+        """
+        edges = []
+        loaded = set()
+        frontier = set(user_ids)
+        for _ in range(hops + 1):
+            frontier -= loaded
+            if not frontier:
+                break
+            loaded |= frontier
+            batch = list(frontier)
+            frontier = set()
+            for start in range(0, len(batch), chunk_size):
+                rows = (
+                    FriendshipEdge.objects
+                    .filter(LIVE_FRIEND_EDGE, user__is_deleted=False,
+                            user_id__in=batch[start:start + chunk_size])
+                    .order_by().values_list("user_id", "friend_id")
+                )
+                for user_id, friend_id in rows.iterator(chunk_size=chunk_size):
+                    edges.append((user_id, friend_id))
+                    frontier.add(friend_id)
+        return cls.from_edges(edges)
+
+    @classmethod
+    def from_edges(cls, edges):
+        graph = cls()
+        sources = array("i")
+        targets = array("i")
+        for user_id, friend_id in edges:
+            sources.append(graph.node(user_id))
+            targets.append(graph.node(friend_id))
+        count = len(graph.ids)
+        if np is not None:
+            # one sort of (source, target) keys orders and de-duplicates
+            # every friends list at once
+            keys = np.unique(
+                (np.frombuffer(sources, dtype=np.int32).astype(np.int64) << 32)
+                | np.frombuffer(targets, dtype=np.int32)
+            )
+            graph.neighbors = (keys & 0xFFFFFFFF).astype(np.int32)
+            graph.offsets = np.zeros(count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys >> 32, minlength=count), out=graph.offsets[1:])
+        else:
+            lists = [set() for _ in range(count)]
+            for source, target in zip(sources, targets):
+                lists[source].add(target)
+            for friends in lists:
+                graph.neighbors.extend(sorted(friends))
+                graph.offsets.append(len(graph.neighbors))
+        return graph
+
+    def mutual_counts(self, node, excluded, top_n):
+        """
+        Return up to `top_n` (node, mutual friend count) pairs for
+        non-friends of `node`, highest count first.
+        """
+        friends = self.friends(node)
+        if not len(friends):
+            return []
+        if np is not None:
+            return self._mutual_counts_numpy(node, friends, excluded, top_n)
+
+        counts = Counter(chain.from_iterable(self.friends(f) for f in friends))
+        skip = set(friends)
+        skip.add(node)
+        skip.update(excluded)
+        ranked = (item for item in counts.items() if item[0] not in skip)
+        return heapq.nlargest(top_n, ranked, key=lambda item: (item[1], -item[0]))
+
+    def _mutual_counts_numpy(self, node, friends, excluded, top_n):
+        pool = np.concatenate([self.friends(f) for f in friends])
+        candidates, counts = np.unique(pool, return_counts=True)
+        mask = ~np.isin(candidates, friends, assume_unique=True)
+        mask &= candidates != node
+        if excluded:
+            mask &= ~np.isin(candidates, np.fromiter(excluded, dtype=np.int32))
+        candidates, counts = candidates[mask], counts[mask]
+        if len(candidates) > top_n:
+            keep = np.argpartition(-counts, top_n)[:top_n]
+            candidates, counts = candidates[keep], counts[keep]
+        order = np.lexsort((candidates, -counts))
+        return [(int(candidates[i]), int(counts[i])) for i in order]
+
+
+def requested_pairs(user_ids):
+    """
+    Map each of `user_ids` to the users it has a FriendRequest with,
+    in either direction and whatever the status.
+    """
+    pairs = {user_id: set() for user_id in user_ids}
+    requests = FriendRequest.objects.filter(
+        Q(sender_id__in=user_ids) | Q(receiver_id__in=user_ids)
+    ).values_list("sender_id", "receiver_id")
+    for sender_id, receiver_id in requests.iterator():
+        if sender_id in pairs:
+            pairs[sender_id].add(receiver_id)
+        if receiver_id in pairs:
+            pairs[receiver_id].add(sender_id)
+    return pairs
+
+
+def compute_suggestions(graph, nodes, top_n=None, batch_size=500):
+    """
+    Recompute and store the suggestions of the given graph nodes.
+    Returns the number of suggestion rows written.
+    """
+    top_n = top_n or get_top_n()
+    written = 0
+    for start in range(0, len(nodes), batch_size):
+        chunk = nodes[start:start + batch_size]
+        user_ids = [graph.ids[node] for node in chunk]
+        excluded = requested_pairs(user_ids)
+        rows = []
+        for node, user_id in zip(chunk, user_ids):
+            skip = {graph.index[other] for other in excluded[user_id] if other in graph.index}
+            rows.extend(
+                FriendSuggestion(
+                    user_id=user_id,
+                    suggested_id=graph.ids[other],
+                    mutual_count=count)
+                for other, count in graph.mutual_counts(node, skip, top_n)
+            )
+        with transaction.atomic():
+            FriendSuggestion.objects.filter(user_id__in=user_ids).delete()
+            FriendSuggestion.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def refresh_all_suggestions(top_n=None, batch_size=500):
+    # clear the flags before reading the graph: a change made while the
+    # suggestions are computed flags its users again
+    FriendSuggestionRefresh.objects.all().delete()
+    graph = FriendGraph.load()
+    nodes = list(range(len(graph.ids)))
+    return len(nodes), compute_suggestions(graph, nodes, top_n, batch_size)
+
+
+def refresh_stale_suggestions(top_n=None, batch_size=500):
+    """
+    Recompute suggestions for users flagged by mark_suggestions_stale and
+    for their friends, whose mutual-friend counts changed with them.
+
+    The flags read are deleted before computing, so a user flagged again
+    meanwhile keeps a new flag for the next run; they are put back if the
+    computation fails.
+    """
+    flags = dict(FriendSuggestionRefresh.objects.values_list("pk", "user_id"))
+    if not flags:
+        return 0, 0
+    FriendSuggestionRefresh.objects.filter(pk__in=list(flags)).delete()
+    stale = list(flags.values())
+    try:
+        graph = FriendGraph.load_around(stale)
+        nodes = set()
+        for user_id in stale:
+            node = graph.index.get(user_id)
+            if node is not None:
+                nodes.add(node)
+                nodes.update(int(friend) for friend in graph.friends(node))
+        written = compute_suggestions(graph, sorted(nodes), top_n, batch_size)
+    except BaseException:
+        mark_suggestions_stale(stale)
+        raise
+    return len(nodes), written
+
+
+def forget_suggestions(pairs):
+    """
+    Drop suggestions between users that are now friends or have a
+    friend request between them, in both directions.
+    """
+    # two IN lists instead of one OR branch per pair, which takes the
+    # ORM longer to compile than the query takes to run
+    pairs = set(pairs)
+    pairs |= {(user2_id, user1_id) for user1_id, user2_id in pairs}
+    user_ids = {user_id for pair in pairs for user_id in pair}
+    if not user_ids:
+        return
+    doomed = [
+        pk for pk, user_id, suggested_id in
+        FriendSuggestion.objects.filter(user_id__in=user_ids, suggested_id__in=user_ids)
+        .values_list("pk", "user_id", "suggested_id")
+        if (user_id, suggested_id) in pairs
+    ]
+    if doomed:
+        FriendSuggestion.objects.filter(pk__in=doomed).delete()
+
+
+def mark_suggestions_stale(user_ids):
+    FriendSuggestionRefresh.objects.bulk_create(
+        [FriendSuggestionRefresh(user_id=user_id) for user_id in set(user_ids)],
+        ignore_conflicts=True,
+    )
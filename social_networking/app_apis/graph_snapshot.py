@@ -0,0 +1,321 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+
+from .models import LIVE_FRIEND_EDGE, Friendship, FriendshipEdge, User
+
+MAGIC = b"FGCSR001"
+# magic, node count, edge count, built-at timestamp
+HEADER = struct.Struct("<8sqqd")
+UUID_SIZE = 16
+# edges created this long before a build started are also replayed from
+# the delta, so rows committed while the build ran are never missed
+BUILD_MARGIN_SECONDS = 60
+
+
+def graph_settings():
+    config = {
+        "SNAPSHOT_PATH": os.path.join(settings.BASE_DIR, "friend_graph.csr"),
+        "DELTA_REFRESH_SECONDS": 30,
+        "MAX_HOPS": 6,
+    }
+    config.update(getattr(settings, "FRIEND_GRAPH", {}))
+    return config
+
+
+def build_snapshot(path, chunk_size=10000):
+    """
+    Write a CSR snapshot of the friendship graph to `path`.
+
+    Layout after the header: node UUIDs (16 bytes each, sorted so they
+    can be binary searched), int64 offsets (nodes + 1) and int32 neighbor
+    indexes. The file is written next to `path` and renamed into place,
+    so readers never see a partial snapshot. Soft-deleted friendships
+    and users are left out.
+    """
+    built_at = time.time() - BUILD_MARGIN_SECONDS
+    adjacency = {}
+    edges = (
+        FriendshipEdge.objects.filter(LIVE_FRIEND_EDGE, user__is_deleted=False)
+        .order_by().values_list("user_id", "friend_id")
+    )
+    for user_id, friend_id in edges.iterator(chunk_size=chunk_size):
+        adjacency.setdefault(user_id.bytes, []).append(friend_id.bytes)
+        adjacency.setdefault(friend_id.bytes, [])
+
+    nodes = sorted(adjacency)
+    index = {node: i for i, node in enumerate(nodes)}
+    offsets = array("q", [0])
+    neighbors = array("i")
+    for node in nodes:
+        neighbors.extend(sorted({index[friend] for friend in adjacency[node]}))
+        offsets.append(len(neighbors))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(HEADER.pack(MAGIC, len(nodes), len(neighbors), built_at))
+        handle.write(b"".join(nodes))
+        offsets.tofile(handle)
+        neighbors.tofile(handle)
+    os.replace(tmp_path, path)
+    return len(nodes), len(neighbors)
+
+
+class CSRSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file. The mapping is
+    shared by the page cache, so every worker process reads one copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, "rb") as handle:
+            self.buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.node_count, self.edge_count, self.built_at = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a friend graph snapshot")
+        view = memoryview(self.buffer)
+        self.ids_start = start = HEADER.size
+        start += self.node_count * UUID_SIZE
+        self.offsets = view[start:start + (self.node_count + 1) * 8].cast("q")
+        start += (self.node_count + 1) * 8
+        self.neighbors = view[start:start + self.edge_count * 4].cast("i")
+
+    @classmethod
+    def empty(cls, path=None):
+        snapshot = cls.__new__(cls)
+        snapshot.path = path
+        snapshot.mtime = None
+        snapshot.node_count = snapshot.edge_count = 0
+        snapshot.built_at = 0.0
+        return snapshot
+
+    def node_key(self, node):
+        start = self.ids_start + node * UUID_SIZE
+        return self.buffer[start:start + UUID_SIZE]
+
+    def uuid_at(self, node):
+        return uuid.UUID(bytes=self.node_key(node))
+
+    def find(self, user_id):
+        key = user_id.bytes
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.node_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.node_count and self.node_key(low) == key:
+            return low
+        return None
+
+    def friends(self, node):
+        return self.neighbors[self.offsets[node]:self.offsets[node + 1]]
+
+
+class GraphView:
+    """
+    A snapshot plus the changes read from the database since it was
+    built: friendships created or restored (`added`), friendships
+    soft-deleted (`removed`) and soft-deleted users. Nodes missing from the snapshot
+    get indexes past its node count.
+
+    A view is never modified once published; each delta load derives a
+    new one, so a search can run on a view without holding any lock.
+    """
+
+    def __init__(self, snapshot, base=None):
+        self.snapshot = snapshot
+        self.extra_ids = list(base.extra_ids) if base else []
+        self.extra_index = dict(base.extra_index) if base else {}
+        self.added = dict(base.added) if base else {}
+        self.removed = dict(base.removed) if base else {}
+        self.deleted_ids = set(base.deleted_ids) if base else set()
+        self.deleted = set(base.deleted) if base else set()
+        self.delta_since = base.delta_since if base else snapshot.built_at
+
+    def load_delta(self):
+        """
+        Return a new view with the changes committed since this one was
+        loaded. Hard deletes (purge_deleted_rows only removes rows that
+        were soft-deleted first) and bulk updates that do not touch
+        updated_at are only seen by the next snapshot build.
+        """
+        started = time.time()
+        since = datetime.fromtimestamp(self.delta_since, tz=dt_timezone.utc)
+        view = GraphView(self.snapshot, base=self)
+        view.delta_since = started - BUILD_MARGIN_SECONDS
+
+        added, removed = {}, {}
+        edges = FriendshipEdge.objects.filter(
+            LIVE_FRIEND_EDGE, user__is_deleted=False, created_at__gt=since
+        ).order_by().values_list("user_id", "friend_id")
+        for user_id, friend_id in edges.iterator():
+            added.setdefault(view.node(user_id, create=True), set()).add(
+                view.node(friend_id, create=True))
+        friendships = Friendship.all_objects.filter(
+            updated_at__gt=since
+        ).values_list("user1_id", "user2_id", "is_deleted")
+        deleted_pairs = []
+        for user1_id, user2_id, is_deleted in friendships.iterator():
+            if is_deleted:
+                deleted_pairs.append((user1_id, user2_id))
+                continue
+            # restored through the admin, or made again after an unfriend:
+            # the edges keep their created_at but the friendship is live
+            user1, user2 = view.node(user1_id, create=True), view.node(user2_id, create=True)
+            added.setdefault(user1, set()).add(user2)
+            added.setdefault(user2, set()).add(user1)
+        for user1_id, user2_id in deleted_pairs:
+            user1, user2 = view.node(user1_id), view.node(user2_id)
+            # the old row of a pair that is friends again stays deleted
+            if user1 is not None and user2 is not None and user2 not in added.get(user1, ()):
+                removed.setdefault(user1, set()).add(user2)
+                removed.setdefault(user2, set()).add(user1)
+        view.merge(added, removed)
+
+        view.deleted_ids.update(
+            User.all_objects.filter(is_deleted=True, updated_at__gt=since)
+            .values_list("id", flat=True))
+        if view.deleted_ids:
+            # restored through the admin
+            view.deleted_ids.difference_update(
+                User.all_objects.filter(
+                    id__in=view.deleted_ids, is_deleted=False, updated_at__gt=since)
+                .values_list("id", flat=True))
+        view.deleted = {
+            node for node in map(view.node, view.deleted_ids) if node is not None
+        }
+        return view
+
+    def merge(self, added, removed):
+        # copy on write: sets shared with the previous view stay intact
+        for node in added.keys() | removed.keys():
+            new, gone = added.get(node, set()), removed.get(node, set())
+            self.added[node] = (self.added.get(node, set()) | new) - gone
+            self.removed[node] = (self.removed.get(node, set()) | gone) - new
+
+    def node(self, user_id, create=False):
+        node = self.snapshot.find(user_id)
+        if node is None:
+            node = self.extra_index.get(user_id)
+        if node is None and create:
+            node = self.extra_index[user_id] = self.snapshot.node_count + len(self.extra_ids)
+            self.extra_ids.append(user_id)
+        return node
+
+    def user_id(self, node):
+        if node < self.snapshot.node_count:
+            return self.snapshot.uuid_at(node)
+        return self.extra_ids[node - self.snapshot.node_count]
+
+    def friends(self, node):
+        friends = self.snapshot.friends(node) if node < self.snapshot.node_count else ()
+        added, removed = self.added.get(node), self.removed.get(node)
+        if added or removed:
+            return (set(friends) | (added or set())) - (removed or set())
+        return friends
+
+
+class FriendGraphService:
+    """
+    Holds the current GraphView: the snapshot file, reloaded when it
+    changes, plus a delta reloaded every DELTA_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        # `lock` guards reading and publishing `view`; `refresh_lock`
+        # keeps two threads from loading the same delta
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.view = None
+        self.delta_loaded_at = 0.0
+
+    def refresh(self):
+        config = graph_settings()
+        path = config["SNAPSHOT_PATH"]
+        with self.refresh_lock:
+            view = self.view
+            mtime = os.stat(path).st_mtime if os.path.exists(path) else None
+            if view is None or (view.snapshot.path, view.snapshot.mtime) != (path, mtime):
+                snapshot = CSRSnapshot(path) if mtime else CSRSnapshot.empty(path)
+                view = GraphView(snapshot)
+                self.delta_loaded_at = 0.0
+            if time.time() - self.delta_loaded_at >= config["DELTA_REFRESH_SECONDS"]:
+                started = time.time()
+                view = view.load_delta()
+                self.delta_loaded_at = started
+            with self.lock:
+                self.view = view
+
+    def shortest_path(self, source_id, target_id, max_hops=None):
+        """
+        Bidirectional BFS from both ends, always expanding the smaller
+        frontier. Returns the list of user ids on a shortest path, or
+        None when the users are further apart than `max_hops` or either
+        of them is deleted.
+        """
+        max_hops = max_hops or graph_settings()["MAX_HOPS"]
+        self.refresh()
+        with self.lock:
+            view = self.view
+        source = view.node(source_id)
+        target = view.node(target_id)
+        if source is None or target is None or {source, target} & view.deleted:
+            return None
+        if source == target:
+            return [source_id]
+
+        parents = ({source: None}, {target: None})
+        depths = ({source: 0}, {target: 0})
+        frontiers = [[source], [target]]
+        hops = 0
+        while frontiers[0] and frontiers[1] and hops < max_hops:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, depth = parents[side], depths[side]
+            other_depth = depths[1 - side]
+            best = None
+            next_frontier = []
+            # finish the whole level: the first meeting point found is
+            # not necessarily on the shortest path
+            for node in frontiers[side]:
+                for friend in view.friends(node):
+                    if friend in seen or friend in view.deleted:
+                        continue
+                    seen[friend] = node
+                    depth[friend] = depth[node] + 1
+                    next_frontier.append(friend)
+                    if friend in other_depth:
+                        length = depth[friend] + other_depth[friend]
+                        if best is None or length < best[0]:
+                            best = (length, friend)
+            if best is not None:
+                return self._path(view, parents, best[1])
+            frontiers[side] = next_frontier
+            hops += 1
+        return None
+
+    def _path(self, view, parents, meeting):
+        forward = []
+        node = meeting
+        while node is not None:
+            forward.append(node)
+            node = parents[0][node]
+        forward.reverse()
+        node = parents[1][meeting]
+        while node is not None:
+            forward.append(node)
+            node = parents[1][node]
+        return [view.user_id(node) for node in forward]
+
+
+friend_graph = FriendGraphService()
@@ -0,0 +1,250 @@
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from rest_framework import status
+from rest_framework.exceptions import APIException as DRFAPIException
+
+
+def hashing_pool_settings():
+    config = {
+        "WORKERS": None,
+        "MAX_PENDING": 64,
+        "TIMEOUT": 10,
+        "RETRY_AFTER": 1,
+    }
+    config.update(getattr(settings, "PASSWORD_HASHING_POOL", {}))
+    return config
+
+
+class HashingPoolBusy(DRFAPIException):
+    """
+    Raised instead of queueing when MAX_PENDING hashes are already in
+    flight, so a login storm is shed with a fast 503 rather than piling
+    up on every worker thread.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, please retry shortly."
+    default_code = "hashing_pool_busy"
+
+    def __init__(self, wait=None):
+        super().__init__()
+        self.wait = wait
+
+
+def _pbkdf2(password, salt, iterations, digest_name):
+    """
+    Runs in a pool process. Returns the encoded hash and how long the
+    computation itself took.
+    """
+    started = time.perf_counter()
+    hash = hashlib.pbkdf2_hmac(digest_name, password, salt, iterations)
+    hash = base64.b64encode(hash).decode("ascii").strip()
+    return hash, time.perf_counter() - started
+
+
+class HashingStats:
+    """
+    Per-algorithm counters: completed operations, rejected (busy)
+    requests, time spent hashing in the pool and time spent waiting for
+    a free pool process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.algorithms = {}
+
+    def record(self, algorithm, compute_seconds=0.0, wait_seconds=0.0, rejected=False):
+        with self.lock:
+            stats = self.algorithms.setdefault(algorithm, {
+                "operations": 0,
+                "rejected": 0,
+                "compute_seconds": 0.0,
+                "wait_seconds": 0.0,
+                "max_seconds": 0.0,
+            })
+            if rejected:
+                stats["rejected"] += 1
+                return
+            stats["operations"] += 1
+            stats["compute_seconds"] += compute_seconds
+            stats["wait_seconds"] += wait_seconds
+            stats["max_seconds"] = max(stats["max_seconds"], compute_seconds + wait_seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {algorithm: dict(stats) for algorithm, stats in self.algorithms.items()}
+
+    def reset(self):
+        with self.lock:
+            self.algorithms.clear()
+
+
+hashing_stats = HashingStats()
+
+
+class HashingPool:
+    """
+    Bounded process pool for password hashing. Hashes run one per core
+    in worker processes instead of on request threads, so a login storm
+    cannot starve the rest of the API of CPU or, under ASGI, block the
+    event loop.
+
+    At most MAX_PENDING hashes may be queued or running at once; beyond
+    that submit() raises HashingPoolBusy immediately. WORKERS = 0 hashes
+    inline in the calling thread (still counted in the stats), None uses
+    one process per CPU.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+        self.slots = None
+
+    def get_executor(self):
+        config = hashing_pool_settings()
+        with self.lock:
+            # a pool inherited through fork() belongs to the parent
+            if self.pid != os.getpid():
+                self.executor = None
+                self.pid = os.getpid()
+                self.slots = threading.BoundedSemaphore(config["MAX_PENDING"])
+                workers = config["WORKERS"]
+                if workers is None:
+                    workers = os.cpu_count() or 1
+                if workers:
+                    self.executor = ProcessPoolExecutor(max_workers=workers)
+            return self.executor, self.slots
+
+    def submit(self, algorithm, fn, *args):
+        executor, slots = self.get_executor()
+        if not slots.acquire(blocking=False):
+            hashing_stats.record(algorithm, rejected=True)
+            raise HashingPoolBusy(wait=hashing_pool_settings()["RETRY_AFTER"])
+
+        queued_at = time.perf_counter()
+        if executor is None:
+            try:
+                hash, compute_seconds = fn(*args)
+            finally:
+                slots.release()
+            hashing_stats.record(algorithm, compute_seconds)
+            return hash
+
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: slots.release())
+        future.add_done_callback(lambda done: self._record(algorithm, queued_at, done))
+        return future
+
+    def _record(self, algorithm, queued_at, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, compute_seconds = future.result()
+        total = time.perf_counter() - queued_at
+        hashing_stats.record(algorithm, compute_seconds, max(total - compute_seconds, 0.0))
+
+    def run(self, algorithm, fn, *args):
+        result = self.submit(algorithm, fn, *args)
+        if isinstance(result, str):
+            return result
+        try:
+            return result.result(timeout=hashing_pool_settings()["TIMEOUT"])[0]
+        except FutureTimeoutError:
+            raise HashingPoolBusy(wait=hashing_pool_settings()["RETRY_AFTER"])
+
+    async def arun(self, algorithm, fn, *args):
+        result = self.submit(algorithm, fn, *args)
+        if isinstance(result, str):
+            return result
+        try:
+            hash, _ = await asyncio.wait_for(
+                asyncio.wrap_future(result), hashing_pool_settings()["TIMEOUT"])
+        except asyncio.TimeoutError:
+            raise HashingPoolBusy(wait=hashing_pool_settings()["RETRY_AFTER"])
+        return hash
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.pid = None
+
+
+hashing_pool = HashingPool()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the key derivation run in `hashing_pool`.
+
+    Produces and accepts exactly the same "pbkdf2_sha256$..." strings as
+    Django's PBKDF2PasswordHasher, so it replaces that entry in
+    PASSWORD_HASHERS (two hashers may not share an algorithm name) and
+    existing passwords keep working.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = hashing_pool.run(self.algorithm, *self.pbkdf2_args(password, salt, iterations))
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+    async def aencode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = await hashing_pool.arun(self.algorithm, *self.pbkdf2_args(password, salt, iterations))
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+    async def averify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = await self.aencode(password, decoded["salt"], decoded["iterations"])
+        return constant_time_compare(encoded, encoded_2)
+
+    def pbkdf2_args(self, password, salt, iterations):
+        return _pbkdf2, force_bytes(password), force_bytes(salt), iterations, self.digest().name
+
+
+async def acheck_password(password, encoded, setter=None):
+    """
+    Async check_password() that awaits the pool instead of hashing on the
+    event loop. Other hashers run in a thread through sync_to_async.
+    `setter` is a coroutine function, called when the hash needs upgrading.
+    """
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    if not isinstance(hasher, PooledPBKDF2PasswordHasher):
+        return await sync_to_async(check_password)(password, encoded)
+
+    is_correct = await hasher.averify(password, encoded)
+    if setter and is_correct and hasher.must_update(encoded):
+        await setter(password)
+    return is_correct
+
+
+async def amake_password(password):
+    """
+    Async make_password() for hashers running in the pool.
+    """
+    hasher = get_hasher()
+    if password is None or not isinstance(hasher, PooledPBKDF2PasswordHasher):
+        return await sync_to_async(make_password)(password)
+    return await hasher.aencode(password, hasher.salt())
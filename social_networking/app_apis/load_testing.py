@@ -0,0 +1,335 @@
+import http.client
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .jwt import get_tokens_for_user
+from .models import User, FriendRequest
+from .search_cache import bump_user_version
+from .seeding import SocialGraphGenerator, get_writer, refresh_derived_data, seed_social_graph
+
+# Benchmarked URL names, in the order they run: respond-friend-request
+# answers the requests sent by send-friend-request.
+ENDPOINTS = (
+    "user-register",
+    "user-login",
+    "user-detail",
+    "user-search",
+    "send-friend-request",
+    "respond-friend-request",
+    "user-friends-list",
+    "pending-friend-requests",
+)
+PASSWORD = "benchmark-password"
+
+
+class ClientTransport:
+    """
+    Requests through DRF's test client, one client and database
+    connection per worker thread; counts the queries of every request.
+    """
+    name = "client"
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, body, token):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = APIClient()
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(path, body, format="json", **headers)
+        return response.status_code, len(queries.captured_queries)
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """
+    Requests over HTTP to a running server (runserver, gunicorn, uvicorn),
+    one keep-alive connection per worker thread. Query counts are not
+    visible from here and are reported as null.
+    """
+    name = "http"
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.local = threading.local()
+
+    def request(self, method, path, body, token):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.connection_class(self.netloc, timeout=60)
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = json.dumps(body) if body is not None and method != "get" else None
+        try:
+            conn.request(method.upper(), path, payload, headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        return response.status, None
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class LoadTest:
+    """
+    Drives the real URL routes with `concurrency` worker threads.
+
+    Benchmark users are created up front with a shared password hash
+    and emails under a per-run prefix, so a run can target a database
+    that already holds a seeded graph (see seed_social_graph) and be
+    cleaned up afterwards. Read endpoints are called as the existing
+    users with the most friends and pending requests.
+    """
+
+    def __init__(self, transport, requests=200, concurrency=8, seed=0):
+        self.transport = transport
+        self.requests = requests
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+
+    def setup(self):
+        # enough users for `requests` distinct (sender, receiver) pairs
+        count = math.ceil(math.sqrt(2 * self.requests)) + 2
+        password = make_password(PASSWORD)
+        self.users = User.objects.bulk_create([
+            User(email=f"{self.prefix}{i}@example.com", name=f"Benchmark User {i}",
+                 tc=True, password=password)
+            for i in range(count)
+        ])
+        # bulk_create sends no post_save
+        bump_user_version()
+        self.tokens = {user.pk: get_tokens_for_user(user)["access"] for user in self.users}
+        self.readers = {}
+        for field in ("friend_count", "pending_request_count"):
+            readers = list(
+                User.objects.filter(**{f"{field}__gt": 0})
+                .exclude(email__startswith=self.prefix)
+                .order_by(f"-{field}", "pk")[:self.concurrency * 4]
+            ) or self.users
+            self.readers[field] = [get_tokens_for_user(user)["access"] for user in readers]
+        self.search_terms = sorted({
+            word[:4]
+            for name in User.objects.exclude(email__startswith=self.prefix)
+            .order_by("pk").values_list("name", flat=True)[:500]
+            for word in name.split() if len(word) >= 3
+        }) or ["Bench"]
+
+    def teardown(self):
+        User.objects.filter(email__startswith=self.prefix).delete()
+
+    def calls(self, name):
+        """
+        (method, path, body, token) of every request of one endpoint.
+        """
+        n, rng = self.requests, self.rng
+        path = reverse(name) if name != "respond-friend-request" else None
+        if name == "user-register":
+            return [("post", path, {
+                "email": f"{self.prefix}new-{i}@example.com", "name": f"New User {i}",
+                "password": PASSWORD, "password2": PASSWORD, "tc": True,
+            }, None) for i in range(n)]
+        if name == "user-login":
+            return [("post", path, {
+                "email": rng.choice(self.users).email, "password": PASSWORD,
+            }, None) for _ in range(n)]
+        if name == "user-detail":
+            return [("get", path, None, rng.choice(self.readers["friend_count"]))
+                    for _ in range(n)]
+        if name == "user-search":
+            return [("get", f"{path}?search={rng.choice(self.search_terms)}", None,
+                     rng.choice(self.readers["friend_count"])) for _ in range(n)]
+        if name == "send-friend-request":
+            pairs = [
+                (sender, receiver)
+                for index, receiver in enumerate(self.users)
+                for sender in self.users[:index]
+            ][:n]
+            return [("post", path, {"receiver_id": str(receiver.pk)}, self.tokens[sender.pk])
+                    for sender, receiver in pairs]
+        if name == "respond-friend-request":
+            pending = FriendRequest.objects.filter(
+                receiver__in=self.users, status="pending"
+            ).order_by("created_at").values_list("pk", "receiver_id")
+            return [(
+                "put", reverse(name, kwargs={"pk": pk}),
+                {"status": "accepted" if i % 2 == 0 else "rejected"}, self.tokens[receiver_id],
+            ) for i, (pk, receiver_id) in enumerate(pending)]
+        if name == "user-friends-list":
+            return [("get", path, None, rng.choice(self.readers["friend_count"]))
+                    for _ in range(n)]
+        if name == "pending-friend-requests":
+            return [("get", path, None, rng.choice(self.readers["pending_request_count"]))
+                    for _ in range(n)]
+        raise ValueError(f"No benchmark calls for {name}")
+
+    def run_endpoint(self, name):
+        calls = self.calls(name)
+        pending = iter(calls)
+        lock = threading.Lock()
+        latencies, queries, errors = [], [], []
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        call = next(pending, None)
+                    if call is None:
+                        return
+                    started = time.perf_counter()
+                    try:
+                        status_code, query_count = self.transport.request(*call)
+                    except Exception as exc:
+                        status_code, query_count = repr(exc), None
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if query_count is not None:
+                            queries.append(query_count)
+                        if not isinstance(status_code, int) or status_code >= 400:
+                            errors.append(status_code)
+            finally:
+                self.transport.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as threads:
+            for future in [threads.submit(worker) for _ in range(self.concurrency)]:
+                future.result()
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": len(calls),
+            "errors": len(errors),
+            "error_statuses": sorted({str(status) for status in errors}),
+            "throughput_rps": round(len(calls) / wall, 1) if wall else None,
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            "p50_ms": self.ms(percentile(latencies, 0.50)),
+            "p95_ms": self.ms(percentile(latencies, 0.95)),
+            "p99_ms": self.ms(percentile(latencies, 0.99)),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def ms(self, seconds):
+        return round(seconds * 1000, 2) if seconds is not None else None
+
+    def run(self, endpoints=ENDPOINTS):
+        self.setup()
+        try:
+            return {name: self.run_endpoint(name) for name in endpoints}
+        finally:
+            self.teardown()
+
+
+@contextmanager
+def benchmark_database(users, seed=0):
+    """
+    Run the body against a throwaway test database seeded with a
+    `users`-user synthetic graph, with throttle rates raised so they
+    never reject benchmark traffic (the throttles themselves still run).
+    """
+    if connection.vendor == "sqlite":
+        # the shared in-memory test database fails concurrent writers
+        # with "table is locked"; a file with IMMEDIATE transactions
+        # makes them wait for the write lock instead
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            tempfile.gettempdir(), "benchmark_api.sqlite3")
+        connection.settings_dict["OPTIONS"].update(
+            transaction_mode="IMMEDIATE", timeout=30)
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed_social_graph(SocialGraphGenerator(users, seed=seed), "seed-password", get_writer())
+        refresh_derived_data()
+        rates = {
+            scope: "1000000/s"
+            for scope in settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+        }
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates,
+        }):
+            yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare endpoint results with a saved report. Latency and throughput
+    may drift by `tolerance` (a fraction) before counting as a
+    regression; half a query more per request on average does (cache
+    races make the average wobble slightly). Returns a list of human
+    readable regressions.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[metric] and previous.get(metric) \
+                    and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {previous[metric]} -> {current[metric]}")
+        if current["throughput_rps"] and previous.get("throughput_rps") \
+                and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput_rps {previous['throughput_rps']} -> "
+                f"{current['throughput_rps']}")
+        if current["queries_per_request"] is not None \
+                and previous.get("queries_per_request") is not None \
+                and current["queries_per_request"] >= previous["queries_per_request"] + 0.5:
+            regressions.append(
+                f"{name}: queries_per_request {previous['queries_per_request']} -> "
+                f"{current['queries_per_request']}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
@@ -0,0 +1,147 @@
+import atexit
+import itertools
+import logging
+import os
+import queue
+import traceback
+import uuid
+from datetime import date, datetime, time, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from .renderers import dumps
+
+# LogRecord attributes that are not `extra=` fields
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "taskName",
+}
+# values that are safe to hold until the listener formats the record
+PRIMITIVES = (str, int, float, bool, type(None))
+# values dumps() encodes as themselves
+JSON_SCALARS = PRIMITIVES + (uuid.UUID, date, datetime, time)
+
+
+def json_safe(value):
+    """
+    `value` if dumps() encodes it as JSON data, containers converted
+    item by item, and str(value) for anything else. DRF's encoder would
+    turn iterables such as the HttpRequest of django.request logs into
+    a list of their items.
+    """
+    if isinstance(value, JSON_SCALARS):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): json_safe(item) for key, item in value.items()}
+    return str(value)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, module, function and
+    message, plus every `extra=` field of the call (endpoint, user, ...)
+    and the traceback when there is one. Extras that are not JSON data
+    are written as their str(). The %-style message arguments are only
+    merged here, on the listener thread in queue mode.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = json_safe(value)
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return dumps(entry).decode("utf-8")
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in N success records per endpoint. `rates` maps the
+    `endpoint` extra of a log call (a URL name) to N; records of other
+    endpoints, without an endpoint, or above INFO always pass. Kept
+    records carry `sample_rate` so counts can be scaled back up.
+    """
+
+    def __init__(self, rates=None, name=""):
+        super().__init__(name)
+        self.rates = dict(rates or {})
+        # next() on itertools.count is atomic under the GIL
+        self.counters = {endpoint: itertools.count() for endpoint in self.rates}
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        endpoint = getattr(record, "endpoint", None)
+        rate = self.rates.get(endpoint)
+        if not rate or rate <= 1:
+            return True
+        if next(self.counters[endpoint]) % rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Hands records to a QueueListener thread that runs `handlers`, so the
+    logging call only costs a queue put. Configure it in LOGGING with
+    the target handlers as "cfg://handlers.<name>" references; dictConfig
+    builds handlers in name order, so its own name must sort after theirs.
+
+    Records whose message arguments are all str, numbers, bools or None
+    go through the in-process queue untouched, to be merged on the
+    listener thread. Other arguments may change or go away before the
+    listener gets to them, so those messages are merged on the calling
+    thread.
+    """
+
+    def __init__(self, handlers, respect_handler_level=True):
+        handlers = [handlers[index] for index in range(len(handlers))]
+        if not all(isinstance(handler, logging.Handler) for handler in handlers):
+            raise ValueError(
+                "BackgroundQueueHandler targets must be configured first: "
+                "give it a name sorting after theirs")
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(
+            self.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.stop)
+        # listener threads do not survive fork (e.g. gunicorn --preload)
+        os.register_at_fork(after_in_child=self.restart)
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, PRIMITIVES) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def restart(self):
+        if self.listener._thread is None:
+            # stopped or replaced by a later dictConfig before the fork
+            return
+        self.listener._thread = None
+        self.queue = self.listener.queue = queue.SimpleQueue()
+        self.listener.start()
+
+    def close(self):
+        self.stop()
+        super().close()
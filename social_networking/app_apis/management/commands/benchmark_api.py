@@ -0,0 +1,90 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...load_testing import (
+    ENDPOINTS, ClientTransport, HTTPTransport, LoadTest, benchmark_database, compare,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the API routes (register, login, detail, search, send/respond "
+        "friend request, friends list, pending requests) with a pool of "
+        "concurrent clients and report throughput, p50/p95/p99 latency and "
+        "queries per request as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Requests per endpoint")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument(
+            "--url",
+            help="Drive a running server at this base URL (e.g. http://127.0.0.1:8000) "
+                 "using its database as-is, instead of the test client on a fresh "
+                 "test database",
+        )
+        parser.add_argument("--users", type=int, default=2000,
+                            help="Users seeded into the test database (test client only)")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--save-baseline", help="Also write the report here")
+        parser.add_argument("--baseline", help="Compare against a saved report")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed latency/throughput drift, as a fraction")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        meta = {
+            "transport": "http" if options["url"] else "client",
+            "database": connection.vendor,
+            "async_views": getattr(settings, "ASYNC_VIEWS", False),
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "seed": options["seed"],
+        }
+        if options["url"]:
+            meta["url"] = options["url"]
+            results = self.run(HTTPTransport(options["url"]), options)
+        else:
+            meta["users"] = options["users"]
+            results = self.run_on_test_database(options)
+        report = {"meta": meta, "endpoints": results}
+
+        regressions = []
+        if options["baseline"]:
+            with open(options["baseline"]) as handle:
+                regressions = compare(results, json.load(handle), options["tolerance"])
+            report["regressions"] = regressions
+
+        output = json.dumps(report, indent=2)
+        for path in (options["output"], options["save_baseline"]):
+            if path:
+                with open(path, "w") as handle:
+                    handle.write(output + "\n")
+        self.stdout.write(output)
+
+        if regressions:
+            message = "Regressions against the baseline:\n  " + "\n  ".join(regressions)
+            if options["fail_on_regression"]:
+                raise CommandError(message)
+            self.stderr.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Benchmarked {len(results)} endpoints, {options['requests']} requests each"))
+
+    def run(self, transport, options):
+        return LoadTest(
+            transport,
+            requests=options["requests"],
+            concurrency=options["concurrency"],
+            seed=options["seed"],
+        ).run(options["endpoints"])
+
+    def run_on_test_database(self, options):
+        with benchmark_database(options["users"], options["seed"]):
+            return self.run(ClientTransport(), options)
@@ -0,0 +1,120 @@
+import copy
+import logging
+import logging.config
+import os
+import statistics
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...load_testing import ClientTransport, LoadTest, benchmark_database
+
+MODES = ("off", "sync", "queue")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare request throughput with logging off, with the handlers on "
+        "the request thread (sync) and behind the background queue (queue)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500,
+                            help="Requests per endpoint and mode")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--rounds", type=int, default=3)
+        parser.add_argument(
+            "--endpoints", nargs="+",
+            default=["user-detail", "user-search", "user-friends-list"],
+        )
+        parser.add_argument("--no-sampling", action="store_true",
+                            help="Log every success instead of sampling them")
+
+    def handle(self, *args, **options):
+        results = {mode: [] for mode in MODES}
+        with tempfile.TemporaryDirectory() as directory, \
+                open(os.devnull, "w") as devnull, \
+                benchmark_database(options["users"]):
+            try:
+                # untimed pass: connections, caches and indexes warm up
+                logging.disable(logging.CRITICAL)
+                self.run(options)
+                # modes take turns so drift affects them all alike
+                for _ in range(options["rounds"]):
+                    for mode in MODES:
+                        if mode == "off":
+                            logging.disable(logging.CRITICAL)
+                        else:
+                            logging.disable(logging.NOTSET)
+                            logging.config.dictConfig(self.logging_config(
+                                mode, directory, devnull, options["no_sampling"]))
+                        results[mode].append(self.run(options))
+            finally:
+                logging.disable(logging.NOTSET)
+                logging.config.dictConfig(settings.LOGGING)
+
+        self.stdout.write(
+            f"Median of {options['rounds']} rounds, {options['requests']} requests each")
+        self.stdout.write(f"{'endpoint':<20}" + "".join(
+            f"{mode + ' req/s':>14}{mode + ' p95 ms':>14}" for mode in MODES))
+        for endpoint in options["endpoints"]:
+            self.stdout.write(f"{endpoint:<20}" + "".join(
+                f"{self.median(results[mode], endpoint, 'throughput_rps'):>14}"
+                f"{self.median(results[mode], endpoint, 'p95_ms'):>14}"
+                for mode in MODES))
+
+    def run(self, options):
+        return LoadTest(
+            ClientTransport(),
+            requests=options["requests"],
+            concurrency=options["concurrency"],
+        ).run(options["endpoints"])
+
+    def median(self, rounds, endpoint, metric):
+        return statistics.median(result[endpoint][metric] for result in rounds)
+
+    def logging_config(self, mode, directory, console_stream, no_sampling):
+        """
+        settings.LOGGING's formatters and sampling filter with the file
+        handler writing to `directory` and the console to /dev/null.
+        """
+        sampling = copy.deepcopy(settings.LOGGING["filters"]["sampling"])
+        if no_sampling:
+            sampling["rates"] = {}
+        target_filters = ["sampling"] if mode == "sync" else []
+        handlers = {
+            "console": {
+                "class": "logging.StreamHandler",
+                "stream": console_stream,
+                "formatter": "json",
+                "filters": target_filters,
+            },
+            "file": {
+                "class": "logging.handlers.RotatingFileHandler",
+                "filename": os.path.join(directory, "benchmark.log"),
+                "maxBytes": 10 * 1024 * 1024,
+                "backupCount": 2,
+                "formatter": "json",
+                "filters": target_filters,
+            },
+        }
+        if mode == "queue":
+            handlers["queue"] = {
+                "()": "social_networking.app_apis.log_handlers.BackgroundQueueHandler",
+                "handlers": ["cfg://handlers.console", "cfg://handlers.file"],
+                "filters": ["sampling"],
+            }
+        names = ["queue"] if mode == "queue" else ["console", "file"]
+        return {
+            "version": 1,
+            "disable_existing_loggers": False,
+            "formatters": copy.deepcopy(settings.LOGGING["formatters"]),
+            "filters": {"sampling": sampling},
+            "handlers": handlers,
+            "loggers": {
+                "django": {"handlers": names, "level": "INFO"},
+                "root": {"handlers": names, "level": "INFO"},
+            },
+        }
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+
+from ...hashing import PooledPBKDF2PasswordHasher, hashing_pool, hashing_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare password hashing throughput under concurrent callers: "
+        "Django's PBKDF2 hasher on request threads vs the hashing pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--operations", type=int, default=64)
+        parser.add_argument(
+            "--concurrency", type=int, default=16,
+            help="Number of threads hashing at once (request threads)",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=None,
+            help="PBKDF2 iterations (default: the hasher's own)",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"] or PBKDF2PasswordHasher.iterations
+        for label, hasher in (
+            ("inline", PBKDF2PasswordHasher()),
+            ("pool", PooledPBKDF2PasswordHasher()),
+        ):
+            hashing_stats.reset()
+            elapsed = self.run(hasher, iterations, options["operations"], options["concurrency"])
+            self.stdout.write(
+                f"{label:>6}: {options['operations'] / elapsed:8.1f} hashes/s "
+                f"({elapsed:.2f}s for {options['operations']})"
+            )
+            for algorithm, stats in hashing_stats.snapshot().items():
+                self.stdout.write(f"        {algorithm}: {stats}")
+        hashing_pool.shutdown()
+
+    def run(self, hasher, iterations, operations, concurrency):
+        salt = hasher.salt()
+        # warm up, so pool start-up is not timed
+        hasher.encode("warm-up", salt, 1)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as threads:
+            list(threads.map(
+                lambda i: hasher.encode(f"password-{i}", salt, iterations),
+                range(operations),
+            ))
+        return time.perf_counter() - started
@@ -0,0 +1,62 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import User
+from ...v1.networking_application.serializers import UserSerializer, USER_PROJECTION
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-row cost of UserSerializer vs USER_PROJECTION, "
+        "in memory and (when users exist) including the database fetch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        now = timezone.now()
+        users = [
+            User(id=uuid.uuid4(), email=f"user{i}@example.com", name=f"User {i}",
+                 tc=True, password="!", created_at=now, updated_at=now)
+            for i in range(rows)
+        ]
+        values = [
+            {"id": user.id, "created_at": user.created_at, "email": user.email, "name": user.name}
+            for user in users
+        ]
+        if UserSerializer(users, many=True).data != USER_PROJECTION.map(values):
+            self.stderr.write(self.style.ERROR("Projection output differs from UserSerializer"))
+            return
+
+        self.report("map only", rows, repeat, {
+            "serializer": lambda: UserSerializer(users, many=True).data,
+            "projection": lambda: USER_PROJECTION.map(values),
+        })
+
+        queryset = User.objects.order_by("-created_at", "-id")[:rows]
+        fetched = queryset.count()
+        if fetched:
+            self.report("fetch + map", fetched, repeat, {
+                "serializer": lambda: UserSerializer(list(queryset), many=True).data,
+                "projection": lambda: USER_PROJECTION.map(
+                    list(USER_PROJECTION.apply(queryset))),
+            })
+
+    def report(self, label, rows, repeat, cases):
+        self.stdout.write(f"{label} ({rows} rows):")
+        timings = {}
+        for name, case in cases.items():
+            case()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                case()
+            timings[name] = (time.perf_counter() - started) / (repeat * rows)
+            self.stdout.write(f"  {name:>10}: {timings[name] * 1e6:8.2f} us/row")
+        self.stdout.write(
+            f"  {'speedup':>10}: {timings['serializer'] / timings['projection']:8.1f}x")
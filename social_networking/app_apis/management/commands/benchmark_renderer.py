@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ... import renderers
+from ...custom_response import page_envelope
+from ...renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure render throughput of DRF's JSONRenderer vs FastJSONRenderer "
+        "on a page of users"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # raw UUIDs and datetimes, the values orjson encodes natively
+        page = {
+            "count": options["rows"],
+            "next": "http://testserver/api/v1/user/search/?page=2",
+            "previous": None,
+            "results": [
+                {"id": uuid.uuid4(), "email": f"user{i}@example.com",
+                 "name": f"User {i}", "created_at": now}
+                for i in range(options["rows"])
+            ],
+        }
+        body = page_envelope("User Fetched Successfully", page)
+
+        cases = {"JSONRenderer": JSONRenderer(), "FastJSONRenderer": FastJSONRenderer()}
+        outputs = {name: renderer.render(body) for name, renderer in cases.items()}
+        if len(set(outputs.values())) != 1:
+            self.stderr.write(self.style.ERROR("Renderers produced different output"))
+            return
+
+        backend = "orjson" if renderers.orjson is not None else "json (orjson not installed)"
+        self.stdout.write(f"{options['rows']} rows per response, FastJSONRenderer on {backend}:")
+        timings = {}
+        for name, renderer in cases.items():
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                renderer.render(body)
+            timings[name] = time.perf_counter() - started
+            self.stdout.write(
+                f"  {name:>16}: {options['repeat'] / timings[name]:10.0f} responses/s")
+        self.stdout.write(
+            f"  {'speedup':>16}: {timings['JSONRenderer'] / timings['FastJSONRenderer']:10.1f}x")
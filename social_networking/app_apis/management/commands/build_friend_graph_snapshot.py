@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ...graph_snapshot import build_snapshot, graph_settings
+
+
+class Command(BaseCommand):
+    help = "Write the memory-mapped CSR snapshot of the friendship graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=None,
+            help="Snapshot file, defaults to FRIEND_GRAPH['SNAPSHOT_PATH']",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or graph_settings()["SNAPSHOT_PATH"]
+        nodes, edges = build_snapshot(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path}: {nodes} users, {edges} directed edges"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ...friend_suggestions import refresh_all_suggestions, refresh_stale_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute 'people you may know' suggestions from an in-memory "
+        "copy of the friendship graph"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only refresh users whose friendships changed, and their friends",
+        )
+        parser.add_argument("--top-n", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["incremental"]:
+            refresh = refresh_stale_suggestions
+        else:
+            refresh = refresh_all_suggestions
+        users, written = refresh(
+            top_n=options["top_n"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} suggestions for {users} users"))
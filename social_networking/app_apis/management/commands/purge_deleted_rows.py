@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...purge import count_soft_deleted, purge_soft_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        "Hard-delete soft-deleted users, friend requests and friendships, "
+        "and the rows cascading from them, in small batches with a short "
+        "transaction each"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--older-than-days", type=float, default=30,
+                            help="Only purge rows soft-deleted at least this long ago")
+        parser.add_argument("--pause", type=float, default=0.05,
+                            help="Seconds to sleep after every batch")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only count the rows that would be purged")
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options["older_than_days"])
+        if options["dry_run"]:
+            for label, count in count_soft_deleted(older_than).items():
+                self.stdout.write(f"{label}: {count} soft-deleted rows to purge")
+            return
+
+        def progress(model, deleted):
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"{model._meta.label}: {deleted[model._meta.label]} purged")
+
+        deleted = purge_soft_deleted(
+            batch_size=options["batch_size"],
+            older_than=older_than,
+            pause=options["pause"],
+            progress=progress,
+        )
+        summary = ", ".join(f"{label}: {count}" for label, count in sorted(deleted.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {sum(deleted.values())} rows" + (f" ({summary})" if summary else "")))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...search import rebuild_gram_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the n-gram user search index from the User table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_gram_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} users"))
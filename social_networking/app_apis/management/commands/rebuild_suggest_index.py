@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...checks import process_local_cache
+from ...suggest import bump_suggest_version, suggest_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the autocomplete prefix index. Bumps the index version in "
+        "the SUGGEST_INDEX[\"ALIAS\"] cache so every server process rebuilds "
+        "on its next suggest call; that cache must be shared by them."
+    )
+
+    def handle(self, *args, **options):
+        if process_local_cache(suggest_settings()["ALIAS"]):
+            raise CommandError(
+                f"SUGGEST_INDEX[\"ALIAS\"] ({suggest_settings()['ALIAS']!r}) is a "
+                "per-process LocMemCache, so running servers would never see the "
+                "new version. Point it at a cache shared by the servers, or "
+                "restart them to rebuild."
+            )
+        version = bump_suggest_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Suggest index version {version}: servers rebuild on their next "
+            f"suggest request"
+        ))
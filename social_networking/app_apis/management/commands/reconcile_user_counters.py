@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ...counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair drift in User.friend_count / pending_request_count by "
+        "recounting friendships and pending requests in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked, repaired = reconcile_counters(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, repaired {repaired}"))
@@ -0,0 +1,394 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .hashing import hashing_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000)
+
+# name: (help, buckets, label names)
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Time spent in the view and middleware below, by URL name",
+        LATENCY_BUCKETS, ("view", "method"),
+    ),
+    "http_request_db_queries": (
+        "Database queries per request", QUERY_BUCKETS, ("view", "method"),
+    ),
+    "http_response_size_bytes": (
+        "Response body size (streamed responses are not measured)",
+        SIZE_BUCKETS, ("view", "method"),
+    ),
+}
+# name: (help, label names)
+COUNTERS = {
+    "http_requests_total": ("Requests by URL name and status", ("view", "method", "status")),
+    "http_request_db_duration_seconds_total": (
+        "Time spent executing database queries", ("view", "method"),
+    ),
+    "password_hashing_operations_total": ("Password hashes computed", ("algorithm",)),
+    "password_hashing_rejected_total": (
+        "Password hashes shed with a 503 (pool busy)", ("algorithm",),
+    ),
+    "password_hashing_compute_seconds_total": (
+        "Time spent hashing in pool processes", ("algorithm",),
+    ),
+    "password_hashing_wait_seconds_total": (
+        "Time spent waiting for a free pool process", ("algorithm",),
+    ),
+    "search_cache_requests_total": ("User search result cache lookups", ("result",)),
+}
+HASHING_COUNTERS = {
+    "operations": "password_hashing_operations_total",
+    "rejected": "password_hashing_rejected_total",
+    "compute_seconds": "password_hashing_compute_seconds_total",
+    "wait_seconds": "password_hashing_wait_seconds_total",
+}
+
+
+def metrics_settings():
+    config = {
+        "ENABLED": True,
+        "MULTIPROCESS_DIR": None,
+        "FLUSH_INTERVAL": 5,
+        "AUTH_TOKEN": None,
+    }
+    config.update(getattr(settings, "METRICS", {}))
+    return config
+
+
+class Shard:
+    """
+    Metrics recorded by a single thread. Only its owner writes to it, so
+    recording takes no lock.
+    """
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        # (name, labels) -> [count per bucket..., count above the last, sum]
+        self.histograms = {}
+        # (name, labels) -> value
+        self.counters = {}
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        values = self.histograms.get(key)
+        if values is None:
+            values = self.histograms[key] = [0] * (len(HISTOGRAMS[name][1]) + 2)
+        values[bisect_left(HISTOGRAMS[name][1], value)] += 1
+        values[-1] += value
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, other):
+        for key, values in list(other.histograms.items()):
+            mine = self.histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                mine[index] += value
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_json(self):
+        return {
+            "histograms": [[name, list(labels), values]
+                           for (name, labels), values in self.histograms.items()],
+            "counters": [[name, list(labels), value]
+                         for (name, labels), value in self.counters.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        shard = cls()
+        shard.histograms = {(name, tuple(labels)): values
+                            for name, labels, values in data["histograms"]}
+        shard.counters = {(name, tuple(labels)): value
+                          for name, labels, value in data["counters"]}
+        return shard
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics, kept as one Shard per thread and only summed
+    when scraped or flushed. The lock is taken when a thread records for
+    the first time and while collecting, never per request.
+
+    With MULTIPROCESS_DIR set, each process writes its totals to its own
+    file there every FLUSH_INTERVAL seconds from a background thread
+    (and on every scrape), and a scrape adds up every file, so any
+    process can answer for all of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.local = threading.local()
+        self.shards = []
+        # shards of finished threads, folded together
+        self.retired = Shard()
+        self.file_name = f"{os.getpid()}-{time.time_ns()}.json"
+        # a flusher of an earlier reset (or of the parent process) sees
+        # its event replaced and stops
+        self.flusher_stopped = threading.Event()
+        self.flusher = None
+
+    def shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = Shard(threading.current_thread())
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def record(self, view, method, status, duration, queries, query_seconds, size):
+        shard = self.shard()
+        labels = (view, method)
+        shard.observe("http_request_duration_seconds", labels, duration)
+        shard.observe("http_request_db_queries", labels, queries)
+        if size is not None:
+            shard.observe("http_response_size_bytes", labels, size)
+        shard.inc("http_requests_total", (view, method, str(status)))
+        shard.inc("http_request_db_duration_seconds_total", labels, query_seconds)
+
+        if self.flusher is None and metrics_settings()["MULTIPROCESS_DIR"]:
+            self.start_flusher()
+
+    def inc(self, name, labels, value=1):
+        """
+        Add to a counter from outside a request's record() call.
+        """
+        self.shard().inc(name, labels, value)
+
+    def collect(self):
+        """
+        Return a Shard holding this process' totals.
+        """
+        total = Shard()
+        with self.lock:
+            for shard in list(self.shards):
+                if shard.thread is not None and not shard.thread.is_alive():
+                    self.retired.merge(shard)
+                    self.shards.remove(shard)
+                else:
+                    total.merge(shard)
+            total.merge(self.retired)
+        for algorithm, stats in hashing_stats.snapshot().items():
+            for field, name in HASHING_COUNTERS.items():
+                total.inc(name, (algorithm,), stats[field])
+        return total
+
+    def start_flusher(self):
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(
+                    target=self.flush_periodically, args=(self.flusher_stopped,),
+                    name="metrics-flush", daemon=True)
+                self.flusher.start()
+
+    def flush_periodically(self, stopped):
+        """
+        Body of the flusher thread, so requests never write the file.
+        """
+        while not stopped.wait(metrics_settings()["FLUSH_INTERVAL"]):
+            if stopped is not self.flusher_stopped:
+                return
+            directory = metrics_settings()["MULTIPROCESS_DIR"]
+            if not directory:
+                continue
+            try:
+                self.flush(directory)
+            except OSError:
+                # retried on the next tick
+                continue
+
+    def flush(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.file_name)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump(self.collect().to_json(), handle)
+        os.replace(temporary, path)
+
+    def collect_all(self):
+        directory = metrics_settings()["MULTIPROCESS_DIR"]
+        if not directory:
+            return self.collect()
+        self.flush(directory)
+        total = Shard()
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as handle:
+                    total.merge(Shard.from_json(json.load(handle)))
+            except (OSError, ValueError):
+                # being replaced by its process right now
+                continue
+        return total
+
+    def exposition(self):
+        """
+        Render every metric in the Prometheus text format.
+        """
+        total = self.collect_all()
+        lines = []
+        for name, (help_text, buckets, label_names) in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (family, labels), values in sorted(total.histograms.items()):
+                if family != name:
+                    continue
+                label_text = format_labels(label_names, labels)
+                cumulative = 0
+                for bound, count in zip(buckets, values):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                count = cumulative + values[-2]
+                lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{label_text}}} {values[-1]}")
+                lines.append(f"{name}_count{{{label_text}}} {count}")
+        for name, (help_text, label_names) in COUNTERS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (family, labels), value in sorted(total.counters.items()):
+                if family == name:
+                    lines.append(f"{name}{{{format_labels(label_names, labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(names, values):
+    return ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+registry = MetricsRegistry()
+# a forked worker (e.g. gunicorn --preload) starts from empty metrics and
+# its own file instead of re-reporting its parent's
+os.register_at_fork(after_in_child=registry.reset)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# set for the duration of a request; sync_to_async copies it into the
+# worker thread, so queries of async views are counted too
+current_query_stats = ContextVar("current_query_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Keep record_query in every connection's execute_wrappers, the list
+    connection.execute_wrapper() pushes to, instead of wrapping each
+    request: connections are per thread, so a per-request wrapper would
+    miss queries that async views run in sync_to_async threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count and time, response size and status for
+    every request, labelled with the URL name of the matched route.
+    Place it first in MIDDLEWARE so the timing covers the whole stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_settings()["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, duration, stats):
+        match = request.resolver_match
+        registry.record(
+            (match.url_name or match.view_name) if match else "unmatched",
+            request.method,
+            response.status_code,
+            duration,
+            stats.count,
+            stats.seconds,
+            None if response.streaming else len(response.content),
+        )
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. The scraper must send METRICS["AUTH_TOKEN"]
+    as a bearer token; without a token configured the endpoint is only
+    open when DEBUG is on.
+    """
+    token = metrics_settings()["AUTH_TOKEN"]
+    if token:
+        if request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,56 @@
+# Generated by Django 5.1 on 2026-10-17 22:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_friendship_edges(apps, schema_editor):
+    """
+    Build both directions of the adjacency index for existing friendships.
+    """
+    Friendship = apps.get_model('app_apis', 'Friendship')
+    FriendshipEdge = apps.get_model('app_apis', 'FriendshipEdge')
+    batch = []
+    for friendship in Friendship.objects.only('id', 'user1_id', 'user2_id').iterator(chunk_size=2000):
+        batch.append(FriendshipEdge(friendship_id=friendship.id, user_id=friendship.user1_id, friend_id=friendship.user2_id))
+        batch.append(FriendshipEdge(friendship_id=friendship.id, user_id=friendship.user2_id, friend_id=friendship.user1_id))
+        if len(batch) >= 2000:
+            FriendshipEdge.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FriendshipEdge.objects.bulk_create(batch, ignore_conflicts=True)
+    # auto_now_add stamps the backfill time, keep the original friendship time instead
+    FriendshipEdge.objects.update(
+        created_at=Subquery(
+            Friendship.objects.filter(id=OuterRef('friendship_id')).values('created_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendshipEdge',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_of_edges', to=settings.AUTH_USER_MODEL)),
+                ('friendship', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='app_apis.friendship')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_edges', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='friendedge_user_created_idx')],
+                'unique_together': {('user', 'friend')},
+            },
+        ),
+        migrations.RunPython(backfill_friendship_edges, migrations.RunPython.noop),
+    ]
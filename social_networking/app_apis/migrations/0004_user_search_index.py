@@ -0,0 +1,72 @@
+# Generated by Django 5.1 on 2026-10-17 22:13
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Postgres only: GIN trigram index serving UPPER(name) LIKE UPPER('%...%'),
+    which is what the name__icontains lookup compiles to.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS user_name_upper_trgm_idx '
+        'ON app_apis_user USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS user_name_upper_trgm_idx')
+
+
+def backfill_search_grams(apps, schema_editor):
+    """
+    Other databases use the portable n-gram index; build it for existing users.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    User = apps.get_model('app_apis', 'User')
+    UserSearchGram = apps.get_model('app_apis', 'UserSearchGram')
+    batch = []
+    for user in User.objects.only('id', 'name').iterator(chunk_size=1000):
+        name = (user.name or '').lower()
+        grams = {name[i:i + 3] for i in range(len(name) - 2)}
+        batch.extend(UserSearchGram(user_id=user.id, gram=gram) for gram in grams)
+        if len(batch) >= 1000:
+            UserSearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    UserSearchGram.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apis', '0003_user_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchGram',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('gram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'user'], name='usersearchgram_gram_idx')],
+                'unique_together': {('user', 'gram')},
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_search_grams, migrations.RunPython.noop),
+    ]
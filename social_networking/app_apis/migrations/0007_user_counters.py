@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-17 22:29
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_counters(apps, schema_editor):
+    """
+    Compute friend_count and pending_request_count for existing users.
+    """
+    User = apps.get_model('app_apis', 'User')
+    FriendRequest = apps.get_model('app_apis', 'FriendRequest')
+    FriendshipEdge = apps.get_model('app_apis', 'FriendshipEdge')
+    friends = (
+        FriendshipEdge.objects.filter(user=OuterRef('pk'))
+        .order_by().values('user').annotate(total=Count('id')).values('total')
+    )
+    pending = (
+        FriendRequest.objects.filter(receiver=OuterRef('pk'), status='pending')
+        .order_by().values('receiver').annotate(total=Count('id')).values('total')
+    )
+    User.objects.update(
+        friend_count=Coalesce(Subquery(friends, output_field=IntegerField()), Value(0)),
+        pending_request_count=Coalesce(Subquery(pending, output_field=IntegerField()), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apis', '0006_friend_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='friend_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='pending_request_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_user_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-17 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apis', '0007_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['receiver', 'created_at', 'id'], name='friendreq_pending_recv_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+
+def make_trigram_index_partial(apps, schema_editor):
+    """
+    Postgres only: rebuild the GIN trigram index of 0004 over live users.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS user_name_upper_trgm_idx')
+    schema_editor.execute(
+        'CREATE INDEX user_name_upper_trgm_idx '
+        'ON app_apis_user USING gin (UPPER(name) gin_trgm_ops) '
+        'WHERE NOT is_deleted'
+    )
+
+
+def make_trigram_index_full(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS user_name_upper_trgm_idx')
+    schema_editor.execute(
+        'CREATE INDEX user_name_upper_trgm_idx '
+        'ON app_apis_user USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apis', '0008_pending_request_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='friendrequest',
+            name='friendreq_pending_recv_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('status', 'pending'), ('is_deleted', False)), fields=['receiver', 'created_at', 'id'], name='friendreq_pending_recv_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='user_created_id_idx'),
+        ),
+        migrations.RunPython(make_trigram_index_partial, make_trigram_index_full),
+    ]
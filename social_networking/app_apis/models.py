@@ -1,9 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
-from .base_models import BaseAbstractModel
+from .base_models import BaseAbstractModel, SoftDeleteManager
 
+# soft-deleted rows are left out of these partial indexes
+LIVE = models.Q(is_deleted=False)
+# FriendshipEdge rows whose friendship and friend are not soft-deleted
+LIVE_FRIEND_EDGE = models.Q(friendship__is_deleted=False, friend__is_deleted=False)
 
-class UserManager(BaseUserManager):
+
+class UserManager(SoftDeleteManager, BaseUserManager):
     def create_user(self, email, name, tc, password=None, password2=None):
         """
         Creates and saves a User with the given email, name, tc and password.
@@ -49,13 +54,24 @@ class User(AbstractBaseUser, BaseAbstractModel):
     tc = models.BooleanField()
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
-
+    # denormalized counters, kept up to date with F() updates by
+    # app_apis/counters.py; repaired by `manage.py reconcile_user_counters`
+    friend_count = models.PositiveIntegerField(default=0)
+    pending_request_count = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
+    all_objects = models.Manager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["name", "tc"]
 
+    class Meta:
+        indexes = [
+            # backs keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='user_created_id_idx',
+                         condition=LIVE),
+        ]
+
     def __str__(self):
         return self.email
     
@@ -98,8 +114,20 @@ class FriendRequest(BaseAbstractModel):
                                 on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices = RequestStatus, default='pending')
 
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         unique_together = ('sender', 'receiver')
+        indexes = [
+            # pending inbox, newest first; answered and deleted requests
+            # are left out so the index only grows with the live backlog
+            models.Index(
+                fields=['receiver', 'created_at', 'id'],
+                name='friendreq_pending_recv_idx',
+                condition=models.Q(status='pending') & LIVE,
+            ),
+        ]
 
     def __str__(self):
         return f"{self.sender} -> {self.receiver}"
@@ -120,8 +148,128 @@ class Friendship(BaseAbstractModel):
         on_delete=models.CASCADE
     )
 
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
     class Meta:
         unique_together = ('user1', 'user2')
 
     def __str__(self):
-        return f"{self.user1} <-> {self.user2}"
\ No newline at end of file
+        return f"{self.user1} <-> {self.user2}"
+
+
+class FriendshipEdge(BaseAbstractModel):
+    """
+    Symmetric adjacency index over Friendship.
+
+    Every friendship is stored twice (A -> B and B -> A) so that the
+    friends of a user can be read with a single indexed range scan
+    on (user, created_at, id).
+    """
+    friendship = models.ForeignKey(
+        Friendship,
+        related_name='edges',
+        on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        User,
+        related_name='friend_edges',
+        on_delete=models.CASCADE
+    )
+    friend = models.ForeignKey(
+        User,
+        related_name='friend_of_edges',
+        on_delete=models.CASCADE
+    )
+
+    class Meta:
+        unique_together = ('user', 'friend')
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at', 'id'],
+                name='friendedge_user_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.friend}"
+
+
+class UserSearchGram(BaseAbstractModel):
+    """
+    Inverted trigram index over User.name, used by the portable n-gram
+    search backend on databases without trigram index support.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='search_grams',
+        on_delete=models.CASCADE
+    )
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('user', 'gram')
+        indexes = [
+            models.Index(fields=['gram', 'user'], name='usersearchgram_gram_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.gram} -> {self.user}"
+
+
+class RateLimitCounter(BaseAbstractModel):
+    """
+    Per-key fixed-window hit counter for the database rate limit backend.
+    """
+    key = models.CharField(max_length=255)
+    window = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('key', 'window')
+
+    def __str__(self):
+        return f"{self.key}@{self.window}: {self.count}"
+
+
+class FriendSuggestion(BaseAbstractModel):
+    """
+    Precomputed "people you may know" entries, ranked by mutual friends.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='friend_suggestions',
+        on_delete=models.CASCADE
+    )
+    suggested = models.ForeignKey(
+        User,
+        related_name='suggested_to',
+        on_delete=models.CASCADE
+    )
+    mutual_count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(
+                fields=['user', '-mutual_count'],
+                name='friendsuggestion_rank_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} ~> {self.suggested} ({self.mutual_count})"
+
+
+class FriendSuggestionRefresh(BaseAbstractModel):
+    """
+    Users whose friendships changed since suggestions were last computed.
+    """
+    user = models.OneToOneField(
+        User,
+        related_name='suggestion_refresh',
+        on_delete=models.CASCADE
+    )
+
+    def __str__(self):
+        return str(self.user)
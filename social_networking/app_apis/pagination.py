@@ -0,0 +1,209 @@
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    # total number of rows when the view already knows it, e.g. from a
+    # denormalised User counter; replaces the COUNT query
+    known_count = None
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = Paginator(object_list, per_page)
+        if self.known_count is not None:
+            paginator.count = self.known_count
+        return paginator
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async counterpart of paginate_queryset for views running on the
+        async ORM: the count and the page rows are awaited.
+        """
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        if self.known_count is None:
+            paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on (created_at, id), newest first.
+
+    Every page is an indexed range scan starting right after the last row
+    of the previous page, so deep pages cost the same as the first one.
+    Cursors are opaque to clients. The total count is skipped unless the
+    client asks for it with ?with_count=true.
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    cursor_query_param = "cursor"
+    count_query_param = "with_count"
+    invalid_cursor_message = "Invalid cursor"
+    known_count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare(queryset, request)
+        if self.with_count:
+            self.count = self.known_count
+            if self.count is None:
+                self.count = queryset.count()
+        return self.finish(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.prepare(queryset, request)
+        if self.with_count:
+            self.count = self.known_count
+            if self.count is None:
+                self.count = await queryset.acount()
+        return self.finish([row async for row in page_queryset])
+
+    def prepare(self, queryset, request):
+        """
+        Read the cursor and return the queryset of the next page, with one
+        extra row to tell whether there is a further page.
+        """
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), "page")
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.with_count = request.query_params.get(self.count_query_param) in ("1", "true")
+        self.count = None
+
+        self.reverse = self.cursor is not None and self.cursor[0]
+        if self.cursor is not None:
+            _, created_at, pk = self.cursor
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+
+        if self.reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by("-created_at", "-id")
+        return queryset[:self.page_size + 1]
+
+    def finish(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return item["created_at"], item["id"]
+        return item.created_at, item.pk
+
+    def encode_cursor(self, reverse, item):
+        created_at, pk = self.get_position(item)
+        raw = f"{int(reverse)}|{created_at.isoformat()}|{pk}"
+        token = urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = urlsafe_b64decode(token.encode("ascii")).decode("ascii")
+            reverse, created_at, pk = raw.split("|")
+            return reverse == "1", datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+
+class ListPagination(BasePagination):
+    """
+    Page-number pagination by default. Clients opt into keyset pagination
+    with ?pagination=cursor, or implicitly by following a cursor link.
+    Views that keep the total in a counter set `known_count` before
+    paginating, so neither mode runs a COUNT over the list.
+    """
+    mode_query_param = "pagination"
+    page_number_class = StandardResultsSetPagination
+    keyset_class = KeysetPagination
+
+    def __init__(self):
+        self.paginator = None
+        self.known_count = None
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def select_paginator(self, request):
+        if self.is_cursor_mode(request):
+            self.paginator = self.keyset_class()
+        else:
+            self.paginator = self.page_number_class()
+        self.paginator.known_count = self.known_count
+        return self.paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.select_paginator(request).paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return await self.select_paginator(request).apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
@@ -0,0 +1,71 @@
+from operator import itemgetter
+
+
+class Projection:
+    """
+    Serializer-free read path for list endpoints.
+
+    Fetches only the listed columns with values() and turns each row into
+    the response dict with a mapper built once per projection, skipping
+    model instantiation and DRF's field-by-field serialization. Output
+    must stay identical to the serializer it stands in for, so declare
+    the fields in the serializer's order.
+
+    `fields` maps each output key to a lookup, or to (lookup, converter)
+    when the serializer formats the value (e.g. str for UUIDs).
+    """
+    # keyset pagination builds its cursors from these columns
+    position_fields = ("id", "created_at")
+
+    def __init__(self, fields):
+        self.keys = tuple(fields)
+        lookups = []
+        self.converters = []
+        for key, spec in fields.items():
+            lookup, converter = spec if isinstance(spec, tuple) else (spec, None)
+            lookups.append(lookup)
+            if converter is not None:
+                self.converters.append((key, converter))
+        self.lookups = tuple(lookups)
+        self.columns = tuple(dict.fromkeys(self.position_fields + self.lookups))
+        self.getter = itemgetter(*self.lookups) if len(self.lookups) > 1 else (
+            lambda row, lookup=self.lookups[0]: (row[lookup],))
+
+    def apply(self, queryset):
+        return queryset.values(*self.columns)
+
+    def map_row(self, row):
+        data = dict(zip(self.keys, self.getter(row)))
+        for key, converter in self.converters:
+            value = data[key]
+            if value is not None:
+                data[key] = converter(value)
+        return data
+
+    def map(self, rows):
+        map_row = self.map_row
+        return [map_row(row) for row in rows]
+
+
+class ProjectionListMixin:
+    """
+    For ListAPIView subclasses: set `projection` (or override
+    get_projection) to serve pages from values() rows through the
+    projection instead of the serializer.
+    """
+    projection = None
+
+    def get_projection(self):
+        return self.projection
+
+    def project(self, queryset):
+        projection = self.get_projection()
+        if projection is None:
+            return queryset
+        return projection.apply(queryset)
+
+    def serialize(self, rows):
+        projection = self.get_projection()
+        if projection is None:
+            return self.get_serializer(rows, many=True).data
+        return projection.map(rows)
@@ -0,0 +1,74 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import User, FriendRequest, Friendship
+
+# models with soft deletion, dependents first so that a batch of users
+# finds little left to cascade to
+PURGED_MODELS = (FriendRequest, Friendship, User)
+
+
+def purge_rows(model, pks, batch_size=1000, pause=0):
+    """
+    Hard-delete the `model` rows `pks`.
+
+    Rows pointing at them through CASCADE foreign keys are deleted
+    first, `batch_size` at a time (recursively, for their own
+    dependents), each batch in its own transaction, so that no single
+    DELETE cascades further than one batch and locks stay short.
+    Returns a Counter of deleted rows per model label.
+    """
+    deleted = Counter()
+    for relation in model._meta.related_objects:
+        if getattr(relation, "on_delete", None) is not models.CASCADE:
+            # SET_NULL and friends are left to the collector below
+            continue
+        dependents = relation.related_model._base_manager.filter(
+            **{f"{relation.field.name}__in": pks})
+        while True:
+            chunk = list(dependents.order_by().values_list("pk", flat=True)[:batch_size])
+            if not chunk:
+                break
+            deleted.update(purge_rows(relation.related_model, chunk, batch_size, pause))
+    with transaction.atomic():
+        _, counts = model._base_manager.filter(pk__in=pks).delete()
+    deleted.update(counts)
+    if pause:
+        time.sleep(pause)
+    return deleted
+
+
+def count_soft_deleted(older_than=timedelta(0)):
+    cutoff = timezone.now() - older_than
+    return {
+        model._meta.label: model._base_manager.filter(
+            is_deleted=True, updated_at__lt=cutoff).count()
+        for model in PURGED_MODELS
+    }
+
+
+def purge_soft_deleted(batch_size=1000, older_than=timedelta(0), pause=0, progress=None):
+    """
+    Hard-delete the rows of PURGED_MODELS soft-deleted (last saved) more
+    than `older_than` ago, with everything that cascades from them, in
+    primary key batches of `batch_size`. `pause` seconds are slept after
+    every batch to leave room for regular traffic and replication.
+    `progress(model, deleted)` is called after each batch. Returns a
+    Counter of deleted rows per model label, cascades included.
+    """
+    cutoff = timezone.now() - older_than
+    deleted = Counter()
+    for model in PURGED_MODELS:
+        doomed = model._base_manager.filter(is_deleted=True, updated_at__lt=cutoff)
+        while True:
+            pks = list(doomed.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted.update(purge_rows(model, pks, batch_size, pause))
+            if progress is not None:
+                progress(model, deleted)
+    return deleted
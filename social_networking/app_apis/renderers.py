@@ -0,0 +1,52 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    # UUIDs and datetimes are encoded natively; "Z" for UTC like DRF
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """
+    Serialize `data` to UTF-8 JSON bytes, byte-compatible with DRF's
+    JSONRenderer (compact separators, no ASCII escaping).
+
+    Uses orjson when installed; anything orjson does not know (lazy
+    translation strings, Decimal, querysets, ...) goes through DRF's
+    JSONEncoder.default.
+    """
+    if orjson is not None:
+        ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    else:
+        ret = json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    # U+2028/U+2029 are escaped by DRF so the output is valid JavaScript
+    if b"\xe2\x80" in ret:
+        ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer using dumps() above. Requests asking for
+    indented output (e.g. "application/json; indent=4") still go through
+    DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
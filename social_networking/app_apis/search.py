@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.utils.module_loading import import_string
+
+from .models import User, UserSearchGram
+
+GRAM_SIZE = 3
+
+
+def name_grams(text):
+    """
+    Return the set of lower-cased character trigrams contained in `text`.
+    """
+    text = (text or "").lower()
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def relevance(keyword):
+    """
+    Rank expression shared by every backend:
+    exact email > exact name > name prefix > name substring.
+    """
+    return Case(
+        When(email=keyword.lower(), then=Value(3)),
+        When(name__iexact=keyword, then=Value(2)),
+        When(name__istartswith=keyword, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+class BaseSearchBackend:
+    """
+    A search backend narrows a User queryset down to the users matching
+    `keyword`, either by email (exact) or by name (substring).
+
+    Emails are lower-cased on save, so the email branch is always an
+    equality lookup on the unique email index.
+    """
+    # whether the UserSearchGram index has to be kept up to date
+    uses_gram_index = False
+
+    def match(self, queryset, keyword):
+        raise NotImplementedError(".match() must be overridden")
+
+    def search(self, queryset, keyword, rank=True):
+        queryset = self.match(queryset, keyword)
+        if rank:
+            queryset = self.rank(queryset, keyword)
+        return queryset
+
+    def rank(self, queryset, keyword):
+        return queryset.annotate(relevance=relevance(keyword)).order_by(
+            "-relevance", Length("name"), "-created_at", "-id"
+        )
+
+
+class ScanSearchBackend(BaseSearchBackend):
+    """
+    Unindexed substring scan, kept for parity with the original behaviour.
+    """
+
+    def match(self, queryset, keyword):
+        return queryset.filter(
+            Q(email=keyword.lower()) | Q(name__icontains=keyword)
+        )
+
+
+class TrigramSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL backend. The `icontains` lookup is served by the
+    GIN (UPPER(name) gin_trgm_ops) index, and results within the same
+    relevance bucket are ordered by trigram similarity.
+    """
+
+    def match(self, queryset, keyword):
+        return queryset.filter(
+            Q(email=keyword.lower()) | Q(name__icontains=keyword)
+        )
+
+    def rank(self, queryset, keyword):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return queryset.annotate(
+            relevance=relevance(keyword),
+            similarity=TrigramSimilarity("name", keyword),
+        ).order_by("-relevance", "-similarity", "-created_at", "-id")
+
+
+class NGramSearchBackend(BaseSearchBackend):
+    """
+    Portable backend backed by the UserSearchGram inverted index.
+
+    Candidates are the users owning every trigram of the keyword, found
+    through the (gram, user) index; the substring check then only runs
+    over that short candidate list. Keywords shorter than a trigram fall
+    back to a scan.
+    """
+    uses_gram_index = True
+
+    def match(self, queryset, keyword):
+        grams = name_grams(keyword)
+        if not grams:
+            return ScanSearchBackend().match(queryset, keyword)
+        candidates = (
+            UserSearchGram.objects.filter(gram__in=grams)
+            .values("user_id")
+            .annotate(hits=Count("gram"))
+            .filter(hits=len(grams))
+            .values("user_id")
+        )
+        return queryset.filter(
+            Q(email=keyword.lower())
+            | Q(id__in=candidates, name__icontains=keyword)
+        )
+
+
+def index_user(user):
+    """
+    Refresh the trigram index rows of a single user.
+    """
+    grams = name_grams(user.name)
+    existing = set(
+        UserSearchGram.objects.filter(user=user).values_list("gram", flat=True)
+    )
+    stale = existing - grams
+    if stale:
+        UserSearchGram.objects.filter(user=user, gram__in=stale).delete()
+    UserSearchGram.objects.bulk_create(
+        [UserSearchGram(user=user, gram=gram) for gram in grams - existing],
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_gram_index(batch_size=1000):
+    """
+    Rebuild the whole trigram index, `batch_size` users at a time in
+    primary key order. Each batch replaces the rows of its users in one
+    transaction, so searches keep finding every user while a rebuild
+    runs. Soft-deleted users lose their rows. Returns the number of
+    users indexed.
+    """
+    indexed = 0
+    last_pk = None
+    while True:
+        users = User.all_objects.only("id", "name", "is_deleted").order_by("pk")
+        if last_pk is not None:
+            users = users.filter(pk__gt=last_pk)
+        users = list(users[:batch_size])
+        if not users:
+            return indexed
+        with transaction.atomic():
+            UserSearchGram.objects.filter(user__in=users).delete()
+            UserSearchGram.objects.bulk_create(
+                [UserSearchGram(user=user, gram=gram)
+                 for user in users if not user.is_deleted
+                 for gram in name_grams(user.name)],
+                ignore_conflicts=True,
+            )
+        indexed += sum(not user.is_deleted for user in users)
+        last_pk = users[-1].pk
+
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    Return the configured search backend. USER_SEARCH_BACKEND takes a
+    dotted path; when unset the backend is picked from the database vendor.
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "USER_SEARCH_BACKEND", None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == "postgresql":
+            _backend = TrigramSearchBackend()
+        else:
+            _backend = NGramSearchBackend()
+    return _backend
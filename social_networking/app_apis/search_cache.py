@@ -0,0 +1,138 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .checks import process_local_cache
+from .metrics import registry
+from .utils import includes_relationship
+
+USER_VERSION_KEY = "user_search_version"
+# query parameters besides ?search= that select the page of results
+PAGE_PARAMS = ("page", "page_size", "pagination", "cursor", "with_count")
+
+
+def search_cache_settings():
+    config = {
+        # None: only when ALIAS is a cache shared by every process
+        "ENABLED": None,
+        "ALIAS": "default",
+        "TIMEOUT": 300,
+    }
+    config.update(getattr(settings, "SEARCH_CACHE", {}))
+    if config["ENABLED"] is None:
+        config["ENABLED"] = not process_local_cache(config["ALIAS"])
+    return config
+
+
+def get_cache():
+    return caches[search_cache_settings()["ALIAS"]]
+
+
+def normalize_term(term):
+    """
+    Fold the terms the search backends treat alike (they compare emails
+    lower-cased and names with icontains) onto one cache entry.
+    """
+    return (term or "").lower()
+
+
+def get_user_version():
+    """
+    Current version of the User table as far as search is concerned.
+    """
+    cache = get_cache()
+    version = cache.get(USER_VERSION_KEY)
+    if version is None:
+        version = initialize_user_version(cache)
+    return version
+
+
+async def aget_user_version():
+    cache = get_cache()
+    version = await cache.aget(USER_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(USER_VERSION_KEY, version, None)
+        version = await cache.aget(USER_VERSION_KEY, version)
+    return version
+
+
+def initialize_user_version(cache):
+    # start from the clock rather than 1, so a version evicted from the
+    # cache never comes back with a number old entries were stored under
+    version = time.time_ns()
+    cache.add(USER_VERSION_KEY, version, None)
+    return cache.get(USER_VERSION_KEY, version)
+
+
+def bump_user_version():
+    """
+    Orphan every cached search result. Called by the User post_save and
+    post_delete signals and after bulk loads.
+    """
+    cache = get_cache()
+    try:
+        return cache.incr(USER_VERSION_KEY)
+    except ValueError:
+        return initialize_user_version(cache)
+
+
+def is_cacheable(request):
+    # relationships differ per caller; everything else is the same for
+    # every authenticated user
+    return (
+        search_cache_settings()["ENABLED"]
+        and not includes_relationship(request.query_params)
+    )
+
+
+def cache_key(request, version):
+    params = request.query_params
+    parts = [
+        # next/previous links are absolute URLs
+        request.build_absolute_uri(request.path),
+        normalize_term(params.get("search")),
+    ] + [params.get(name) for name in PAGE_PARAMS]
+    digest = hashlib.blake2b(json.dumps(parts).encode("utf-8"), digest_size=16).hexdigest()
+    return f"user_search:{version}:{digest}"
+
+
+def record_lookup(data):
+    registry.inc("search_cache_requests_total", ("miss" if data is None else "hit",))
+    return data
+
+
+def get_cached_page(request):
+    """
+    Return (key, page): the cached {"count", "next", "previous",
+    "results"} dict of this search, or None, and the key to store it
+    under. The key is None when the request must not be cached.
+
+    The version is read before the search runs, so a page computed while
+    a User change commits is stored under the version that change bumps
+    away from and is never served afterwards.
+    """
+    if not is_cacheable(request):
+        return None, None
+    key = cache_key(request, get_user_version())
+    return key, record_lookup(get_cache().get(key))
+
+
+async def aget_cached_page(request):
+    if not is_cacheable(request):
+        return None, None
+    key = cache_key(request, await aget_user_version())
+    return key, record_lookup(await get_cache().aget(key))
+
+
+def set_cached_page(key, page):
+    if key is not None:
+        get_cache().set(key, page, search_cache_settings()["TIMEOUT"])
+
+
+async def aset_cached_page(key, page):
+    if key is not None:
+        await get_cache().aset(key, page, search_cache_settings()["TIMEOUT"])
@@ -0,0 +1,272 @@
+import hashlib
+import io
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import reconcile_counters
+from .models import User, FriendRequest, Friendship, FriendshipEdge
+from .search import get_search_backend, rebuild_gram_index
+from .search_cache import bump_user_version
+from .suggest import bump_suggest_version
+
+FIRST_NAMES = (
+    "Aarav", "Abhishek", "Aditi", "Amelia", "Ana", "Arjun", "Chen", "Diego",
+    "Emma", "Fatima", "Hana", "Isabella", "Ivan", "Kenji", "Layla", "Liam",
+    "Lucas", "Maria", "Mateo", "Mei", "Noah", "Olivia", "Omar", "Priya",
+    "Rahul", "Sara", "Sofia", "Wei", "Yusuf", "Zara",
+)
+LAST_NAMES = (
+    "Ahmed", "Brown", "Chen", "Da Silva", "Garcia", "Gupta", "Hernandez",
+    "Ivanova", "Jones", "Kim", "Kumar", "Lee", "Martin", "Meyer", "Nguyen",
+    "Okafor", "Patel", "Rossi", "Sato", "Sharma", "Singh", "Smith", "Tanaka",
+    "Wang", "Williams",
+)
+
+# column order of the rows produced below
+USER_COLUMNS = (
+    "id", "created_at", "updated_at", "is_deleted", "password", "last_login",
+    "email", "name", "tc", "is_active", "is_admin",
+    "friend_count", "pending_request_count",
+)
+FRIENDSHIP_COLUMNS = ("id", "created_at", "updated_at", "is_deleted", "user1_id", "user2_id")
+EDGE_COLUMNS = (
+    "id", "created_at", "updated_at", "is_deleted", "friendship_id", "user_id", "friend_id",
+)
+REQUEST_COLUMNS = (
+    "id", "created_at", "updated_at", "is_deleted", "sender_id", "receiver_id", "status",
+)
+
+
+class SocialGraphGenerator:
+    """
+    Deterministic, streaming generator of a synthetic social graph.
+
+    User ids are derived from (seed, index), so nothing per user has to
+    be remembered while the graph is generated. Every user links only to
+    older users (lower indexes): each pair is produced exactly once, by
+    its younger member, which keeps the unique constraints satisfied
+    without a global "seen" set. Out-degrees follow a Pareto law and
+    partners are drawn with a bias towards old users, giving the heavy
+    tailed degree distribution of real social graphs.
+    """
+    pareto_alpha = 2.5
+    # partner index = user index * random() ** popularity_skew
+    popularity_skew = 2.0
+    max_new_friends = 5000
+
+    def __init__(self, users, avg_friends=20, pending_per_user=2,
+                 rejected_per_user=1, seed=0, days=365):
+        self.users = users
+        self.avg_friends = avg_friends
+        self.pending_per_user = pending_per_user
+        self.rejected_per_user = rejected_per_user
+        self.seed = seed
+        self.now = timezone.now().replace(microsecond=0)
+        self.start = self.now - timedelta(days=days)
+        self.step = (self.now - self.start) / max(users, 1)
+        # each friendship is created by one side, so half the degree
+        pareto_mean = self.pareto_alpha / (self.pareto_alpha - 1)
+        self.friend_scale = (avg_friends / 2) / pareto_mean
+
+    def user_id(self, index):
+        digest = hashlib.blake2b(
+            f"{self.seed}:user:{index}".encode(), digest_size=16).digest()
+        return uuid.UUID(bytes=digest, version=4)
+
+    def joined_at(self, index):
+        return self.start + self.step * index
+
+    def users_rows(self, password_hash):
+        rng = random.Random(f"{self.seed}:users")
+        for index in range(self.users):
+            joined = self.joined_at(index)
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            yield (
+                self.user_id(index), joined, joined, False, password_hash, None,
+                f"user{index}@seed.example.com", name, True, True, False, 0, 0,
+            )
+
+    def graph_rows(self):
+        """
+        Yield ("friendship" | "edge" | "request", row) tuples.
+        """
+        rng = random.Random(f"{self.seed}:graph")
+        for index in range(1, self.users):
+            user_id = self.user_id(index)
+            joined = self.joined_at(index)
+            remaining = (self.now - joined).total_seconds()
+
+            friends = self.pick_partners(rng, index, self.new_friend_count(rng, index), set())
+            for partner in friends:
+                friend_id = self.user_id(partner)
+                created = joined + timedelta(seconds=rng.random() * remaining)
+                friendship_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+                yield "friendship", (friendship_id, created, created, False, user_id, friend_id)
+                yield "edge", (
+                    uuid.UUID(int=rng.getrandbits(128), version=4), created, created, False,
+                    friendship_id, user_id, friend_id)
+                yield "edge", (
+                    uuid.UUID(int=rng.getrandbits(128), version=4), created, created, False,
+                    friendship_id, friend_id, user_id)
+                yield "request", self.request_row(rng, user_id, friend_id, created, "accepted")
+
+            for status, count in (
+                ("pending", self.pending_per_user),
+                ("rejected", self.rejected_per_user),
+            ):
+                wanted = min(rng.randint(0, 2 * count), index - len(friends))
+                for partner in self.pick_partners(rng, index, wanted, friends):
+                    friends.add(partner)
+                    created = joined + timedelta(seconds=rng.random() * remaining)
+                    yield "request", self.request_row(
+                        rng, user_id, self.user_id(partner), created, status)
+
+    def new_friend_count(self, rng, index):
+        count = rng.paretovariate(self.pareto_alpha) * self.friend_scale
+        # stochastic rounding keeps the mean
+        count = int(count + rng.random())
+        return min(count, index, self.max_new_friends)
+
+    def pick_partners(self, rng, index, count, taken):
+        picked = set()
+        attempts = 0
+        while len(picked) < count and attempts < count * 4:
+            attempts += 1
+            partner = int(index * rng.random() ** self.popularity_skew)
+            if partner not in taken:
+                picked.add(partner)
+        return picked
+
+    def request_row(self, rng, user_id, other_id, created, status):
+        sender, receiver = (user_id, other_id) if rng.random() < 0.5 else (other_id, user_id)
+        updated = created if status == "pending" else created + timedelta(hours=rng.random() * 48)
+        return (
+            uuid.UUID(int=rng.getrandbits(128), version=4), created, updated, False,
+            sender, receiver, status,
+        )
+
+
+class BulkCreateWriter:
+    """
+    Portable writer: one bulk_create per batch. auto_now_add/auto_now
+    fields are stamped with the insertion time by Django on this path.
+    """
+
+    def write(self, model, columns, rows):
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [model(**dict(zip(columns, row))) for row in rows])
+
+
+class CopyWriter:
+    """
+    PostgreSQL writer: one COPY ... FROM STDIN per batch (psycopg2 or
+    psycopg 3), keeping the generated timestamps.
+    """
+
+    def write(self, model, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(self.format(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        sql = "COPY {} ({}) FROM STDIN".format(
+            connection.ops.quote_name(model._meta.db_table),
+            ", ".join(
+                connection.ops.quote_name(model._meta.get_field(column).column)
+                for column in columns
+            ),
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, "copy_expert"):
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    def format(self, value):
+        if value is None:
+            return "\\N"
+        if value is True:
+            return "t"
+        if value is False:
+            return "f"
+        if isinstance(value, str):
+            return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
+
+
+def get_writer(method="auto"):
+    if method == "copy" or (method == "auto" and connection.vendor == "postgresql"):
+        return CopyWriter()
+    return BulkCreateWriter()
+
+
+def seed_social_graph(generator, password, writer, batch_size=10000, progress=None):
+    """
+    Write the generator's users, then its friendships, adjacency edges
+    and friend requests, `batch_size` rows per statement. Memory use
+    stays flat: rows are produced and flushed as they go.
+    Returns the number of rows written per table.
+    """
+    counts = {"users": 0, "friendships": 0, "edges": 0, "requests": 0}
+    batch = []
+    for row in generator.users_rows(make_password(password)):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.write(User, USER_COLUMNS, batch)
+            counts["users"] += len(batch)
+            batch = []
+            if progress:
+                progress(counts)
+    if batch:
+        writer.write(User, USER_COLUMNS, batch)
+        counts["users"] += len(batch)
+
+    # buffers are flushed together, friendships first, so edges and
+    # requests never reference rows that are not written yet
+    tables = (
+        ("friendship", "friendships", Friendship, FRIENDSHIP_COLUMNS),
+        ("edge", "edges", FriendshipEdge, EDGE_COLUMNS),
+        ("request", "requests", FriendRequest, REQUEST_COLUMNS),
+    )
+    buffers = {kind: [] for kind, _, _, _ in tables}
+
+    def flush():
+        for kind, key, model, columns in tables:
+            if buffers[kind]:
+                writer.write(model, columns, buffers[kind])
+                counts[key] += len(buffers[kind])
+                buffers[kind] = []
+        if progress:
+            progress(counts)
+
+    for kind, row in generator.graph_rows():
+        buffers[kind].append(row)
+        if len(buffers[kind]) >= batch_size:
+            flush()
+    flush()
+    return counts
+
+
+def refresh_derived_data(batch_size=10000):
+    """
+    Bring everything derived from the raw tables up to date after a bulk
+    load: User counters, the trigram index when the search backend uses
+    it, and the suggest index and search cache versions. Returns the
+    number of users.
+    """
+    checked, _ = reconcile_counters(batch_size=batch_size)
+    if get_search_backend().uses_gram_index:
+        rebuild_gram_index(batch_size=batch_size)
+    bump_suggest_version()
+    bump_user_version()
+    return checked
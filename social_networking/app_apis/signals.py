@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .conditional import bump_listing_stamps, bump_stamps
+from .counters import adjust_counters_on_soft_delete
+from .models import User, FriendRequest, Friendship
+from .search import get_search_backend, index_user
+from .search_cache import bump_user_version
+from .suggest import suggest_index
+
+
+@receiver(post_save, sender=User)
+def update_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the n-gram search index in step with User.name.
+    """
+    if raw or not get_search_backend().uses_gram_index:
+        return
+    if update_fields is not None and "name" not in update_fields:
+        return
+    index_user(instance)
+
+
+@receiver(post_save, sender=User)
+def update_suggest_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_deleted:
+        suggest_index.remove(instance.pk)
+    else:
+        suggest_index.add(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    suggest_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached authentication copy so that changes to is_active,
+    is_admin or the password apply on the next request.
+    """
+    user_cache.invalidate(instance.pk)
+
+
+# fields that can change which users a search returns, or in what order
+SEARCH_FIELDS = {"name", "email", "created_at", "is_deleted"}
+
+
+@receiver(post_save, sender=User)
+def invalidate_search_cache_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Bump the search cache version once the change is visible to other
+    connections: bumping earlier would let a concurrent search store
+    the old rows under the new version.
+    """
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(bump_user_version)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_search_cache_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(bump_user_version)
+
+
+# User fields shown in other users' friends lists and pending requests
+LISTED_FIELDS = {"name", "email", "is_deleted"}
+
+
+@receiver(post_save, sender=User)
+def bump_stamps_on_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    A new name or email changes the friends lists and pending requests
+    of other users; their stamps are bumped so no 304 hides it.
+    """
+    if created or raw:
+        return
+    if update_fields is not None and not LISTED_FIELDS.intersection(update_fields):
+        return
+    bump_listing_stamps(instance)
+
+
+@receiver(pre_delete, sender=User)
+def bump_stamps_on_delete(sender, instance, **kwargs):
+    # before the cascade removes the rows that tell whose lists change
+    bump_listing_stamps(instance)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Friendship)
+@receiver(pre_save, sender=FriendRequest)
+def load_is_deleted(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Read the stored is_deleted of instances that were not loaded from
+    the database (created or bulk_created in this process) when the save
+    may change it.
+    """
+    if raw or instance._state.adding or "_loaded_is_deleted" in instance.__dict__:
+        return
+    if update_fields is not None and "is_deleted" not in update_fields:
+        return
+    instance._loaded_is_deleted = sender._base_manager.filter(
+        pk=instance.pk).values_list("is_deleted", flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Friendship)
+@receiver(post_save, sender=FriendRequest)
+def adjust_counters_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Keep friend_count and pending_request_count in step when is_deleted
+    flips on a save (soft_delete() or the admin).
+    """
+    if raw:
+        return
+    if created or not instance.soft_delete_flipped():
+        instance._loaded_is_deleted = instance.is_deleted
+        return
+    adjust_counters_on_soft_delete(instance)
+    if isinstance(instance, Friendship):
+        bump_stamps("friends", [instance.user1_id, instance.user2_id])
+    elif isinstance(instance, FriendRequest):
+        bump_stamps("pending", [instance.receiver_id])
+    instance._loaded_is_deleted = instance.is_deleted
@@ -0,0 +1,207 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_VERSION_KEY = "user_suggest_index_version"
+
+
+def suggest_settings():
+    config = {
+        "MAX_USERS": 500000,
+        "MAX_KEY_LENGTH": 64,
+        "ALIAS": "default",
+        "WARM_ON_STARTUP": True,
+    }
+    config.update(getattr(settings, "SUGGEST_INDEX", {}))
+    return config
+
+
+def get_cache():
+    return caches[suggest_settings()["ALIAS"]]
+
+
+def index_keys(name, email, max_length):
+    """
+    Prefix keys for one user: the full name, every later word of the
+    name, and the email address, all lower-cased and truncated.
+    """
+    name = (name or "").lower()
+    keys = {name[:max_length], (email or "").lower()[:max_length]}
+    words = name.split()
+    for i in range(1, len(words)):
+        keys.add(" ".join(words[i:])[:max_length])
+    keys.discard("")
+    return keys
+
+
+class PrefixIndex:
+    """
+    Per-process prefix index over User.name and User.email.
+
+    Keys live in one sorted list of (key, user_id) tuples, so a lookup is
+    a bisect followed by a short forward walk. The number of users held
+    is capped by SUGGEST_INDEX["MAX_USERS"]; once full, new users are not
+    indexed until the next rebuild.
+
+    Users saved or deleted in this process while a build reads the table
+    are journaled and replayed on the new index, so a build never drops
+    a change made during it.
+    """
+
+    def __init__(self, max_users=None, max_key_length=None):
+        config = suggest_settings()
+        self.max_users = max_users or config["MAX_USERS"]
+        self.max_key_length = max_key_length or config["MAX_KEY_LENGTH"]
+        self.lock = threading.RLock()
+        self.entries = []
+        self.users = {}
+        self.version = None
+        self.built = False
+        # (user_id, (email, name) or None for a removal) while building
+        self.journal = None
+
+    def read_users(self):
+        return (
+            User.objects.order_by("-created_at")
+            .values_list("id", "email", "name")[:self.max_users]
+            .iterator(chunk_size=5000)
+        )
+
+    def build(self, version=None):
+        with self.lock:
+            self.journal = []
+        entries = []
+        records = {}
+        try:
+            users = list(self.read_users())
+        except BaseException:
+            with self.lock:
+                self.journal = None
+            raise
+        for user_id, email, name in users:
+            user_id = str(user_id)
+            records[user_id] = (email, name)
+            entries.extend(
+                (key, user_id)
+                for key in index_keys(name, email, self.max_key_length)
+            )
+        entries.sort()
+        with self.lock:
+            self.entries = entries
+            self.users = records
+            self.version = version
+            self.built = True
+            journal, self.journal = self.journal, None
+            for user_id, record in journal:
+                self._discard(user_id)
+                if record is not None:
+                    self._add(user_id, *record)
+        return len(self.users)
+
+    def add(self, user):
+        user_id = str(user.pk)
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append((user_id, (user.email, user.name)))
+            if self.built:
+                self._discard(user_id)
+                self._add(user_id, user.email, user.name)
+
+    def remove(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append((user_id, None))
+            if self.built:
+                self._discard(user_id)
+
+    def _add(self, user_id, email, name):
+        if len(self.users) >= self.max_users:
+            return
+        self.users[user_id] = (email, name)
+        for key in index_keys(name, email, self.max_key_length):
+            insort(self.entries, (key, user_id))
+
+    def _discard(self, user_id):
+        record = self.users.pop(user_id, None)
+        if record is None:
+            return
+        email, name = record
+        for key in index_keys(name, email, self.max_key_length):
+            position = bisect_left(self.entries, (key, user_id))
+            if position < len(self.entries) and self.entries[position] == (key, user_id):
+                del self.entries[position]
+
+    def suggest(self, prefix, limit=10):
+        prefix = prefix.lower()[:self.max_key_length]
+        results = []
+        seen = set()
+        with self.lock:
+            position = bisect_left(self.entries, (prefix,))
+            entries = self.entries
+            while position < len(entries) and len(results) < limit:
+                key, user_id = entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if user_id in seen:
+                    continue
+                seen.add(user_id)
+                email, name = self.users[user_id]
+                results.append({"id": user_id, "email": email, "name": name})
+        return results
+
+    def __len__(self):
+        return len(self.users)
+
+
+suggest_index = PrefixIndex()
+_build_lock = threading.Lock()
+
+
+def get_suggest_index():
+    """
+    Return the process-wide index, (re)building it on first use or when
+    rebuild_suggest_index bumped the version in the SUGGEST_INDEX["ALIAS"]
+    cache, which must be shared by every process for them to see it.
+    """
+    version = get_cache().get(SUGGEST_VERSION_KEY)
+    if not suggest_index.built or suggest_index.version != version:
+        with _build_lock:
+            if not suggest_index.built or suggest_index.version != version:
+                suggest_index.build(version)
+    return suggest_index
+
+
+def bump_suggest_version():
+    cache = get_cache()
+    try:
+        return cache.incr(SUGGEST_VERSION_KEY)
+    except ValueError:
+        cache.set(SUGGEST_VERSION_KEY, 1, None)
+        return 1
+
+
+def warm_suggest_index():
+    """
+    Build the index while the server starts (wsgi.py and asgi.py) rather
+    than on the first suggest request. Left to that first request when
+    the database is not reachable yet.
+    """
+    if not suggest_settings()["WARM_ON_STARTUP"]:
+        return
+    try:
+        get_suggest_index()
+    except DatabaseError as exc:
+        logger.warning("Suggest index not warmed: %s", exc)
+    finally:
+        # do not hand an open connection to forked workers
+        connections.close_all()
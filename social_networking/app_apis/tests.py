@@ -1,3 +1,1102 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import friend_suggestions, throttling
+from .authentication import user_cache
+from .checks import check_shared_caches
+from .conditional import conditional_get_settings
+from .counters import reconcile_counters
+from .custom_response import envelope, page_envelope
+from .graph_snapshot import FriendGraphService, build_snapshot
+from .hashing import PooledPBKDF2PasswordHasher, hashing_pool, hashing_stats
+from .friend_suggestions import FriendGraph, refresh_all_suggestions, refresh_stale_suggestions
+from .jwt import get_tokens_for_user
+from .log_handlers import BackgroundQueueHandler, JSONFormatter
+from .metrics import registry
+from .models import (
+    User, FriendRequest, FriendSuggestion, FriendSuggestionRefresh, Friendship, FriendshipEdge,
+)
+from .search import rebuild_gram_index
+from .search_cache import search_cache_settings
+from .suggest import PrefixIndex
+from .throttling import (
+    CacheRateLimitBackend, DatabaseRateLimitBackend, FriendRequestThrottle,
+    LocalMemoryRateLimitBackend,
+)
+from .urls import urlpatterns
+from .purge import purge_soft_deleted
+from .renderers import FastJSONRenderer
+from .utils import (
+    create_friendship, create_friendships, relationship_statuses, respond_friend_requests,
+    send_friend_request, send_friend_requests, update_friend_request_status,
+)
+from .v1.networking_application import async_views, views
+from .v1.networking_application.serializers import (
+    FRIEND_PROJECTION, USER_PROJECTION, FriendSerializer, UserSerializer,
+)
+
+# Query budgets per URL name, and per database vendor the indexes the
+# main query of an endpoint must use. Lower a budget when an endpoint
+# gets cheaper; raising one needs a reason in the commit message.
+BASELINE_PATH = Path(__file__).with_name("query_baseline.json")
+# Users seeded for the run; QUERY_TEST_SCALE=5000 gives plans closer to
+# production. Query counts must not depend on it.
+SCALE = int(os.environ.get("QUERY_TEST_SCALE", 60))
+PASSWORD = "query-test-password"
+
+
+def load_baseline():
+    with open(BASELINE_PATH) as handle:
+        return json.load(handle)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    FRIEND_GRAPH={"SNAPSHOT_PATH": os.path.join(tempfile.gettempdir(), "query-test-graph.csr")},
+    # a single test process, so the locmem cache sees every bump
+    SEARCH_CACHE={"ENABLED": True},
+    CONDITIONAL_GET={"ENABLED": True},
+)
+class EndpointQueryTests(TestCase):
+    """
+    Runs one request against every route in app_apis/urls.py over a
+    seeded graph and checks it against query_baseline.json.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(email=f"user{i}@example.com", name=f"User {i}", tc=True, password=password)
+            for i in range(SCALE)
+        ])
+        cls.me = users[0]
+        quarter = SCALE // 4
+        cls.friends = users[1:quarter + 1]
+        cls.requesters = users[quarter + 1:2 * quarter + 1]
+        cls.strangers = users[2 * quarter + 1:]
+
+        create_friendships((cls.me.pk, friend.pk) for friend in cls.friends)
+        # friends of friends, for suggestions and distance
+        create_friendships(
+            (friend.pk, stranger.pk)
+            for friend, stranger in zip(cls.friends, cls.strangers)
+        )
+        FriendRequest.objects.bulk_create([
+            FriendRequest(sender=requester, receiver=cls.me)
+            for requester in cls.requesters
+        ])
+        rebuild_gram_index()
+        refresh_all_suggestions()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.me)['access']}")
+        self.pending = list(
+            FriendRequest.objects.filter(receiver=self.me, status="pending")
+            .order_by("created_at").values_list("pk", flat=True)
+        )
+
+    def endpoint_requests(self):
+        """
+        (method, url, body) for every URL name.
+        """
+        return {
+            "user-register": ("post", reverse("user-register"), {
+                "email": "fresh@example.com",
+                "name": "Fresh User",
+                "password": PASSWORD,
+                "password2": PASSWORD,
+                "tc": True,
+            }),
+            "user-login": ("post", reverse("user-login"), {
+                "email": self.strangers[-1].email, "password": PASSWORD,
+            }),
+            "user-detail": ("get", reverse("user-detail"), None),
+            "user-search": ("get", reverse("user-search") + "?search=User 1", None),
+            "user-search-suggest": ("get", reverse("user-search-suggest") + "?q=user", None),
+            "send-friend-request": ("post", reverse("send-friend-request"), {
+                "receiver_id": str(self.strangers[-1].pk),
+            }),
+            "send-friend-requests-bulk": ("post", reverse("send-friend-requests-bulk"), {
+                # within the 3/min friend_request budget
+                "receiver_ids": [str(user.pk) for user in self.strangers[-4:-1]],
+            }),
+            "respond-friend-request": (
+                "put",
+                reverse("respond-friend-request", kwargs={"pk": self.pending[0]}),
+                {"status": "accepted"},
+            ),
+            "respond-friend-requests-bulk": ("put", reverse("respond-friend-requests-bulk"), {
+                "status": "accepted",
+                "request_ids": [str(pk) for pk in self.pending[1:4]],
+            }),
+            "pending-friend-requests": (
+                "get", reverse("pending-friend-requests") + "?pagination=cursor", None),
+            "user-friends-list": (
+                "get", reverse("user-friends-list") + "?pagination=cursor", None),
+            "user-relationships": (
+                "get",
+                reverse("user-relationships") + "?ids=" + ",".join(str(user.pk) for user in (
+                    self.me, self.friends[0], self.requesters[0], self.strangers[0])),
+                None,
+            ),
+            "user-friend-suggestions": ("get", reverse("user-friend-suggestions"), None),
+            "user-friend-distance": (
+                "get",
+                reverse("user-friend-distance", kwargs={"pk": self.strangers[0].pk}),
+                None,
+            ),
+        }
+
+    def run_endpoint(self, name):
+        # every request starts cold: the user lookup behind the token is
+        # counted, and throttle counters do not carry over
+        for alias in caches:
+            caches[alias].clear()
+        user_cache.clear()
+        method, url, body = self.endpoint_requests()[name]
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, body, format="json")
+        self.assertLess(
+            response.status_code, 400,
+            f"{name} answered {response.status_code}: {response.content[:200]}")
+        return queries.captured_queries
+
+    def test_every_url_has_a_baseline(self):
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(load_baseline()["queries"]))
+        self.assertEqual(names, set(self.endpoint_requests()))
+
+    def test_query_counts(self):
+        budgets = load_baseline()["queries"]
+        for name, budget in budgets.items():
+            with self.subTest(endpoint=name):
+                queries = self.run_endpoint(name)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f"{name} ran {len(queries)} queries (budget {budget}):\n"
+                    + "\n".join(query["sql"] for query in queries))
+
+    def test_not_modified_runs_no_queries(self):
+        for name in ("user-detail", "pending-friend-requests", "user-friends-list"):
+            with self.subTest(endpoint=name):
+                self.run_endpoint(name)
+                url = self.endpoint_requests()[name][1]
+                etag = self.client.get(url).headers["ETag"]
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), 0)
+
+    def test_per_process_cache_is_opt_in(self):
+        self.assertEqual(
+            [warning.id for warning in check_shared_caches(None)],
+            ["app_apis.W001", "app_apis.W002"])
+        with override_settings(SEARCH_CACHE={}, CONDITIONAL_GET={}):
+            self.assertFalse(search_cache_settings()["ENABLED"])
+            self.assertFalse(conditional_get_settings()["ENABLED"])
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_page_total_comes_from_counter(self):
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user-friends-list"))
+        self.assertEqual(response.json()["data"]["count"], len(self.friends))
+        self.assertFalse(
+            [query["sql"] for query in queries if "COUNT(" in query["sql"]])
+
+    def test_list_responses_use_the_full_envelope(self):
+        for name in ("user-search", "user-friends-list", "pending-friend-requests"):
+            for pagination in ("page", "cursor"):
+                with self.subTest(name=name, pagination=pagination):
+                    body = self.client.get(
+                        reverse(name) + f"?pagination={pagination}").json()
+                    self.assertEqual(
+                        sorted(body), ["data", "errors", "message", "type"])
+                    self.assertEqual((body["type"], body["errors"]), ("success", None))
+                    self.assertIn("results", body["data"])
+
+    def test_query_plans(self):
+        expected = load_baseline()["plans"].get(connection.vendor)
+        if not expected:
+            self.skipTest(f"no plan baseline for {connection.vendor}")
+        for name, checks in expected.items():
+            with self.subTest(endpoint=name):
+                queries = self.run_endpoint(name)
+                for check in checks:
+                    matching = [
+                        query["sql"] for query in queries
+                        if f'FROM "{check["table"]}"' in query["sql"]
+                    ]
+                    self.assertTrue(matching, f"{name} no longer queries {check['table']}")
+                    for sql in matching:
+                        plan = self.explain(sql)
+                        self.assertIn(
+                            check["index"], plan,
+                            f"{name} stopped using {check['index']}:\n{sql}\n{plan}")
+
+    def explain(self, sql):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+class RateLimitBackendTests(TransactionTestCase):
+    """
+    Concurrent hits on one key must be admitted exactly up to the limit
+    by every rate limit backend.
+    """
+    threads = 12
+    limit = 5
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+
+    def hammer(self, backend):
+        barrier = threading.Barrier(self.threads)
+        admitted = []
+
+        def send():
+            barrier.wait()
+            try:
+                admitted.append(backend.hit("ratelimit:stress:1", self.limit, 60)[0])
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=send) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(admitted), self.threads)
+        return admitted.count(True)
+
+    def test_local_memory_backend(self):
+        self.assertEqual(self.hammer(LocalMemoryRateLimitBackend()), self.limit)
+
+    def test_cache_backend(self):
+        self.assertEqual(self.hammer(CacheRateLimitBackend()), self.limit)
+
+    def test_database_backend(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            # shared-cache table locks fail at once instead of waiting
+            self.skipTest("needs a file or server test database")
+        self.assertEqual(self.hammer(DatabaseRateLimitBackend()), self.limit)
+
+    def test_refund_frees_a_slot(self):
+        backend = LocalMemoryRateLimitBackend()
+        backend.hit("ratelimit:refund:1", 1, 60, now=100.0)
+        self.assertFalse(backend.hit("ratelimit:refund:1", 1, 60, now=101.0)[0])
+        backend.refund("ratelimit:refund:1", 60, 100.0)
+        self.assertTrue(backend.hit("ratelimit:refund:1", 1, 60, now=102.0)[0])
+
+    def test_async_database_hits_stay_on_the_sync_thread(self):
+        request = mock.Mock(method="POST", user=mock.Mock(is_authenticated=True, pk=1))
+        for backend, on_main_thread in (
+            (DatabaseRateLimitBackend(), True), (LocalMemoryRateLimitBackend(), False),
+        ):
+            threads = []
+            hit = backend.hit
+
+            def recording_hit(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return hit(*args, **kwargs)
+
+            throttle = FriendRequestThrottle()
+            with mock.patch.object(throttling, "get_rate_limit_backend", return_value=backend), \
+                    mock.patch.object(backend, "hit", recording_hit):
+                self.assertTrue(async_to_sync(throttle.aallow_request)(request, None))
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(threads == [threading.main_thread()], on_main_thread)
+
+    def test_sweep_keeps_longer_windows(self):
+        backend = LocalMemoryRateLimitBackend()
+        backend.hit("ratelimit:day:1", 10, 86400, now=100.0)
+        backend._sweep(200.0)
+        self.assertIn("ratelimit:day:1", backend.logs)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class FriendRequestThrottleTests(TestCase):
+    """
+    Friend requests are limited to 3 sent per sliding minute.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me, *cls.others = User.objects.bulk_create([
+            User(email=f"throttle{i}@example.com", name=f"Throttle {i}", tc=True)
+            for i in range(6)
+        ])
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.me)['access']}")
+
+    def send(self, receiver):
+        return self.client.post(
+            reverse("send-friend-request"), {"receiver_id": str(receiver.pk)}, format="json")
+
+    def test_failed_sends_are_not_charged(self):
+        for _ in range(3):
+            self.assertEqual(self.send(self.me).status_code, 400)
+        for receiver in self.others[:3]:
+            self.assertEqual(self.send(receiver).status_code, 201)
+        self.assertEqual(self.send(self.others[3]).status_code, 429)
+
+    def test_malformed_json_is_a_bad_request(self):
+        response = self.client.post(
+            reverse("send-friend-request"), "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+        for receiver in self.others[:3]:
+            self.assertEqual(self.send(receiver).status_code, 201)
+
+    def send_bulk(self, receivers):
+        return self.client.post(
+            reverse("send-friend-requests-bulk"),
+            {"receiver_ids": [str(receiver.pk) for receiver in receivers]},
+            format="json")
+
+    def test_bulk_and_single_sends_share_the_window(self):
+        self.assertEqual(self.send_bulk(self.others[:2]).status_code, 201)
+        self.assertEqual(self.send(self.others[2]).status_code, 201)
+        self.assertEqual(self.send(self.others[3]).status_code, 429)
+        self.assertEqual(self.send_bulk(self.others[3:4]).status_code, 429)
+
+    def test_bulk_larger_than_what_is_left_is_refused(self):
+        self.assertEqual(self.send(self.others[0]).status_code, 201)
+        self.assertEqual(self.send_bulk(self.others[1:4]).status_code, 429)
+        # refused batches are not charged
+        self.assertEqual(self.send_bulk(self.others[1:3]).status_code, 201)
+        self.assertEqual(self.send(self.others[3]).status_code, 429)
+
+    def test_bulk_larger_than_the_rate_is_a_client_error(self):
+        response = self.send_bulk(self.others[:5])
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("Retry-After", response)
+        self.assertEqual(
+            response.json()["errors"]["detail"],
+            "A batch of 5 receivers exceeds the friend request rate of 3 per 60 seconds")
+        # nothing was charged
+        self.assertEqual(self.send_bulk(self.others[:3]).status_code, 201)
+
+    def test_bulk_receivers_not_sent_to_are_refunded(self):
+        self.assertEqual(self.send_bulk([self.me, *self.others[:2]]).status_code, 201)
+        self.assertEqual(self.send(self.others[2]).status_code, 201)
+        self.assertEqual(self.send(self.others[3]).status_code, 429)
+
+
+class BulkRespondFriendRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me, *cls.senders = User.objects.bulk_create([
+            User(email=f"respond{i}@example.com", name=f"Respond {i}", tc=True)
+            for i in range(3)
+        ])
+        FriendRequest.objects.bulk_create([
+            FriendRequest(sender=sender, receiver=cls.me) for sender in cls.senders
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.me)['access']}")
+
+    def respond(self, body):
+        return self.client.put(reverse("respond-friend-requests-bulk"), body, format="json")
+
+    def test_invalid_sender_id_is_rejected(self):
+        for sender_id in ("not-a-uuid", 42, ["x"]):
+            with self.subTest(sender_id=sender_id):
+                response = self.respond({"status": "accepted", "sender_id": sender_id})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["errors"]["detail"], "Invalid sender id")
+
+    def test_sender_id_answers_their_requests(self):
+        response = self.respond({"status": "rejected", "sender_id": str(self.senders[0].pk)})
+        self.assertEqual(response.json()["data"]["processed"], 1)
+
+
+class CounterTests(TestCase):
+    """
+    friend_count and pending_request_count must match the rows after
+    every write path, including inserts skipped on a conflict.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me, *cls.others = User.objects.bulk_create([
+            User(email=f"counter{i}@example.com", name=f"Counter {i}", tc=True)
+            for i in range(5)
+        ])
+
+    def assertCountersMatchRows(self):
+        self.assertEqual(reconcile_counters(), (len(self.others) + 1, 0))
+
+    def counters(self, user):
+        user.refresh_from_db()
+        return user.friend_count, user.pending_request_count
+
+    def test_send_and_respond(self):
+        send_friend_request(self.others[0], self.me, "failed")
+        send_friend_request(self.others[1], self.me, "failed")
+        self.assertEqual(self.counters(self.me), (0, 2))
+        update_friend_request_status(
+            FriendRequest.objects.get(sender=self.others[0]), "accepted")
+        create_friendship(self.others[0], self.me)
+        update_friend_request_status(
+            FriendRequest.objects.get(sender=self.others[1]), "rejected")
+        self.assertEqual(self.counters(self.me), (1, 0))
+        self.assertEqual(self.counters(self.others[0]), (1, 0))
+        self.assertCountersMatchRows()
+
+    def test_bulk_send_and_bulk_respond(self):
+        for sender in self.others:
+            send_friend_requests(sender, [self.me.pk])
+        self.assertEqual(self.counters(self.me), (0, 4))
+        with transaction.atomic():
+            respond_friend_requests(self.me, "accepted", sender_id=self.others[0].pk)
+            respond_friend_requests(self.me, "rejected", sender_id=self.others[1].pk)
+            answered = respond_friend_requests(self.me, "accepted")
+        self.assertEqual(len(answered), 2)
+        self.assertEqual(self.counters(self.me), (3, 0))
+        self.assertCountersMatchRows()
+
+    def test_bulk_send_skips_requests_raced_in(self):
+        receiver = self.others[0]
+        bulk_create = FriendRequest.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # another request sends the same pair between the
+            # already-sent check and the insert
+            send_friend_request(self.me, receiver, "failed")
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(FriendRequest.objects, "bulk_create", racing_bulk_create):
+            results = send_friend_requests(self.me, [receiver.pk, self.others[1].pk])
+        self.assertEqual(results, {
+            str(receiver.pk): "already_sent", str(self.others[1].pk): "sent"})
+        self.assertEqual(self.counters(receiver), (0, 1))
+        self.assertCountersMatchRows()
+
+    def test_friendship_created_twice_counts_once(self):
+        create_friendships([(self.me.pk, self.others[0].pk)])
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    create_friendships([(self.others[0].pk, self.me.pk)])
+            except IntegrityError:
+                pass
+        self.assertEqual(self.counters(self.me), (1, 0))
+        self.assertCountersMatchRows()
+
+
+class FriendSuggestionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f"suggest{i}@example.com", name=f"Suggest {i}", tc=True)
+            for i in range(12)
+        ])
+        # two rings of six joined by one friendship
+        create_friendships(
+            (cls.users[ring + i].pk, cls.users[ring + (i + 1) % 6].pk)
+            for ring in (0, 6) for i in range(6)
+        )
+        create_friendships([(cls.users[0].pk, cls.users[6].pk)])
+
+    def suggestions(self):
+        return set(FriendSuggestion.objects.values_list("user_id", "suggested_id", "mutual_count"))
+
+    def test_stale_refresh_matches_full_refresh(self):
+        refresh_all_suggestions()
+        create_friendships([(self.users[2].pk, self.users[9].pk)])
+        refresh_stale_suggestions()
+        incremental = self.suggestions()
+        refresh_all_suggestions()
+        self.assertEqual(incremental, self.suggestions())
+
+    def test_friendship_made_during_refresh_stays_flagged(self):
+        refresh_all_suggestions()
+        create_friendships([(self.users[2].pk, self.users[9].pk)])
+        compute = friend_suggestions.compute_suggestions
+
+        def racing_compute(*args):
+            create_friendships([(self.users[2].pk, self.users[10].pk)])
+            return compute(*args)
+
+        with mock.patch.object(friend_suggestions, "compute_suggestions", racing_compute):
+            refresh_stale_suggestions()
+        self.assertEqual(
+            set(FriendSuggestionRefresh.objects.values_list("user_id", flat=True)),
+            {self.users[2].pk, self.users[10].pk})
+
+    def test_load_around_stops_after_two_hops(self):
+        graph = FriendGraph.load_around([self.users[3].pk])
+        # users 2 and 4 are one hop away, 1 and 5 two: their friends lists
+        # are loaded. User 0 (three hops) is only seen as their friend,
+        # and the other ring is not read at all.
+        self.assertEqual(len(graph.friends(graph.index[self.users[5].pk])), 2)
+        self.assertEqual(len(graph.friends(graph.index[self.users[0].pk])), 0)
+        self.assertNotIn(self.users[7].pk, graph.index)
+
+
+GRAPH_PATH = os.path.join(tempfile.gettempdir(), "distance-test-graph.csr")
+
+
+@override_settings(FRIEND_GRAPH={"SNAPSHOT_PATH": GRAPH_PATH, "DELTA_REFRESH_SECONDS": 0})
+class FriendGraphTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d, cls.e = User.objects.bulk_create([
+            User(email=f"graph{i}@example.com", name=f"Graph {i}", tc=True)
+            for i in range(5)
+        ])
+        # a - b - c, and the longer way round a - d - e - c
+        create_friendships([
+            (cls.a.pk, cls.b.pk), (cls.b.pk, cls.c.pk),
+            (cls.a.pk, cls.d.pk), (cls.d.pk, cls.e.pk), (cls.e.pk, cls.c.pk),
+        ])
+
+    def setUp(self):
+        build_snapshot(GRAPH_PATH)
+        self.graph = FriendGraphService()
+
+    def path(self):
+        return self.graph.shortest_path(self.a.pk, self.c.pk)
+
+    def age_rows(self):
+        # past the build margin, so the delta only replays later changes
+        past = timezone.now() - timedelta(hours=1)
+        FriendshipEdge.objects.update(created_at=past, updated_at=past)
+        Friendship.all_objects.update(created_at=past, updated_at=past)
+
+    def test_shortest_path(self):
+        self.assertEqual(self.path(), [self.a.pk, self.b.pk, self.c.pk])
+
+    def test_soft_deleted_friendship_is_not_walked(self):
+        self.path()
+        Friendship.objects.get(user1=self.a, user2=self.b).soft_delete()
+        self.assertEqual(self.path(), [self.a.pk, self.d.pk, self.e.pk, self.c.pk])
+
+    def test_restored_friendship_is_walked_again(self):
+        friendship = Friendship.objects.get(user1=self.a, user2=self.b)
+        friendship.soft_delete()
+        self.age_rows()
+        build_snapshot(GRAPH_PATH)
+        graph = FriendGraphService()
+        self.assertEqual(
+            graph.shortest_path(self.a.pk, self.c.pk),
+            [self.a.pk, self.d.pk, self.e.pk, self.c.pk])
+        # restored through the admin
+        friendship.is_deleted = False
+        friendship.save()
+        self.assertEqual(
+            graph.shortest_path(self.a.pk, self.c.pk), [self.a.pk, self.b.pk, self.c.pk])
+
+    def test_friends_again_after_unfriending_is_walked(self):
+        self.age_rows()
+        build_snapshot(GRAPH_PATH)
+        self.path()
+        Friendship.objects.get(user1=self.a, user2=self.b).soft_delete()
+        self.assertEqual(len(self.path()), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_friendships([(self.b.pk, self.a.pk)])
+        self.assertEqual(self.path(), [self.a.pk, self.b.pk, self.c.pk])
+
+    def test_soft_deleted_user_is_not_walked(self):
+        self.path()
+        self.b.soft_delete()
+        self.assertEqual(self.path(), [self.a.pk, self.d.pk, self.e.pk, self.c.pk])
+        self.c.soft_delete()
+        self.assertIsNone(self.path())
+
+    def test_snapshot_leaves_out_soft_deleted_rows(self):
+        self.b.soft_delete()
+        Friendship.objects.get(user1=self.d, user2=self.e).soft_delete()
+        build_snapshot(GRAPH_PATH)
+        self.assertIsNone(FriendGraphService().shortest_path(self.a.pk, self.c.pk))
+
+
+class MetricsEndpointTests(TestCase):
+
+    @override_settings(DEBUG=False, METRICS={"AUTH_TOKEN": None})
+    def test_closed_without_token_outside_debug(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+    @override_settings(DEBUG=False, METRICS={"AUTH_TOKEN": "scrape"})
+    def test_token_required_when_set(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"http_requests_total", response.content)
+
+    def test_flushed_by_a_background_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS={"MULTIPROCESS_DIR": directory, "FLUSH_INTERVAL": 0.01}):
+                registry.reset()
+                registry.record("test", "GET", 200, 0.01, 1, 0.001, 10)
+                self.assertIsNotNone(registry.flusher)
+                path = os.path.join(directory, registry.file_name)
+                for _ in range(200):
+                    if os.path.exists(path):
+                        break
+                    time.sleep(0.01)
+                with open(path) as handle:
+                    self.assertIn("test", handle.read())
+            registry.reset()
+
+
+class LogHandlerTests(TestCase):
+
+    def make_record(self, msg, args, **extra):
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_formatter_stringifies_extras_that_are_not_json(self):
+        request = RequestFactory().get("/api/v1/user/search/")
+        record = self.make_record("failed", (), request=request, endpoint="user-search",
+                                  ids=[uuid.UUID(int=1)])
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry["request"], str(request))
+        self.assertEqual(entry["endpoint"], "user-search")
+        self.assertEqual(entry["ids"], [str(uuid.UUID(int=1))])
+
+    def test_queue_handler_merges_mutable_arguments_eagerly(self):
+        handler = BackgroundQueueHandler([logging.NullHandler()])
+        try:
+            items = ["a"]
+            record = handler.prepare(self.make_record("items %s", (items,)))
+            items.append("b")
+            self.assertEqual(record.getMessage(), "items ['a']")
+            record = handler.prepare(self.make_record("count %d", (3,)))
+            self.assertEqual(record.args, (3,))
+        finally:
+            handler.close()
+
+
+class SoftDeleteTests(TestCase):
+    """
+    Soft-deleted users, friendships and requests drop out of counters,
+    relationships and friend distance, and are purged in batches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f"soft{i}@example.com", name=f"Soft {i}", tc=True)
+            for i in range(4)
+        ])
+        a, b, c, d = cls.users
+        create_friendships([(a.pk, b.pk), (a.pk, c.pk), (b.pk, c.pk)])
+        send_friend_request(a, d, "failed")
+        send_friend_request(d, b, "failed")
+
+    def counters(self):
+        return [
+            (user.friend_count, user.pending_request_count)
+            for user in User.all_objects.filter(pk__in=[user.pk for user in self.users])
+            .order_by("email")
+        ]
+
+    def test_counters_follow_soft_delete_and_restore(self):
+        a, b, c, d = self.users
+        self.assertEqual(self.counters(), [(2, 0), (2, 1), (2, 0), (0, 1)])
+        a.soft_delete()
+        self.assertEqual(self.counters()[1:], [(1, 1), (1, 0), (0, 0)])
+        self.assertEqual(reconcile_counters(), (3, 0))
+        # restored the way the admin does it
+        a = User.all_objects.get(pk=a.pk)
+        a.is_deleted = False
+        a.save()
+        self.assertEqual(self.counters(), [(2, 0), (2, 1), (2, 0), (0, 1)])
+
+        Friendship.objects.get(user1=b, user2=c).soft_delete()
+        FriendRequest.objects.get(sender=d).soft_delete()
+        self.assertEqual(self.counters(), [(2, 0), (1, 0), (1, 0), (0, 1)])
+        self.assertEqual(reconcile_counters(), (4, 0))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def test_friends_again_after_unfriending(self):
+        a, b, c, d = self.users
+        Friendship.objects.get(user1=a, user2=b).soft_delete()
+        response = self.client_for(b).post(
+            reverse("send-friend-request"), {"receiver_id": str(a.pk)}, format="json")
+        self.assertEqual(response.status_code, 201)
+        request = FriendRequest.objects.get(sender=b, receiver=a)
+        # drops the cached copy of a, whose friend_count the list reads
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(a).put(
+                reverse("respond-friend-request", kwargs={"pk": request.pk}),
+                {"status": "accepted"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        friends = self.client_for(a).get(reverse("user-friends-list")).json()["data"]
+        self.assertEqual(friends["count"], 2)
+        self.assertEqual(
+            {friend["id"] for friend in friends["results"]}, {str(b.pk), str(c.pk)})
+        self.assertEqual(self.counters()[:2], [(2, 0), (2, 1)])
+        self.assertEqual(reconcile_counters(), (4, 0))
+
+    def test_requests_of_deleted_senders_cannot_be_answered(self):
+        a, b, c, d = self.users
+        d.soft_delete()
+        client = self.client_for(b)
+        request = FriendRequest.objects.get(sender=d, receiver=b)
+        response = client.put(
+            reverse("respond-friend-request", kwargs={"pk": request.pk}),
+            {"status": "accepted"}, format="json")
+        self.assertEqual(response.status_code, 404)
+        response = client.put(
+            reverse("respond-friend-requests-bulk"),
+            {"status": "accepted", "sender_id": str(d.pk)}, format="json")
+        self.assertEqual(response.json()["data"]["processed"], 0)
+        self.assertFalse(Friendship.all_objects.filter(user1=d).exists())
+        self.assertEqual(reconcile_counters(), (3, 0))
+
+    def test_relationships_leave_out_soft_deleted_users(self):
+        a, b, c, d = self.users
+        b.soft_delete()
+        d.soft_delete()
+        self.assertEqual(
+            relationship_statuses(a, [b.pk, c.pk, d.pk]),
+            {b.pk: "none", c.pk: "friend", d.pk: "none"})
+
+    def test_distance_through_a_deleted_user_is_null(self):
+        a, b, c, d = self.users
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(a)['access']}")
+        url = reverse("user-friend-distance", kwargs={"pk": d.pk})
+        b.soft_delete()
+        # a snapshot read before b was deleted
+        with mock.patch.object(views.friend_graph, "shortest_path",
+                               return_value=[a.pk, b.pk, d.pk]):
+            data = client.get(url).json()["data"]
+        self.assertEqual(data, {"distance": None, "path": None})
+
+    def test_purge_in_batches_with_cascades(self):
+        a, b, c, d = self.users
+        a.soft_delete()
+        d.soft_delete()
+        Friendship.objects.get(user1=b, user2=c).soft_delete()
+        batches = []
+        deleted = purge_soft_deleted(
+            batch_size=1, progress=lambda model, deleted: batches.append(model))
+        self.assertEqual(batches, [Friendship, User, User])
+        self.assertEqual(
+            {label: deleted[label] for label in (
+                "app_apis.User", "app_apis.Friendship",
+                "app_apis.FriendshipEdge", "app_apis.FriendRequest")},
+            {"app_apis.User": 2, "app_apis.Friendship": 3,
+             "app_apis.FriendshipEdge": 6, "app_apis.FriendRequest": 2})
+        self.assertEqual(
+            list(User.all_objects.order_by("email").values_list("email", flat=True)),
+            ["soft1@example.com", "soft2@example.com"])
+        self.assertFalse(Friendship.all_objects.exists())
+
+
+class SuggestIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f"prefix{i}@example.com", name=f"Prefix {i}", tc=True)
+            for i in range(3)
+        ])
+
+    def test_saves_during_a_build_are_kept(self):
+        index = PrefixIndex()
+        index.build()
+        renamed, removed = self.users[0], self.users[1]
+        joined = User(email="joined@example.com", name="Joined", tc=True)
+
+        class RacingIndex(PrefixIndex):
+            def read_users(self):
+                rows = list(super().read_users())
+                # saved while the build was reading
+                renamed.name = "Renamed"
+                self.add(renamed)
+                self.remove(removed.pk)
+                self.add(joined)
+                return rows
+
+        index = RacingIndex()
+        self.assertEqual(index.build(), 3)
+        self.assertEqual([row["name"] for row in index.suggest("renamed")], ["Renamed"])
+        self.assertEqual(index.suggest(removed.email), [])
+        self.assertEqual([row["email"] for row in index.suggest("joined")], ["joined@example.com"])
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_rebuild_command_needs_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, "per-process LocMemCache"):
+            call_command("rebuild_suggest_index")
+
+
+class KeysetPaginationTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *cls.friends = User.objects.bulk_create([
+            User(email=f"keyset{i}@example.com", name=f"Keyset {i}", tc=True)
+            for i in range(26)
+        ])
+        create_friendships((cls.user.pk, friend.pk) for friend in cls.friends)
+        # every edge on one of two timestamps: pages split inside the ties
+        now = timezone.now()
+        for i, edge in enumerate(FriendshipEdge.objects.filter(user=cls.user)):
+            edge.created_at = now - timedelta(seconds=i % 2)
+            edge.save(update_fields=["created_at"])
+
+    def setUp(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.user)['access']}")
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_walk_forward_then_back(self):
+        expected = [
+            str(friend_id) for friend_id in FriendshipEdge.objects.filter(user=self.user)
+            .order_by("-created_at", "-id").values_list("friend_id", flat=True)
+        ]
+        pages = [self.get_page(reverse("user-friends-list") + "?pagination=cursor")]
+        while pages[-1]["next"]:
+            pages.append(self.get_page(pages[-1]["next"]))
+        ids = [[row["id"] for row in page["results"]] for page in pages]
+        self.assertEqual([len(page) for page in ids], [10, 10, 5])
+        self.assertEqual(sum(ids, []), expected)
+        self.assertIsNone(pages[0]["previous"])
+
+        page, back = pages[-1], []
+        while page["previous"]:
+            page = self.get_page(page["previous"])
+            back.insert(0, [row["id"] for row in page["results"]])
+        self.assertEqual(back, ids[:-1])
+        self.assertIsNotNone(page["next"])
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ("not-base64!", "bm90IGEgY3Vyc29y", "MXx5ZXN0ZXJkYXl8MQ=="):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("user-friends-list"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class ProjectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email="projection0@example.com", name="Zoë Ångström", tc=True),
+            User(email="projection1@example.com", name="Projection 1", tc=True),
+            User(email="projection2@example.com", name="", tc=True),
+        ])
+        create_friendships([(cls.users[0].pk, cls.users[1].pk), (cls.users[0].pk, cls.users[2].pk)])
+
+    def assertSameRows(self, serializer_class, projection, queryset):
+        serialized = serializer_class(queryset, many=True).data
+        projected = projection.map(projection.apply(queryset))
+        self.assertEqual([list(row.items()) for row in serialized],
+                         [list(row.items()) for row in projected])
+
+    def test_user_projection_matches_serializer(self):
+        self.assertSameRows(
+            UserSerializer, USER_PROJECTION, User.objects.order_by("email"))
+
+    def test_friend_projection_matches_serializer(self):
+        self.assertSameRows(
+            FriendSerializer, FRIEND_PROJECTION,
+            FriendshipEdge.objects.select_related("friend").order_by("friend__email"))
+
+
+class FastJSONRendererTests(TestCase):
+
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_drf_renderer(self):
+        now = timezone.now()
+        row = {
+            "id": uuid.uuid4(),
+            "created_at": now,
+            "whole_second": now.replace(microsecond=0),
+            "local": now.astimezone(dt_timezone(timedelta(hours=5, minutes=30))),
+            "naive": datetime(2024, 2, 29, 12, 0, 0, 123456),
+            "day": now.date(),
+            "amount": Decimal("12.50"),
+            "name": "Zoë 名前 \u2028\u2029 \"quoted\" \\ \n",
+            "nothing": None,
+            "flags": [True, False, 1.5, -3],
+        }
+        self.assertSameBytes(envelope("Fetched", row))
+        self.assertSameBytes(envelope("Failed", type="error", errors={"name": ["Too long"]}))
+        self.assertSameBytes(page_envelope("Page", {
+            "count": 2, "next": "http://testserver/?cursor=MXwy", "previous": None,
+            "results": [row, dict(row, id=uuid.uuid4())],
+        }))
+        self.assertSameBytes(page_envelope("Page", []))
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    SEARCH_CACHE={"ENABLED": True},
+)
+class SearchCacheTests(TransactionTestCase):
+    """
+    The search cache version is bumped on commit, so these run outside a
+    wrapping transaction.
+    """
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        self.user = User.objects.create(email="searcher@example.com", name="Searcher", tc=True)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.user)['access']}")
+
+    def search(self, term):
+        response = self.client.get(reverse("user-search"), {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.json()["data"]["results"]]
+
+    def hits(self):
+        return registry.collect().counters.get(("search_cache_requests_total", ("hit",)), 0)
+
+    def test_register_and_rename_drop_cached_pages(self):
+        self.assertEqual(self.search("Cached"), [])
+        hits = self.hits()
+        self.assertEqual(self.search("cached"), [])
+        self.assertEqual(self.hits(), hits + 1)
+
+        response = APIClient().post(reverse("user-register"), {
+            "email": "cached@example.com", "name": "Cached Person",
+            "password": "s3cret-pass", "password2": "s3cret-pass", "tc": True,
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search("Cached"), ["Cached Person"])
+
+        renamed = User.objects.get(email="cached@example.com")
+        renamed.name = "Renamed Person"
+        renamed.save(update_fields=["name", "updated_at"])
+        self.assertEqual(self.search("Cached"), [])
+        self.assertEqual(self.search("Renamed"), ["Renamed Person"])
+
+
+@override_settings(
+    PASSWORD_HASHERS=["social_networking.app_apis.hashing.PooledPBKDF2PasswordHasher"],
+    PASSWORD_HASHING_POOL={"WORKERS": 0, "MAX_PENDING": 1, "RETRY_AFTER": 2.5},
+)
+class HashingPoolTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # one iteration, hashed inline: only the login should be turned away
+        cls.user = User.objects.create(
+            email="pooled@example.com", name="Pooled", tc=True,
+            password=PooledPBKDF2PasswordHasher().encode("s3cret-pass", "salt", iterations=1))
+
+    def setUp(self):
+        # the pool reads its settings when first used in a process
+        hashing_pool.shutdown()
+        self.addCleanup(hashing_pool.shutdown)
+
+    def login(self):
+        return self.client.post(
+            reverse("user-login"),
+            {"email": "pooled@example.com", "password": "s3cret-pass"},
+            content_type="application/json")
+
+    def test_login_succeeds_with_a_free_slot(self):
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_full_pool_answers_503_with_retry_after(self):
+        # MAX_PENDING hashes already in flight
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        rejected = hashing_stats.snapshot().get("pbkdf2_sha256", {}).get("rejected", 0)
+        with mock.patch.object(hashing_pool, "get_executor", return_value=(None, full)):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "3")
+        self.assertEqual(response.json()["type"], "failure")
+        self.assertEqual(hashing_stats.snapshot()["pbkdf2_sha256"]["rejected"], rejected + 1)
+
+
+class PendingExportTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.receiver, *cls.senders = User.objects.bulk_create([
+            User(email=f"export{i}@example.com", name=f"Export {i}", tc=True)
+            for i in range(13)
+        ])
+        for sender in cls.senders:
+            send_friend_request(sender, cls.receiver, "failed")
+
+    def setUp(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.receiver)['access']}")
+
+    async def read_async(self, content):
+        return b"".join([chunk async for chunk in content])
+
+    def test_export_streams_one_request_per_line(self):
+        url = reverse("pending-friend-requests")
+        paged = self.client.get(url).json()["data"]
+        rows = paged["results"] + self.client.get(paged["next"]).json()["data"]["results"]
+        self.assertEqual(len(rows), 12)
+
+        # chunks of 5 end inside and on the 10-row page boundary
+        with mock.patch.object(views.PendingFriendRequestView, "export_chunk_size", 5), \
+                mock.patch.object(async_views.AsyncPendingFriendRequestView, "export_chunk_size", 5):
+            response = self.client.get(url, {"export": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        if response.is_async:
+            body = async_to_sync(self.read_async)(response.streaming_content)
+        else:
+            body = b"".join(response.streaming_content)
+        self.assertTrue(body.endswith(b"\n"))
+        lines = body.split(b"\n")[:-1]
+        self.assertEqual([json.loads(line) for line in lines], rows)
@@ -0,0 +1,352 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .custom_response import APIException
+from .models import RateLimitCounter
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse a DRF style rate such as "3/min" into (requests, seconds).
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+class LocalMemoryRateLimitBackend:
+    """
+    Exact sliding-log limiter held in process memory. Only correct for a
+    single process, but needs no shared storage.
+    """
+    sweep_every = 1000
+    # whether hits run database queries (see SlidingWindowThrottle.backend_call)
+    uses_database = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (window, log of hit times)
+        self.logs = {}
+        self.hits = 0
+
+    def hit(self, key, limit, window, now=None, cost=1):
+        now = time.time() if now is None else now
+        if cost > limit:
+            return False, None
+        with self.lock:
+            self.hits += 1
+            if self.hits % self.sweep_every == 0:
+                self._sweep(now)
+            entry = self.logs.get(key)
+            log = entry[1] if entry is not None else deque()
+            self.logs[key] = (window, log)
+            while log and log[0] <= now - window:
+                log.popleft()
+            if len(log) + cost > limit:
+                # until enough of the oldest hits leave the window
+                return False, log[len(log) + cost - limit - 1] + window - now
+            log.extend([now] * cost)
+            return True, None
+
+    def refund(self, key, window, now, count=1):
+        """
+        Take back `count` hits recorded at `now` by hit().
+        """
+        with self.lock:
+            _, log = self.logs.get(key, (window, deque()))
+            for _ in range(count):
+                try:
+                    log.remove(now)
+                except ValueError:
+                    break
+
+    def _sweep(self, now):
+        # every key is swept with the window it was last hit with, so a
+        # short window does not evict the logs of longer ones
+        for key in [
+            k for k, (window, log) in self.logs.items()
+            if not log or log[-1] <= now - window
+        ]:
+            del self.logs[key]
+
+
+class SlidingWindowCounterMixin:
+    """
+    Sliding-window counter: the previous fixed window is weighted by how
+    much of it still overlaps the sliding window, so the allowance for the
+    current window is `limit - previous * overlap`.
+    """
+
+    def window_state(self, now, window):
+        current = int(now // window)
+        elapsed = (now % window) / window
+        return current, elapsed
+
+    def allowance(self, limit, previous, elapsed):
+        return limit - math.floor(previous * (1 - elapsed))
+
+    def retry_after(self, now, window):
+        return window - (now % window)
+
+
+class CacheRateLimitBackend(SlidingWindowCounterMixin):
+    """
+    Shared limiter on Django's cache framework. The counter is bumped with
+    the cache's atomic incr() before it is compared, so concurrent callers
+    each see a distinct count and the limit cannot be overrun.
+    """
+
+    def __init__(self, alias=None):
+        alias = alias or getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default")
+        self.cache = caches[alias]
+        self.uses_database = isinstance(self.cache, DatabaseCache)
+
+    def hit(self, key, limit, window, now=None, cost=1):
+        now = time.time() if now is None else now
+        if cost > limit:
+            return False, None
+        current, elapsed = self.window_state(now, window)
+        current_key = f"{key}:{current}"
+        previous = self.cache.get(f"{key}:{current - 1}", 0)
+        self.cache.add(current_key, 0, timeout=window * 2)
+        try:
+            count = self.cache.incr(current_key, cost)
+        except ValueError:
+            # key expired between add() and incr()
+            self.cache.add(current_key, 0, timeout=window * 2)
+            count = self.cache.incr(current_key, cost)
+        if count > self.allowance(limit, previous, elapsed):
+            self.cache.decr(current_key, cost)
+            return False, self.retry_after(now, window)
+        return True, None
+
+    def refund(self, key, window, now, count=1):
+        current, _ = self.window_state(now, window)
+        try:
+            self.cache.decr(f"{key}:{current}", count)
+        except ValueError:
+            # the window expired in the meantime
+            pass
+
+
+class DatabaseRateLimitBackend(SlidingWindowCounterMixin):
+    """
+    Fallback limiter for deployments without a shared cache. The counter
+    row is only incremented by a conditional UPDATE ... WHERE count <= n - cost,
+    which the database applies atomically; the first hit of a window
+    INSERTs the row instead. Every step is a single write statement, so
+    SQLite callers wait on its busy timeout rather than failing to
+    upgrade a read lock.
+    """
+    cleanup_probability = 0.01
+    uses_database = True
+
+    def hit(self, key, limit, window, now=None, cost=1):
+        now = time.time() if now is None else now
+        if cost > limit:
+            return False, None
+        current, elapsed = self.window_state(now, window)
+        previous = (
+            RateLimitCounter.objects.filter(key=key, window=current - 1)
+            .values_list("count", flat=True)
+            .first()
+        ) or 0
+        allowance = self.allowance(limit, previous, elapsed)
+        allowed = self.increment(key, current, allowance, cost)
+        if not allowed and allowance >= cost:
+            try:
+                with transaction.atomic():
+                    RateLimitCounter.objects.create(key=key, window=current, count=cost)
+                allowed = True
+            except IntegrityError:
+                # the row exists: full, or created by a concurrent hit
+                allowed = self.increment(key, current, allowance, cost)
+        if random.random() < self.cleanup_probability:
+            RateLimitCounter.objects.filter(key=key, window__lt=current - 1).delete()
+        if not allowed:
+            return False, self.retry_after(now, window)
+        return True, None
+
+    def increment(self, key, current, allowance, cost):
+        return RateLimitCounter.objects.filter(
+            key=key, window=current, count__lte=allowance - cost
+        ).update(count=F("count") + cost)
+
+    def refund(self, key, window, now, count=1):
+        current, _ = self.window_state(now, window)
+        RateLimitCounter.objects.filter(
+            key=key, window=current, count__gte=count
+        ).update(count=F("count") - count)
+
+
+_backend = None
+
+
+def get_rate_limit_backend():
+    """
+    Return the backend named by RATE_LIMIT_BACKEND (a dotted path).
+    """
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.RATE_LIMIT_BACKEND)()
+    return _backend
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the configured rate limit backend.
+
+    Rates come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"][scope].
+    Authenticated requests are limited per user, anonymous ones per
+    client address. Set `methods` to only limit some HTTP methods.
+    A request costs get_cost() hits, all admitted or none. With
+    `refund_failures`, the hits of a request that ends in an error
+    response are given back (see ThrottleRefundMixin), so only requests
+    that succeed count against the rate.
+    """
+    scope = None
+    methods = None
+    refund_failures = False
+
+    def __init__(self):
+        self.num_requests, self.duration = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        )
+        self.retry_after = None
+        # (key, time, hits) this request was charged, if anything
+        self.charge = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f"ratelimit:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return True
+        key = self.get_cache_key(request, view)
+        cost = self.get_cost(request, view)
+        now = time.time()
+        allowed, self.retry_after = get_rate_limit_backend().hit(
+            key, self.num_requests, self.duration, now=now, cost=cost
+        )
+        if allowed:
+            self.charge = (key, now, cost)
+        return allowed
+
+    def get_cost(self, request, view):
+        return 1
+
+    def backend_call(self, func):
+        """
+        Wrap `func`, which hits the rate limit backend, for async callers.
+        The in-memory and cache backends are thread-safe and run off the
+        shared sync thread, which would serialize every async request
+        here. A backend querying the database stays on that thread like
+        the async ORM: a connection opened on an executor thread is never
+        closed.
+        """
+        thread_sensitive = get_rate_limit_backend().uses_database
+        return sync_to_async(func, thread_sensitive=thread_sensitive)
+
+    async def aallow_request(self, request, view):
+        return await self.backend_call(self.allow_request)(request, view)
+
+    def refund(self, count=None):
+        """
+        Give back `count` (default: all) of the hits this request was
+        charged, when `refund_failures` is set.
+        """
+        if self.charge is None or not self.refund_failures:
+            return
+        key, now, cost = self.charge
+        count = cost if count is None else min(count, cost)
+        self.charge = (key, now, cost - count) if count < cost else None
+        if count > 0:
+            get_rate_limit_backend().refund(key, self.duration, now, count)
+
+    async def arefund(self, count=None):
+        await self.backend_call(self.refund)(count)
+
+    def wait(self):
+        return self.retry_after
+
+
+class ThrottleRefundMixin:
+    """
+    APIView mixin that refunds the throttles of requests answered with an
+    error status (see SlidingWindowThrottle.refund_failures). Handlers
+    call refund_throttles(n) to give back part of a charge themselves.
+    """
+
+    def get_throttles(self):
+        self.throttles = super().get_throttles()
+        return self.throttles
+
+    def refund_throttles(self, count=None):
+        for throttle in getattr(self, "throttles", ()):
+            throttle.refund(count)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if response.status_code >= 400:
+            self.refund_throttles()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class FriendRequestThrottle(SlidingWindowThrottle):
+    """
+    Counts the friend requests actually sent: a POST answered with an
+    error (unknown receiver, already sent...) is not charged.
+    """
+    scope = "friend_request"
+    methods = ("POST",)
+    refund_failures = True
+
+
+class BulkFriendRequestThrottle(FriendRequestThrottle):
+    """
+    Charges a batch one hit per receiver against the same window as
+    single sends, so a batch larger than what is left of it is refused
+    with 429. A batch larger than the whole rate could never be admitted,
+    so it is answered with 400 instead of a 429 that retrying won't fix.
+    """
+
+    def get_cost(self, request, view):
+        receiver_ids = request.data.get("receiver_ids")
+        if not isinstance(receiver_ids, list) or not receiver_ids:
+            # rejected by the view, and refunded
+            return 1
+        cost = len({str(receiver_id) for receiver_id in receiver_ids})
+        if cost > self.num_requests:
+            raise APIException(
+                message="Failed to send friend requests",
+                errors=(
+                    f"A batch of {cost} receivers exceeds the friend request rate "
+                    f"of {self.num_requests} per {self.duration} seconds"
+                ),
+            )
+        return cost
+
+
+class LoginThrottle(SlidingWindowThrottle):
+    scope = "login"
+
+
+class RegistrationThrottle(SlidingWindowThrottle):
+    scope = "register"
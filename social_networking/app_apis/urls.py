@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from  .v1.user_auth.views import (
     UserRegistrationView,
@@ -6,12 +7,28 @@ from  .v1.user_auth.views import (
 )
 from .v1.networking_application.views import (
     UserSearchView,
+    UserSuggestView,
     FriendRequestView,
-    FriendRequestView,
+    BulkFriendRequestView,
+    BulkRespondFriendRequestView,
     PendingFriendRequestView,
-    FriendListView
+    FriendListView,
+    UserRelationshipView,
+    FriendSuggestionView,
+    FriendDistanceView,
 )
 
+if settings.ASYNC_VIEWS:
+    # async-native versions of the hot read/write endpoints, served under
+    # the same routes and names; only worth enabling under ASGI
+    from .v1.user_auth.async_views import AsyncUserLoginView as UserLoginView
+    from .v1.networking_application.async_views import (
+        AsyncUserSearchView as UserSearchView,
+        AsyncFriendRequestView as FriendRequestView,
+        AsyncPendingFriendRequestView as PendingFriendRequestView,
+        AsyncFriendListView as FriendListView,
+    )
+
 urlpatterns = [
     path('user/register/',
         UserRegistrationView.as_view(),
@@ -29,18 +46,39 @@ urlpatterns = [
         UserSearchView.as_view(),
         name='user-search'
     ),
+    path('user/search/suggest/',
+        UserSuggestView.as_view(),
+        name='user-search-suggest'
+    ),
     path('user/friend-requests/',
         FriendRequestView.as_view(),
         name='send-friend-request'
     ),
+    path('user/friend-requests/bulk/',
+        BulkFriendRequestView.as_view(),
+        name='send-friend-requests-bulk'
+    ),
     path('user/friend-request/<uuid:pk>/',
         FriendRequestView.as_view(),
         name='respond-friend-request'
     ),
+    path('user/friend-requests/respond/',
+        BulkRespondFriendRequestView.as_view(),
+        name='respond-friend-requests-bulk'
+    ),
     path('user/friend-requests-pending/',
         PendingFriendRequestView.as_view(),
         name='pending-friend-requests'),
     path('user/friends-list/',
         FriendListView.as_view(),
         name='user-friends-list'),
+    path('user/relationships/',
+        UserRelationshipView.as_view(),
+        name='user-relationships'),
+    path('user/suggestions/',
+        FriendSuggestionView.as_view(),
+        name='user-friend-suggestions'),
+    path('user/<uuid:pk>/distance/',
+        FriendDistanceView.as_view(),
+        name='user-friend-distance'),
 ]
@@ -1,8 +1,20 @@
 
-from social_networking.app_apis.models import User, FriendRequest, Friendship
+import uuid
+from collections import Counter
+from itertools import chain
+from django.db.models import CharField, Case, Exists, OuterRef, Q, Value, When
 from django.utils import timezone
-from datetime import timedelta
+from rest_framework.exceptions import NotFound
+from social_networking.app_apis.models import (
+    LIVE_FRIEND_EDGE, User, FriendRequest, Friendship, FriendshipEdge
+)
+from .conditional import bump_stamps
 from .custom_response import APIException
+from .counters import adjust_counter
+from .friend_suggestions import forget_suggestions, mark_suggestions_stale
+
+MAX_BULK_FRIEND_REQUESTS = 100
+MAX_RELATIONSHIP_IDS = 100
 
 
 def validate_receiver_id(receiver_id, failure_message):
@@ -20,30 +32,144 @@ def get_receiver(receiver_id, sender, failure_message):
     return receiver
 
 
-def check_recent_requests(sender, failure_message):
-    one_minute_ago = timezone.now() - timedelta(minutes=1)
-    recent_requests = FriendRequest.objects.filter(
-        sender=sender, created_at__gte=one_minute_ago
-    ).count()
-    if recent_requests >= 3:
+async def aget_receiver(receiver_id, sender, failure_message):
+    """
+    Async counterpart of get_receiver for the async views.
+    """
+    receiver = await User.objects.aget(id=receiver_id)
+    if sender == receiver:
         raise APIException(
             message=failure_message,
-            errors="Cannot send more than 3 friend requests within a minute",
+            errors="You cannot send a friend request to yourself!",
         )
+    return receiver
 
 
 def send_friend_request(sender, receiver, failure_message):
-    friend_request, created = FriendRequest.objects.get_or_create(
+    # a soft-deleted request still holds the (sender, receiver) pair
+    friend_request, created = FriendRequest.all_objects.get_or_create(
         sender=sender, receiver=receiver
     )
     if not created:
         raise APIException(
             message=failure_message, errors="Friend request already sent"
         )
+    adjust_counter("pending_request_count", {receiver.pk: 1})
+    bump_stamps("pending", [receiver.pk])
+    forget_suggestions([(sender.pk, receiver.pk)])
+
+
+def validate_receiver_ids(receiver_ids, failure_message):
+    if not isinstance(receiver_ids, list) or not receiver_ids:
+        raise APIException(
+            message=failure_message,
+            errors="receiver_ids must be a non-empty list",
+        )
+    if len(receiver_ids) > MAX_BULK_FRIEND_REQUESTS:
+        raise APIException(
+            message=failure_message,
+            errors=f"Cannot send more than {MAX_BULK_FRIEND_REQUESTS} friend requests at once",
+        )
+
+
+def send_friend_requests(sender, receiver_ids):
+    """
+    Send friend requests from `sender` to many receivers at once.
+
+    Receivers are validated with one id__in query, already-sent pairs
+    with a second one, and the rest are inserted with a single
+    bulk_create that relies on the (sender, receiver) unique constraint
+    to skip requests raced in meanwhile. Returns a map of receiver id to
+    one of "sent", "already_sent", "not_found", "self" or "invalid".
+    """
+    results = {}
+    wanted = {}
+    for receiver_id in receiver_ids:
+        try:
+            wanted[uuid.UUID(str(receiver_id))] = str(receiver_id)
+        except ValueError:
+            results[str(receiver_id)] = "invalid"
+
+    if sender.pk in wanted:
+        results[wanted.pop(sender.pk)] = "self"
+
+    existing = set(
+        User.objects.filter(id__in=wanted).values_list("id", flat=True)
+    )
+    already_sent = set(
+        FriendRequest.all_objects.filter(sender=sender, receiver_id__in=existing)
+        .values_list("receiver_id", flat=True)
+    )
+
+    new_requests = []
+    for receiver_id, key in wanted.items():
+        if receiver_id not in existing:
+            results[key] = "not_found"
+        elif receiver_id in already_sent:
+            results[key] = "already_sent"
+        else:
+            results[key] = "sent"
+            new_requests.append(
+                FriendRequest(sender=sender, receiver_id=receiver_id))
+
+    FriendRequest.objects.bulk_create(new_requests, ignore_conflicts=True)
+    inserted = inserted_rows(FriendRequest, new_requests)
+    for request in new_requests:
+        if request.pk not in inserted:
+            results[wanted[request.receiver_id]] = "already_sent"
+    new_requests = [request for request in new_requests if request.pk in inserted]
+    adjust_counter(
+        "pending_request_count",
+        {request.receiver_id: 1 for request in new_requests})
+    bump_stamps("pending", [request.receiver_id for request in new_requests])
+    forget_suggestions(
+        [(sender.pk, request.receiver_id) for request in new_requests])
+    return results
+
+
+def inserted_rows(model, objs):
+    """
+    Primary keys of `objs` that a bulk_create(ignore_conflicts=True)
+    actually inserted. The pks are generated client-side, so the rows
+    skipped on a conflict are exactly the ones that cannot be found.
+    """
+    if not objs:
+        return set()
+    return set(
+        model._base_manager.filter(pk__in=[obj.pk for obj in objs])
+        .values_list("pk", flat=True)
+    )
+
+
+def validate_uuid(value, failure_message, errors):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise APIException(message=failure_message, errors=errors)
+
+
+def validate_request_ids(request_ids, failure_message):
+    if not isinstance(request_ids, list) or not request_ids:
+        raise APIException(
+            message=failure_message,
+            errors="request_ids must be a non-empty list",
+        )
+    return [
+        validate_uuid(request_id, failure_message, "Invalid request id")
+        for request_id in request_ids
+    ]
+
+
+def validate_sender_id(sender_id, failure_message):
+    return validate_uuid(sender_id, failure_message, "Invalid sender id")
 
 
 def get_friend_request(pk, user, failure_message):
-        friend_request = FriendRequest.objects.get(pk=pk)
+        # requests of soft-deleted senders can no longer be answered
+        friend_request = FriendRequest.objects.filter(
+            pk=pk, sender__is_deleted=False).first()
+        if friend_request is None:
+            raise NotFound("Friend request not found")
         if friend_request.receiver != user:
             raise APIException(
                 message=failure_message,
@@ -51,6 +177,22 @@ def get_friend_request(pk, user, failure_message):
             )
         return friend_request
 
+
+async def aget_friend_request(pk, user, failure_message):
+    """
+    Async counterpart of get_friend_request for the async views.
+    """
+    friend_request = await FriendRequest.objects.select_related(
+        "sender", "receiver").filter(pk=pk, sender__is_deleted=False).afirst()
+    if friend_request is None:
+        raise NotFound("Friend request not found")
+    if friend_request.receiver_id != user.pk:
+        raise APIException(
+            message=failure_message,
+            errors="You are not authorized to accept/reject this request",
+        )
+    return friend_request
+
 def validate_request_status(request_status, failure_message):
     if request_status not in ["accepted", "rejected"]:
         raise APIException(message=failure_message, errors="Invalid Status")
@@ -58,9 +200,197 @@ def validate_request_status(request_status, failure_message):
 
 
 def update_friend_request_status(friend_request, request_status):
+    # only the caller that moves the request out of "pending" decrements
+    # the receiver's counter
+    answered = FriendRequest.objects.filter(
+        pk=friend_request.pk, status="pending"
+    ).update(status=request_status, updated_at=timezone.now())
     friend_request.status = request_status
-    friend_request.save()
+    if answered:
+        adjust_counter("pending_request_count", {friend_request.receiver_id: -1})
+        bump_stamps("pending", [friend_request.receiver_id])
+    else:
+        friend_request.save()
 
 
 def create_friendship(sender, receiver):
-    Friendship.objects.create(user1=sender, user2=receiver)
\ No newline at end of file
+    return create_friendships([(sender.pk, receiver.pk)])[0]
+
+
+def create_friendships(pairs):
+    """
+    Create one Friendship per (user1_id, user2_id) pair, plus both
+    directions of the symmetric adjacency index, with two bulk inserts.
+    Edges that did not exist yet, or belonged to a soft-deleted
+    friendship of the same pair, bump both users' friend_count.
+    """
+    pairs = list(pairs)
+    user_ids = set(chain.from_iterable(pairs))
+    friendships = [
+        Friendship(user1_id=user1_id, user2_id=user2_id)
+        for user1_id, user2_id in pairs
+    ]
+    Friendship.objects.bulk_create(friendships)
+    edges = []
+    for friendship in friendships:
+        edges.append(FriendshipEdge(
+            friendship=friendship,
+            user_id=friendship.user1_id,
+            friend_id=friendship.user2_id))
+        edges.append(FriendshipEdge(
+            friendship=friendship,
+            user_id=friendship.user2_id,
+            friend_id=friendship.user1_id))
+    # the reverse friendship may already exist from an earlier request
+    FriendshipEdge.objects.bulk_create(edges, ignore_conflicts=True)
+    inserted = inserted_rows(FriendshipEdge, edges)
+    new_friends = Counter(edge.user_id for edge in edges if edge.pk in inserted)
+    for edge in edges:
+        # the pair was friends before and that friendship was
+        # soft-deleted: its edges still hold the (user, friend) pair,
+        # so point them at the new friendship
+        if edge.pk not in inserted and FriendshipEdge.objects.filter(
+            user_id=edge.user_id, friend_id=edge.friend_id,
+            friendship__is_deleted=True,
+        ).update(friendship=edge.friendship, updated_at=timezone.now()):
+            new_friends[edge.user_id] += 1
+    adjust_counter("friend_count", new_friends)
+    bump_stamps("friends", user_ids)
+    forget_suggestions(pairs)
+    mark_suggestions_stale(chain.from_iterable(pairs))
+    return friendships
+
+
+def respond_friend_requests(receiver, request_status, request_ids=None, sender_id=None):
+    """
+    Accept or reject many pending friend requests of `receiver` at once.
+
+    Must run inside a transaction. The pending rows are locked and read
+    once, flipped with a single conditional UPDATE, and accepted ones
+    become friendships through one bulk insert. Requests of soft-deleted
+    senders are left alone. Returns the ids of the requests that were
+    pending and are now answered.
+    """
+    pending = FriendRequest.objects.filter(
+        receiver=receiver, status="pending", sender__is_deleted=False)
+    if request_ids is not None:
+        pending = pending.filter(id__in=request_ids)
+    if sender_id is not None:
+        pending = pending.filter(sender_id=sender_id)
+    rows = list(
+        pending.select_for_update(of=("self",)).order_by().values_list("id", "sender_id")
+    )
+    if not rows:
+        return []
+
+    answered = [request_id for request_id, _ in rows]
+    answered_at = timezone.now()
+    updated = FriendRequest.objects.filter(id__in=answered, status="pending").update(
+        status=request_status, updated_at=answered_at
+    )
+    if updated != len(answered):
+        # without row locks (SQLite) a concurrent answer can get in
+        # between the read and the UPDATE; keep only the rows flipped here
+        flipped = set(
+            FriendRequest.objects.filter(
+                id__in=answered, status=request_status, updated_at=answered_at
+            ).values_list("id", flat=True)
+        )
+        rows = [row for row in rows if row[0] in flipped]
+        answered = [request_id for request_id, _ in rows]
+    adjust_counter("pending_request_count", {receiver.pk: -len(answered)})
+    bump_stamps("pending", [receiver.pk])
+    if request_status == "accepted" and rows:
+        create_friendships([(sender, receiver.pk) for _, sender in rows])
+    return answered
+
+
+def validate_user_ids(raw_ids, failure_message):
+    """
+    Parse ?ids= values (comma separated, the parameter may repeat) into
+    a de-duplicated list of at most MAX_RELATIONSHIP_IDS UUIDs.
+    """
+    user_ids = [
+        part.strip() for value in raw_ids for part in value.split(",") if part.strip()
+    ]
+    if not user_ids:
+        raise APIException(message=failure_message, errors="ids is required")
+    if len(user_ids) > MAX_RELATIONSHIP_IDS:
+        raise APIException(
+            message=failure_message,
+            errors=f"Cannot look up more than {MAX_RELATIONSHIP_IDS} users at once",
+        )
+    try:
+        return list(dict.fromkeys(uuid.UUID(user_id) for user_id in user_ids))
+    except ValueError:
+        raise APIException(message=failure_message, errors="Invalid user id")
+
+
+def relationship_statuses(user, user_ids):
+    """
+    Map each of `user_ids` to `user`'s relationship with that user:
+    "self", "friend", "request_sent", "request_received" (a pending
+    request in that direction) or "none", unknown ids included.
+    Soft-deleted friendships, requests and users do not count.
+
+    Two queries whatever the number of ids: friends through the
+    (user, friend) index of FriendshipEdge, pending requests through the
+    (sender, receiver) and pending-receiver indexes of FriendRequest.
+    """
+    statuses = {user_id: "none" for user_id in user_ids}
+    if user.pk in statuses:
+        statuses[user.pk] = "self"
+    others = [user_id for user_id in statuses if user_id != user.pk]
+    if not others:
+        return statuses
+
+    friend_ids = FriendshipEdge.objects.filter(
+        LIVE_FRIEND_EDGE, user=user, friend_id__in=others
+    ).values_list("friend_id", flat=True)
+    for friend_id in friend_ids:
+        statuses[friend_id] = "friend"
+    pending = FriendRequest.objects.filter(
+        Q(sender=user, receiver_id__in=others, receiver__is_deleted=False)
+        | Q(receiver=user, sender_id__in=others, sender__is_deleted=False),
+        status="pending",
+    ).values_list("sender_id", "receiver_id")
+    for sender_id, receiver_id in pending:
+        if sender_id == user.pk:
+            other, relationship = receiver_id, "request_sent"
+        else:
+            other, relationship = sender_id, "request_received"
+        if statuses[other] == "none":
+            statuses[other] = relationship
+    return statuses
+
+
+def relationship_annotation(user, outer_ref="pk"):
+    """
+    The relationship_statuses() value as a queryset expression, for
+    annotating rows with `user`'s relationship to the user `outer_ref`
+    points at. Each status is an Exists() subquery on the same indexes,
+    evaluated inside the list query instead of once per row.
+    """
+    other = OuterRef(outer_ref)
+    return Case(
+        When(Q(**{outer_ref: user.pk}), then=Value("self")),
+        When(Exists(FriendshipEdge.objects.filter(
+            LIVE_FRIEND_EDGE, user=user, friend_id=other)),
+             then=Value("friend")),
+        When(Exists(FriendRequest.objects.filter(
+            sender=user, receiver_id=other, status="pending", receiver__is_deleted=False)),
+             then=Value("request_sent")),
+        When(Exists(FriendRequest.objects.filter(
+            sender_id=other, receiver=user, status="pending", sender__is_deleted=False)),
+             then=Value("request_received")),
+        default=Value("none"),
+        output_field=CharField(),
+    )
+
+
+def includes_relationship(query_params):
+    """
+    Whether a list request opted into per-row relationship statuses
+    with ?include=relationship.
+    """
+    return query_params.get("include") == "relationship"
@@ -0,0 +1,171 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Value
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from social_networking.app_apis.models import LIVE_FRIEND_EDGE, User, FriendRequest, FriendshipEdge
+from .serializers import (
+    USER_PROJECTION,
+    FRIEND_PROJECTION,
+    PENDING_REQUEST_PROJECTION,
+    USER_RELATIONSHIP_PROJECTION,
+    FRIEND_RELATIONSHIP_PROJECTION,
+)
+from ...async_api import AsyncAPIView
+from ...conditional import astamp_etag, conditional_get
+from ...custom_response import page_envelope
+from ...pagination import ListPagination
+from ...renderers import dumps
+from ...search import get_search_backend
+from ...search_cache import aget_cached_page, aset_cached_page
+from ...throttling import FriendRequestThrottle
+import logging
+from ...utils import *
+logger = logging.getLogger(__name__)
+
+
+class AsyncUserSearchView(AsyncAPIView):
+    """
+    Async version of UserSearchView, same parameters and response.
+    """
+
+    async def get(self, request):
+        cache_key, page = await aget_cached_page(self.api_request)
+        if page is not None:
+            return self.json_response(page_envelope("User Fetched Successfully", page))
+        paginator = ListPagination()
+        queryset = User.objects.order_by("-created_at", "-id")
+        search_keyword = self.api_request.query_params.get("search", None)
+        if search_keyword:
+            # keyset pages need the (created_at, id) order, so only
+            # page-number results are ranked by relevance
+            rank = not paginator.is_cursor_mode(self.api_request)
+            queryset = get_search_backend().search(
+                queryset, search_keyword, rank=rank)
+        projection = USER_PROJECTION
+        if includes_relationship(self.api_request.query_params):
+            queryset = queryset.annotate(relationship=relationship_annotation(request.user))
+            projection = USER_RELATIONSHIP_PROJECTION
+
+        page = await paginator.apaginate_queryset(
+            projection.apply(queryset), self.api_request)
+        page = paginator.get_paginated_response(projection.map(page)).data
+        await aset_cached_page(cache_key, page)
+        return self.json_response(page_envelope("User Fetched Successfully", page))
+
+
+class AsyncFriendListView(AsyncAPIView):
+    """
+    Async version of FriendListView, same parameters and response.
+    """
+
+    @conditional_get(astamp_etag("friends"))
+    async def get(self, request):
+        paginator = ListPagination()
+        paginator.known_count = request.user.friend_count
+        queryset = (
+            FriendshipEdge.objects.filter(LIVE_FRIEND_EDGE, user=request.user)
+            .order_by("-created_at", "-id")
+        )
+        projection = FRIEND_PROJECTION
+        if includes_relationship(self.api_request.query_params):
+            queryset = queryset.annotate(relationship=Value("friend"))
+            projection = FRIEND_RELATIONSHIP_PROJECTION
+        page = await paginator.apaginate_queryset(
+            projection.apply(queryset), self.api_request)
+        return self.paginated_response(
+            "User Friends List Fetched Successfully",
+            paginator,
+            projection.map(page),
+        )
+
+
+class AsyncPendingFriendRequestView(AsyncAPIView):
+    """
+    Async version of PendingFriendRequestView, same parameters and
+    response, including the ?export=ndjson stream.
+    """
+    export_chunk_size = 2000
+
+    @conditional_get(astamp_etag("pending"))
+    async def get(self, request):
+        queryset = PENDING_REQUEST_PROJECTION.apply(
+            FriendRequest.objects.filter(
+                receiver=request.user, status="pending", sender__is_deleted=False)
+            .order_by("-created_at", "-id")
+        )
+        if self.api_request.query_params.get("export") == "ndjson":
+            return StreamingHttpResponse(
+                self.export(queryset), content_type="application/x-ndjson")
+
+        paginator = ListPagination()
+        paginator.known_count = request.user.pending_request_count
+        page = await paginator.apaginate_queryset(queryset, self.api_request)
+        return self.paginated_response(
+            "Pending friend requests fetched successfully",
+            paginator,
+            PENDING_REQUEST_PROJECTION.map(page),
+        )
+
+    async def export(self, queryset):
+        async for row in queryset.aiterator(chunk_size=self.export_chunk_size):
+            yield dumps(PENDING_REQUEST_PROJECTION.map_row(row)) + b"\n"
+
+
+class AsyncFriendRequestView(AsyncAPIView):
+    """
+    Async version of FriendRequestView (POST to send, PUT to accept or
+    reject), same parameters, throttling and response.
+
+    Lookups use the async ORM; the writes keep their transaction by
+    running in a worker thread through sync_to_async.
+    """
+    throttle_classes = [FriendRequestThrottle]
+
+    async def post(self, request):
+        failure_message = "Failed to send friend request"
+
+        sender = request.user
+        receiver_id = self.get_body(request).get("receiver_id")
+
+        # validations
+        validate_receiver_id(receiver_id, failure_message)
+        receiver = await aget_receiver(receiver_id, sender, failure_message)
+
+        await sync_to_async(self.send)(sender, receiver, failure_message)
+        return self.format_response(
+            message="Friend request sent",
+            status_code=status.HTTP_201_CREATED
+        )
+
+    async def put(self, request, pk):
+        failure_message = "Failed to accept/reject friend request"
+
+        friend_request = await aget_friend_request(
+            pk,
+            request.user,
+            failure_message
+        )
+        request_status = validate_request_status(
+            self.get_body(request).get("status"),
+            failure_message)
+
+        await sync_to_async(self.respond)(friend_request, request_status)
+        return self.format_response(
+            message=f"Friend request {request_status}",
+            status_code=status.HTTP_200_OK,
+        )
+
+    @staticmethod
+    def send(sender, receiver, failure_message):
+        with transaction.atomic():
+            send_friend_request(sender, receiver, failure_message)
+
+    @staticmethod
+    def respond(friend_request, request_status):
+        with transaction.atomic():
+            update_friend_request_status(friend_request, request_status)
+
+            if request_status == "accepted":
+                create_friendship(
+                    friend_request.sender, friend_request.receiver)
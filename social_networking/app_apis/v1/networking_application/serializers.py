@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from ...models import User, FriendRequest
+from ...models import User, FriendRequest, FriendshipEdge, FriendSuggestion
+from ...projection import Projection
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -8,6 +9,69 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "name"]
 
 
+class FriendSerializer(serializers.ModelSerializer):
+    """
+    Renders the friend side of an adjacency edge with the same fields
+    as UserSerializer.
+    """
+    id = serializers.UUIDField(source="friend.id", read_only=True)
+    email = serializers.EmailField(source="friend.email", read_only=True)
+    name = serializers.CharField(source="friend.name", read_only=True)
+
+    class Meta:
+        model = FriendshipEdge
+        fields = ["id", "email", "name"]
+
+
+# values() based equivalents of UserSerializer and FriendSerializer for
+# the list views, see app_apis/projection.py
+USER_PROJECTION = Projection({
+    "id": ("id", str),
+    "email": "email",
+    "name": "name",
+})
+
+FRIEND_PROJECTION = Projection({
+    "id": ("friend_id", str),
+    "email": "friend__email",
+    "name": "friend__name",
+})
+
+# the same rows plus the caller's relationship to each user, for
+# ?include=relationship (annotated as "relationship" on the queryset)
+USER_RELATIONSHIP_PROJECTION = Projection({
+    "id": ("id", str),
+    "email": "email",
+    "name": "name",
+    "relationship": "relationship",
+})
+
+FRIEND_RELATIONSHIP_PROJECTION = Projection({
+    "id": ("friend_id", str),
+    "email": "friend__email",
+    "name": "friend__name",
+    "relationship": "relationship",
+})
+
+# rows of the pending friend requests list (no serializer counterpart)
+PENDING_REQUEST_PROJECTION = Projection({
+    "friend_request_id": ("id", str),
+    "name": "sender__name",
+    "email": "sender__email",
+})
+
+
+class FriendSuggestionSerializer(serializers.ModelSerializer):
+    id = serializers.UUIDField(source="suggested.id", read_only=True)
+    email = serializers.EmailField(source="suggested.email", read_only=True)
+    name = serializers.CharField(source="suggested.name", read_only=True)
+    mutual_friends = serializers.IntegerField(source="mutual_count", read_only=True)
+
+    class Meta:
+        model = FriendSuggestion
+        fields = ["id", "email", "name", "mutual_friends"]
+
+
 class FriendRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = FriendRequest
@@ -1,29 +1,55 @@
-from rest_framework import generics, filters
-from rest_framework.pagination import PageNumberPagination
+from rest_framework import generics
 from .serializers import User
-from .serializers import UserSerializer
-from django.db.models import Q
+from .serializers import (
+    UserSerializer,
+    FriendSerializer,
+    FriendSuggestionSerializer,
+    USER_PROJECTION,
+    FRIEND_PROJECTION,
+    PENDING_REQUEST_PROJECTION,
+    USER_RELATIONSHIP_PROJECTION,
+    FRIEND_RELATIONSHIP_PROJECTION,
+)
+from django.db.models import Q, Value
+from django.http import StreamingHttpResponse
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework import status
-from social_networking.app_apis.models import User, FriendRequest, Friendship
+from social_networking.app_apis.models import (
+    LIVE_FRIEND_EDGE, User, FriendRequest, Friendship, FriendshipEdge, FriendSuggestion
+)
 from rest_framework.views import APIView
-from ...custom_response import CustomResponseMixin, APIException
+from ...conditional import conditional_get, stamp_etag
+from ...custom_response import CustomResponseMixin, APIException, page_envelope
+from ...pagination import ListPagination
+from ...projection import ProjectionListMixin
+from ...renderers import dumps
+from ...search import get_search_backend
+from ...search_cache import get_cached_page, set_cached_page
+from ...suggest import get_suggest_index
+from ...graph_snapshot import friend_graph
+from ...throttling import FriendRequestThrottle, BulkFriendRequestThrottle, ThrottleRefundMixin
 from django.db import transaction
 import logging
 from ...utils import *
 logger = logging.getLogger(__name__)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 10
-
-
-class UserSearchView(generics.ListAPIView):
+class UserSearchView(ProjectionListMixin, generics.ListAPIView):
     """
-    API to search for different users on the base of name and email
+    API to search for different users on the base of name and email.
+    Matching and relevance ranking are delegated to the configured
+    search backend (see app_apis/search.py).
+    Pass ?pagination=cursor for keyset pagination, where "count" is only
+    computed when ?with_count=true is also given.
+    Rows are read with values() through USER_PROJECTION; set
+    `projection = None` to go back to UserSerializer.
+    With ?include=relationship every row also carries "relationship"
+    (see relationship_statuses), computed by Exists() subqueries in the
+    same query.
+    Other pages are kept in the search result cache until a User change
+    bumps its version (see app_apis/search_cache.py).
     response: {
             "message": "User Fetched Successfully",
             "data": {
@@ -37,68 +63,108 @@ class UserSearchView(generics.ListAPIView):
                         "name": "Abhishek"
                     }
                 ]
-            }
+            },
+            "type": "success",
+            "errors": null
         }
     """
-    queryset = User.objects.all()
+    queryset = User.objects.order_by("-created_at", "-id")
     serializer_class = UserSerializer
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["email", "name"]
+    projection = USER_PROJECTION
+    pagination_class = ListPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         queryset = super().get_queryset()
         search_keyword = self.request.query_params.get("search", None)
         if search_keyword:
-            queryset = queryset.filter(
-                Q(email__iexact=search_keyword) | Q(name__icontains=search_keyword)
-            )
+            # keyset pages need the (created_at, id) order, so only
+            # page-number results are ranked by relevance
+            rank = not self.paginator.is_cursor_mode(self.request)
+            queryset = get_search_backend().search(
+                queryset, search_keyword, rank=rank)
+        if includes_relationship(self.request.query_params):
+            queryset = queryset.annotate(
+                relationship=relationship_annotation(self.request.user))
         return queryset
 
+    def get_projection(self):
+        if includes_relationship(self.request.query_params):
+            return USER_RELATIONSHIP_PROJECTION
+        return self.projection
+
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
+            cache_key, paginated_response = get_cached_page(request)
+            logger.info(
+                "User search successful for keyword '%s' by user '%s'",
+                request.query_params.get("search"), request.user.email,
+                extra={"endpoint": "user-search"})
+            if paginated_response is None:
+                queryset = self.project(self.filter_queryset(self.get_queryset()))
+                page = self.paginate_queryset(queryset)
+                if page is None:
+                    return Response(
+                        page_envelope("User Fetched Successfully", self.serialize(queryset)),
+                        status=status.HTTP_200_OK,
+                    )
                 paginated_response = self.get_paginated_response(
-                    serializer.data).data
-                return Response(
-                    {
-                        "message": "User Fetched Successfully",
-                        "data": {
-                            "count": paginated_response["count"],
-                            "next": paginated_response["next"],
-                            "previous": paginated_response["previous"],
-                            "results": paginated_response["results"],
-                        },
-                    },
-                    status=status.HTTP_200_OK,
-                )
-            serializer = self.get_serializer(queryset, many=True)
-            logger.info(f"User search successful for keyword " \
-                "{request.query_params.get('search')}' by user '{request.user.email}'")
+                    self.serialize(page)).data
+                set_cached_page(cache_key, paginated_response)
             return Response(
-                {"message": "User Fetched Successfully", "data": serializer.data},
+                page_envelope("User Fetched Successfully", paginated_response),
                 status=status.HTTP_200_OK,
             )
+        except NotFound:
+            # invalid page or cursor
+            raise
         except Exception as e:
-            logger.error(f"Error during user search: {str(e)}")
+            logger.error("Error during user search: %s", e)
             return Response(
                 {"message": "An unexpected error occurred", "error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
 
-class FriendRequestView(CustomResponseMixin, APIView):
+class UserSuggestView(CustomResponseMixin, APIView):
+    """
+    API endpoint for search-box autocomplete.
+
+    GET:
+    Returns up to 'limit' (default 10, max 20) users whose name, any
+    word of their name, or email starts with 'q'. Answered from the
+    in-process prefix index without touching the database.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_limit = 10
+    max_limit = 20
+
+    def get(self, request):
+        prefix = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        results = get_suggest_index().suggest(prefix, limit) if prefix else []
+        return self.format_response(
+            message="Suggestions fetched successfully",
+            data={"results": results},
+        )
+
+
+class FriendRequestView(ThrottleRefundMixin, CustomResponseMixin, APIView):
     """
     Handle sending, accepting, and rejecting friend requests.
 
     POST:
     Send a friend request from the authenticated user to another user.
     Requires 'receiver_id' in the request data to specify the recipient's user ID.
-    Limits to sending a maximum of 3 friend requests within a minute.
+    Limited by FriendRequestThrottle (3 friend requests per sliding minute
+    by default); throttled calls get a 429 with a Retry-After header.
+    Failed sends are not counted.
 
     PUT:
     Accept or reject a friend request.
@@ -107,6 +173,7 @@ class FriendRequestView(CustomResponseMixin, APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_classes = [FriendRequestThrottle]
 
     def post(self, request):
         failure_message = "Failed to send friend request"
@@ -116,29 +183,20 @@ class FriendRequestView(CustomResponseMixin, APIView):
 
         # validations
         validate_receiver_id(receiver_id, failure_message)
-        check_recent_requests(sender, failure_message)
         receiver = get_receiver(receiver_id, sender, failure_message)
 
         try:
             with transaction.atomic():
                 # Send the friend request
-                friend_request, created = FriendRequest.objects.get_or_create(
-                    sender=sender, receiver=receiver
-                )
-                if not created:
-                    raise APIException(
-                        message=failure_message,
-                        errors="Friend request already sent"
-                    )
+                send_friend_request(sender, receiver, failure_message)
                 return self.format_response(
                     message="Friend request sent",
                     status_code=status.HTTP_201_CREATED
                 )
         except APIException as e:
-            transaction.set_rollback(True)
+            # leaving the atomic block with an exception already rolled it back
             raise e
         except Exception as e:
-            transaction.set_rollback(True)
             raise APIException(message="An unexpected error occurred", errors=str(e))
 
 
@@ -167,93 +225,330 @@ class FriendRequestView(CustomResponseMixin, APIView):
                     status_code=status.HTTP_200_OK,
                 )
         except APIException as e:
-            transaction.set_rollback(True)
+            # leaving the atomic block with an exception already rolled it back
             raise e
         except Exception as e:
-            transaction.set_rollback(True)
             raise APIException(message="An unexpected error occurred", errors=str(e))
 
 
-class FriendListView(generics.ListAPIView):
+class BulkFriendRequestView(ThrottleRefundMixin, CustomResponseMixin, APIView):
+    """
+    Send friend requests to many users in one call.
+
+    POST:
+    Requires 'receiver_ids', a list of user IDs (at most 100).
+    Every receiver counts against the same 3 per minute as single sends
+    (BulkFriendRequestThrottle), and receivers not sent to are refunded.
+    A batch larger than the whole rate is answered with 400.
+    response: {
+            "message": "Friend requests processed",
+            "data": {
+                "results": {
+                    "<receiver_id>": "sent" | "already_sent" | "not_found"
+                                     | "self" | "invalid"
+                }
+            },
+            ...
+        }
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [BulkFriendRequestThrottle]
+
+    def post(self, request):
+        failure_message = "Failed to send friend requests"
+
+        receiver_ids = request.data.get("receiver_ids")
+        validate_receiver_ids(receiver_ids, failure_message)
+
+        try:
+            with transaction.atomic():
+                results = send_friend_requests(request.user, receiver_ids)
+        except Exception as e:
+            logger.error("Error sending bulk friend requests: %s", e)
+            raise APIException(message="An unexpected error occurred", errors=str(e))
+
+        self.refund_throttles(
+            sum(1 for result in results.values() if result != "sent"))
+        return self.format_response(
+            message="Friend requests processed",
+            data={"results": results},
+            status_code=status.HTTP_201_CREATED,
+        )
+
+
+class BulkRespondFriendRequestView(CustomResponseMixin, APIView):
+    """
+    Accept or reject many pending friend requests in one transaction.
+
+    PUT:
+    The request body must contain 'status' ('accepted' or 'rejected') and
+    either 'request_ids' (list of friend request IDs) or 'sender_id' to
+    answer every pending request from that user.
+    response: {
+            "message": "Friend requests accepted",
+            "data": {
+                "processed": 2,
+                "results": {"<request_id>": "accepted" | "not_pending"}
+            },
+            ...
+        }
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request):
+        failure_message = "Failed to accept/reject friend requests"
+
+        request_status = validate_request_status(
+            request.data.get("status"),
+            failure_message)
+        request_ids = request.data.get("request_ids")
+        sender_id = request.data.get("sender_id")
+        if request_ids is None and not sender_id:
+            raise APIException(
+                message=failure_message,
+                errors="Either request_ids or sender_id is required")
+        if request_ids is not None:
+            request_ids = validate_request_ids(request_ids, failure_message)
+        if sender_id:
+            sender_id = validate_sender_id(sender_id, failure_message)
+
+        try:
+            with transaction.atomic():
+                answered = respond_friend_requests(
+                    request.user,
+                    request_status,
+                    request_ids=request_ids,
+                    sender_id=sender_id)
+        except Exception as e:
+            logger.error("Error responding to friend requests: %s", e)
+            raise APIException(message="An unexpected error occurred", errors=str(e))
+
+        results = {str(request_id): request_status for request_id in answered}
+        for request_id in request_ids or []:
+            results.setdefault(str(request_id), "not_pending")
+        return self.format_response(
+            message=f"Friend requests {request_status}",
+            data={"processed": len(answered), "results": results},
+        )
+
+
+class FriendListView(ProjectionListMixin, generics.ListAPIView):
     """
     API endpoint to fetch friends list.
+
+    Reads the symmetric FriendshipEdge index, so a page is served by one
+    indexed query on (user, created_at, id) whatever the friend count.
+    The total comes from the caller's friend_count counter rather than a
+    COUNT over their edges.
+    Rows are read with values() through FRIEND_PROJECTION.
+    ?include=relationship adds "relationship" to every row like the
+    search does; every row here is an edge of the caller, so it is
+    "friend" without a subquery.
+    Answers If-None-Match with 304 from the caller's "friends" stamp
+    alone (see app_apis/conditional.py).
     """
 
-    serializer_class = UserSerializer
+    serializer_class = FriendSerializer
+    projection = FRIEND_PROJECTION
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ListPagination
 
     def get_queryset(self):
-        user = self.request.user
-        friends = Friendship.objects.filter(Q(user1=user) | Q(user2=user))
-        friend_ids = [
-            friend.user1.id if friend.user1 != user else friend.user2.id
-            for friend in friends
-        ]
-        return User.objects.filter(id__in=friend_ids)
+        queryset = (
+            FriendshipEdge.objects.filter(LIVE_FRIEND_EDGE, user=self.request.user)
+            .select_related("friend")
+            .order_by("-created_at", "-id")
+        )
+        if includes_relationship(self.request.query_params):
+            queryset = queryset.annotate(relationship=Value("friend"))
+        return queryset
+
+    def get_projection(self):
+        if includes_relationship(self.request.query_params):
+            return FRIEND_RELATIONSHIP_PROJECTION
+        return self.projection
 
+    @conditional_get(stamp_etag("friends"))
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            queryset = self.project(self.filter_queryset(self.get_queryset()))
+            self.paginator.known_count = request.user.friend_count
             page = self.paginate_queryset(queryset)
             if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                paginated_response = self.get_paginated_response(serializer.data).data
+                paginated_response = self.get_paginated_response(self.serialize(page)).data
                 return Response(
-                    {
-                        "message": "User Friends List Fetched Successfully",
-                        "data": {
-                            "count": paginated_response["count"],
-                            "next": paginated_response["next"],
-                            "previous": paginated_response["previous"],
-                            "results": paginated_response["results"],
-                        },
-                    },
+                    page_envelope("User Friends List Fetched Successfully", paginated_response),
                     status=status.HTTP_200_OK,
                 )
-            serializer = self.get_serializer(queryset, many=True)
             return Response(
-                {"message": "User Fetched Successfully", "data": serializer.data},
+                page_envelope("User Fetched Successfully", self.serialize(queryset)),
                 status=status.HTTP_200_OK,
             )
+        except NotFound:
+            # invalid page or cursor
+            raise
         except Exception as e:
-            logger.error(f"Error fetching user friends list: {str(e)}")
+            logger.error("Error fetching user friends list: %s", e)
             return Response(
                 {"message": "An unexpected error occurred", "error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
 
-class PendingFriendRequestView(CustomResponseMixin, APIView):
+class UserRelationshipView(CustomResponseMixin, APIView):
+    """
+    Relationship of the logged-in user with many users at once, e.g. to
+    draw the friend/pending/add button of every search result.
+
+    GET:
+    ?ids=<id>,<id>,... (at most 100, the parameter may also repeat).
+    Answered with two indexed queries whatever the number of ids.
+    response: {
+            "message": "Relationships fetched successfully",
+            "data": {
+                "results": {
+                    "<user_id>": "self" | "friend" | "request_sent"
+                                 | "request_received" | "none"
+                }
+            },
+            ...
+        }
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user_ids = validate_user_ids(
+            request.query_params.getlist("ids"), "Failed to fetch relationships")
+        statuses = relationship_statuses(request.user, user_ids)
+        return self.format_response(
+            message="Relationships fetched successfully",
+            data={"results": {
+                str(user_id): relationship for user_id, relationship in statuses.items()
+            }},
+        )
+
+
+class FriendSuggestionView(CustomResponseMixin, APIView):
     """
-    API endpoint to fetch pending friend requests.
+    API endpoint for "people you may know".
+
+    GET:
+    Returns up to 'limit' (default 10, max 50) users ranked by number of
+    mutual friends. Reads the FriendSuggestion rows precomputed by the
+    compute_friend_suggestions command with one indexed query.
     """
 
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    default_limit = 10
+    max_limit = 50
 
     def get(self, request):
         try:
-            user = self.request.user
-            friend_requests_obj = (
-                FriendRequest.objects.select_related("sender")
-                .filter(receiver=user, status="pending")
-                .values("id", "sender__name", "sender__email")
-            )
-            sender_details = []
-            for item in friend_requests_obj:
-                sender_data = {
-                    "friend_request_id": item["id"],
-                    "name": item["sender__name"],
-                    "email": item["sender__email"],
-                }
-                sender_details.append(sender_data)
-            return self.format_response(
-                message="Pending friend requests fetched successfully",
-                data=sender_details,
-                type="success",
-                status_code=status.HTTP_200_OK,
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        suggestions = (
+            FriendSuggestion.objects.filter(user=request.user, suggested__is_deleted=False)
+            .select_related("suggested")
+            .order_by("-mutual_count")[:limit]
+        )
+        serializer = FriendSuggestionSerializer(suggestions, many=True)
+        return self.format_response(
+            message="Friend suggestions fetched successfully",
+            data={"results": serializer.data},
+        )
+
+
+class FriendDistanceView(CustomResponseMixin, APIView):
+    """
+    API endpoint for degrees of separation.
+
+    GET:
+    Returns the shortest chain of friendships between the logged-in user
+    and user 'pk', up to FRIEND_GRAPH["MAX_HOPS"] (6) hops. "distance"
+    and "path" are null when no such chain exists, or when a user on it
+    has been deleted since the graph was read.
+    Served by bidirectional BFS over the memory-mapped CSR snapshot built
+    by build_friend_graph_snapshot, plus the friendships created and the
+    friendships and users soft-deleted since.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        if pk == request.user.pk:
+            path = [pk]
+        else:
+            path = friend_graph.shortest_path(request.user.pk, pk)
+
+        # a user deleted or soft-deleted since the graph was read breaks
+        # the chain: there is no path through them, not a shorter one
+        users = User.objects.in_bulk(path) if path is not None else {}
+        if path is None or len(users) != len(path):
+            data = {"distance": None, "path": None}
+        else:
+            data = {
+                "distance": len(path) - 1,
+                "path": UserSerializer(
+                    [users[user_id] for user_id in path], many=True).data,
+            }
+        return self.format_response(
+            message="Friend distance fetched successfully",
+            data=data,
+        )
+
+
+class PendingFriendRequestView(CustomResponseMixin, ProjectionListMixin, generics.ListAPIView):
+    """
+    API endpoint to fetch pending friend requests, newest first.
+
+    Paginated like the other lists (?pagination=cursor for keyset pages)
+    over the partial index on pending rows. ?export=ndjson streams the
+    whole backlog instead, one JSON object per line, without holding it
+    in memory. Answers If-None-Match with 304 from the caller's
+    "pending" stamp alone. The total comes from pending_request_count.
+    """
+
+    permission_classes = [IsAuthenticated]
+    pagination_class = ListPagination
+    projection = PENDING_REQUEST_PROJECTION
+    export_chunk_size = 2000
+
+    def get_queryset(self):
+        return (
+            FriendRequest.objects.filter(
+                receiver=self.request.user, status="pending", sender__is_deleted=False)
+            .order_by("-created_at", "-id")
+        )
+
+    @conditional_get(stamp_etag("pending"))
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = self.project(self.get_queryset())
+            if request.query_params.get("export") == "ndjson":
+                return self.export(queryset)
+            self.paginator.known_count = request.user.pending_request_count
+            page = self.paginate_queryset(queryset)
+            paginated_response = self.get_paginated_response(self.serialize(page)).data
+            return Response(
+                page_envelope("Pending friend requests fetched successfully", paginated_response),
+                status=status.HTTP_200_OK,
             )
+        except NotFound:
+            # invalid page or cursor
+            raise
         except Exception as e:
-            logger.error(f"Error fetching pending friend requests: {str(e)}")
-            raise APIException(message="An unexpected error occurred", errors=str(e))
\ No newline at end of file
+            logger.error("Error fetching pending friend requests: %s", e)
+            raise APIException(message="An unexpected error occurred", errors=str(e))
+
+    def export(self, queryset):
+        rows = queryset.iterator(chunk_size=self.export_chunk_size)
+        return StreamingHttpResponse(
+            (dumps(self.projection.map_row(row)) + b"\n" for row in rows),
+            content_type="application/x-ndjson",
+        )
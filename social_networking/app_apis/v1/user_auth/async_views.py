@@ -0,0 +1,70 @@
+from rest_framework import status
+import logging
+from .serializers import UserLoginSerializer
+from ...async_api import AsyncAPIView
+from ...hashing import acheck_password, amake_password
+from ...jwt import get_tokens_for_user
+from ...models import User
+from ...throttling import LoginThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncUserLoginView(AsyncAPIView):
+    """
+    Async version of UserLoginView, same parameters and response.
+
+    The password check awaits the hashing pool, so the event loop keeps
+    serving other requests while PBKDF2 runs in a pool process.
+    """
+
+    requires_authentication = False
+    throttle_classes = [LoginThrottle]
+
+    async def post(self, request):
+        serializer = UserLoginSerializer(data=self.get_body(request))
+        if not serializer.is_valid():
+            return self.format_response(
+                'Failed to log in user',
+                type='failure',
+                errors={'detail': 'Failed to log in user'},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        email = serializer.data.get('email').lower()
+        password = serializer.data.get('password')
+
+        user = await self.authenticate_user(email, password)
+        if user is None:
+            return self.format_response(
+                'User Login Failed',
+                type='failure',
+                errors={'detail': 'Invalid credentials'},
+                status_code=status.HTTP_401_UNAUTHORIZED
+            )
+
+        data = {
+            'token': get_tokens_for_user(user),
+            'email': user.email,
+        }
+        logger.info("User logged in successfully: %s", user.email,
+                    extra={"endpoint": "user-login"})
+        return self.format_response('User logged in successfully', data)
+
+    async def authenticate_user(self, email, password):
+        """
+        Same checks as ModelBackend.authenticate, awaiting the hash.
+        """
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            # hash anyway so unknown emails take as long as wrong passwords
+            await amake_password(password)
+            return None
+
+        async def upgrade_hash(raw_password):
+            user.password = await amake_password(raw_password)
+            await user.asave(update_fields=['password'])
+
+        if await acheck_password(password, user.password, upgrade_hash) and user.is_active:
+            return user
+        return None
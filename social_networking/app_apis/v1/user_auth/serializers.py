@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from ...models import User
 from ...custom_response import APIException
 
@@ -11,6 +12,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         style={'input_type': 'password'},
         write_only=True
     )
+    # soft-deleted users keep their address until purged
+    email = serializers.EmailField(
+        max_length=255,
+        validators=[UniqueValidator(
+            queryset=User.all_objects.all(),
+            message="user with this email address already exists.",
+        )],
+    )
     class Meta:
         model = User
         fields = [
@@ -53,4 +62,11 @@ class UserLoginSerializer(serializers.ModelSerializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'name', 'email', 'created_at']
\ No newline at end of file
+        fields = [
+            'id',
+            'name',
+            'email',
+            'created_at',
+            'friend_count',
+            'pending_request_count'
+        ]
\ No newline at end of file
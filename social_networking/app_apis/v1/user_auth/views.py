@@ -8,9 +8,12 @@ from .serializers import (
     UserProfileSerializer
 )
 from django.contrib.auth import authenticate
+from ...conditional import conditional_get, make_etag
 from ...jwt import get_tokens_for_user
 from rest_framework.permissions import IsAuthenticated
 from ...custom_response import CustomResponseMixin, APIException
+from ...hashing import HashingPoolBusy
+from ...throttling import LoginThrottle, RegistrationThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +26,11 @@ class UserRegistrationView(CustomResponseMixin, APIView):
     Register a new user with the provided details.
     Requires 'email', 'password', and optionally 'name'.
     Returns a token for authentication in subsequent requests.
+    Answers 503 with Retry-After when the password hashing pool is full.
     """
 
+    throttle_classes = [RegistrationThrottle]
+
     def post(self, request, *args, **kwargs):
         """
         Handle POST request for user registration.
@@ -39,7 +45,8 @@ class UserRegistrationView(CustomResponseMixin, APIView):
                 'email': user.email,
                 'name': user.name
             }
-            logger.info(f"User registered successfully: {user.email}")
+            logger.info("User registered successfully: %s", user.email,
+                        extra={"endpoint": "user-register"})
             return self.format_response(
                 'User registered successfully',
                 data, status_code=status.HTTP_201_CREATED)
@@ -50,8 +57,10 @@ class UserRegistrationView(CustomResponseMixin, APIView):
                 errors=e.detail,
                 status_code=status.HTTP_400_BAD_REQUEST
             )
+        except HashingPoolBusy:
+            raise
         except Exception as e:
-            logger.error(f"User registration failed: {str(e)}")
+            logger.error("User registration failed: %s", e)
             return self.format_response(
                 'Failed to register user',
                 data={}, type='failure',
@@ -67,8 +76,11 @@ class UserLoginView(CustomResponseMixin, APIView):
     POST:
     Log in a user with email and password.
     Returns a token for authentication in subsequent requests.
+    Answers 503 with Retry-After when the password hashing pool is full.
     """
 
+    throttle_classes = [LoginThrottle]
+
     def post(self, request, *args, **kwargs):
         """
         Handle POST request for user login.
@@ -86,7 +98,8 @@ class UserLoginView(CustomResponseMixin, APIView):
                     'token': token,
                     'email': user.email,
                 }
-                logger.info(f"User logged in successfully: {user.email}")
+                logger.info("User logged in successfully: %s", user.email,
+                            extra={"endpoint": "user-login"})
                 return self.format_response(
                     'User logged in successfully', data)
             else:
@@ -97,8 +110,10 @@ class UserLoginView(CustomResponseMixin, APIView):
                     errors={'detail': 'Invalid credentials'},
                     status_code=status.HTTP_401_UNAUTHORIZED
                 )
+        except HashingPoolBusy:
+            raise
         except Exception as e:
-            logger.error(f"User login failed: {str(e)}")
+            logger.error("User login failed: %s", e)
             return self.format_response(
                 'Failed to log in user',
                 data={}, type='failure',
@@ -107,6 +122,13 @@ class UserLoginView(CustomResponseMixin, APIView):
             )
 
 
+def profile_etag(request):
+    # the body is request.user as authentication loaded it, so its
+    # fields are the stamp; no cache lookup that could race the load
+    return make_etag(request, *(
+        getattr(request.user, field) for field in UserProfileSerializer.Meta.fields))
+
+
 class UserProfileView(APIView):
     """
     API endpoint to retrieve logged-in user details.
@@ -114,23 +136,26 @@ class UserProfileView(APIView):
     GET:
     Fetch details of the logged-in user.
     Requires authentication token in headers.
+    Answers If-None-Match with 304 without serializing.
     """
 
     permission_classes = [IsAuthenticated]
 
+    @conditional_get(profile_etag)
     def get(self, request, *args, **kwargs):
         """
         Handle GET request to fetch user profile.
         """
         try:
             serializer = UserProfileSerializer(request.user)
-            logger.info(f"User profile fetched successfully: {request.user.email}")
+            logger.info("User profile fetched successfully: %s", request.user.email,
+                        extra={"endpoint": "user-detail"})
             return Response({
                 'message': 'User profile fetched successfully',
                 'data': serializer.data
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Failed to fetch user profile: {str(e)}")
+            logger.error("Failed to fetch user profile: %s", e)
             return Response({
                 'message': 'An unexpected error occurred',
                 'error': str(e)
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_networking.settings')
 
 application = get_asgi_application()
+
+from social_networking.app_apis.suggest import warm_suggest_index  # noqa: E402
+
+warm_suggest_index()
@@ -31,6 +31,7 @@ APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_PACKAGES + APPS
 
 MIDDLEWARE = [
+    'social_networking.app_apis.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -119,12 +120,127 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'social_networking.app_apis.authentication.CachedJWTAuthentication',
     ),
     'EXCEPTION_HANDLER': 'social_networking.app_apis.custom_response.custom_exception_handler',
+    # orjson-backed when installed, same bytes as DRF's JSONRenderer;
+    # swap back to 'rest_framework.renderers.JSONRenderer' to compare
+    'DEFAULT_RENDERER_CLASSES': (
+        'social_networking.app_apis.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'friend_request': '3/min',
+        'login': '10/min',
+        'register': '5/min',
+    },
+}
 
+# Storage for the sliding-window throttles in app_apis/throttling.py:
+# LocalMemoryRateLimitBackend (single process), CacheRateLimitBackend
+# (shared through CACHES) or DatabaseRateLimitBackend (no shared cache).
+RATE_LIMIT_BACKEND = 'social_networking.app_apis.throttling.CacheRateLimitBackend'
+RATE_LIMIT_CACHE_ALIAS = 'default'
+
+
+# User search backend (dotted path). Left unset, TrigramSearchBackend is
+# used on PostgreSQL and NGramSearchBackend everywhere else.
+USER_SEARCH_BACKEND = None
+
+# In-process autocomplete index behind user/search/suggest/, built when
+# wsgi.py/asgi.py load (WARM_ON_STARTUP). rebuild_suggest_index bumps its
+# version in the ALIAS cache, which must be shared by the workers (not the
+# default per-process locmem) for them to see it; otherwise restart them.
+SUGGEST_INDEX = {
+    "MAX_USERS": 500000,
+    "MAX_KEY_LENGTH": 64,
+    "ALIAS": "default",
+    "WARM_ON_STARTUP": True,
 }
 
+# Pages of user search results, cached under a User table version that
+# every User save/delete bumps (app_apis/search_cache.py). ALIAS names the
+# CACHES entry: the default locmem cache only sees the bumps of its own
+# process, so ENABLED None turns the cache on only for a shared one (file,
+# Redis, Memcached) and check app_apis.W001 warns about True on locmem;
+# TIMEOUT bounds how long an entry can outlive a missed bump.
+SEARCH_CACHE = {
+    "ENABLED": None,
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# ETags of user/friends-list/ and user/friend-requests-pending/ come from
+# per-user version stamps kept in this CACHES alias (app_apis/conditional.py)
+# and bumped by the writes that change those lists. Like SEARCH_CACHE, it
+# needs a cache shared by all workers (ENABLED None, check app_apis.W002);
+# TIMEOUT bounds the life of a stamp.
+CONDITIONAL_GET = {
+    "ENABLED": None,
+    "ALIAS": "default",
+    "TIMEOUT": 3600,
+}
+
+# "People you may know", precomputed by compute_friend_suggestions
+FRIEND_SUGGESTIONS = {
+    "TOP_N": 50,
+}
+
+# Degrees of separation: CSR snapshot written by build_friend_graph_snapshot
+# and memory-mapped by every worker; newer friendships are replayed from the
+# database every DELTA_REFRESH_SECONDS.
+FRIEND_GRAPH = {
+    "SNAPSHOT_PATH": BASE_DIR / "friend_graph.csr",
+    "DELTA_REFRESH_SECONDS": 30,
+    "MAX_HOPS": 6,
+}
+
+# Cache of users resolved from JWTs by CachedJWTAuthentication. Set
+# SHARED_CACHE_ALIAS to a CACHES alias to share entries between workers.
+JWT_USER_CACHE = {
+    "MAX_SIZE": 10000,
+    "TTL": 60,
+    "SHARED_CACHE_ALIAS": None,
+}
+
+# Password hashes are computed in a process pool (app_apis/hashing.py) so
+# logins run in parallel across cores. PooledPBKDF2PasswordHasher writes the
+# same pbkdf2_sha256 hashes as Django's default hasher, which it replaces.
+PASSWORD_HASHERS = [
+    'social_networking.app_apis.hashing.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# WORKERS = None uses one process per CPU, 0 hashes inline. Past MAX_PENDING
+# queued or running hashes, login and registration answer 503 with Retry-After.
+PASSWORD_HASHING_POOL = {
+    "WORKERS": None,
+    "MAX_PENDING": 64,
+    "TIMEOUT": 10,
+    "RETRY_AFTER": 1,
+}
+
+# Per-route request metrics served at /metrics in the Prometheus text
+# format (app_apis/metrics.py). With several server processes, point
+# MULTIPROCESS_DIR at a directory they share, emptied on deploy, so any
+# process can report the totals of all of them, flushed by a background
+# thread every FLUSH_INTERVAL seconds. The scraper must send
+# "Authorization: Bearer <AUTH_TOKEN>"; with no token set, /metrics is
+# only served when DEBUG is on.
+METRICS = {
+    "ENABLED": True,
+    "MULTIPROCESS_DIR": None,
+    "FLUSH_INTERVAL": 5,
+    "AUTH_TOKEN": None,
+}
+
+# Serve login, search, friend requests, pending requests and friends list from
+# the async views (app_apis/async_api.py). Enable when running under ASGI.
+ASYNC_VIEWS = False
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=50),
@@ -148,6 +264,12 @@ CORS_ALLOWED_ORIGINS = [
 AUTH_USER_MODEL = 'app_apis.User'
 
 #For logging
+# "queue": the handlers below run on a background thread behind
+# app_apis.log_handlers.BackgroundQueueHandler, so a log call on a
+# request thread is a queue put. "sync": they run on the calling thread.
+LOGGING_MODE = "queue"
+LOGGING_HANDLERS = ['queue'] if LOGGING_MODE == "queue" else ['console', 'file']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -157,29 +279,55 @@ LOGGING = {
                     'message}',
             'style': '{',
         },
+        'json': {
+            '()': 'social_networking.app_apis.log_handlers.JSONFormatter',
+        },
+    },
+    'filters': {
+        # keep 1 in N success logs of these endpoints (URL names)
+        'sampling': {
+            '()': 'social_networking.app_apis.log_handlers.SamplingFilter',
+            'rates': {
+                'user-login': 10,
+                'user-detail': 100,
+                'user-search': 100,
+            },
+        },
     },
     'handlers': {
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json',
+            'filters': [] if LOGGING_MODE == "queue" else ['sampling'],
         },
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'logging.handlers.RotatingFileHandler',
             'filename': "stdout.log",
-            'formatter': 'verbose',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'json',
+            'filters': [] if LOGGING_MODE == "queue" else ['sampling'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': LOGGING_HANDLERS,
             'level': 'INFO',
         },
         'root': {
-            'handlers': ['console', 'file'],
+            'handlers': LOGGING_HANDLERS,
             'level': 'INFO',
         },
 
     },
 }
+
+if LOGGING_MODE == "queue":
+    # built after 'console' and 'file' (handlers go in name order)
+    LOGGING['handlers']['queue'] = {
+        '()': 'social_networking.app_apis.log_handlers.BackgroundQueueHandler',
+        'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+        'filters': ['sampling'],
+    }